@@ -0,0 +1,75 @@
+"""
+Append and load latency benchmark for the SQLite conversation log.
+
+Usage:
+    python bench_history.py --sessions 100000 --turns 4 --window 10
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from history_store import ConversationStore
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    print(
+        f"{label:<22} n={len(samples):<8} "
+        f"p50={percentile(samples, 50) * 1e6:8.1f}us "
+        f"p95={percentile(samples, 95) * 1e6:8.1f}us "
+        f"p99={percentile(samples, 99) * 1e6:8.1f}us "
+        f"mean={statistics.fmean(samples) * 1e6:8.1f}us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=4, help="turns (user + assistant pairs) per session")
+    parser.add_argument("--window", type=int, default=10, help="turns loaded per prompt")
+    parser.add_argument("--loads", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--db", default=None, help="database path (defaults to a temp file)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_conversations.db")
+    store = ConversationStore(db_path, batch_size=args.batch_size, flush_interval=args.flush_interval)
+    message = "How do I balance studying with getting enough sleep? " * 4
+
+    append_samples = []
+    started = time.perf_counter()
+    for turn in range(args.turns):
+        for session in range(args.sessions):
+            t0 = time.perf_counter()
+            store.append_many(f"session-{session}", [("human", message), ("ai", message)])
+            append_samples.append(time.perf_counter() - t0)
+    store.flush()
+    append_wall = time.perf_counter() - started
+
+    load_samples = []
+    for _ in range(args.loads):
+        session_id = f"session-{random.randrange(args.sessions)}"
+        t0 = time.perf_counter()
+        store.load_window(session_id, args.window * 2)
+        load_samples.append(time.perf_counter() - t0)
+
+    total_messages = store.count()
+    store.close()
+
+    print(f"database: {db_path} ({os.path.getsize(db_path) / 1024 / 1024:.1f} MB, {total_messages} messages)")
+    print(f"append throughput: {total_messages / append_wall:,.0f} messages/s")
+    report("append_many (2 msgs)", append_samples)
+    report(f"load_window ({args.window} turns)", load_samples)
+
+
+if __name__ == "__main__":
+    main()
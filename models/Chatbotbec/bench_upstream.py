@@ -0,0 +1,69 @@
+"""
+Tail-latency benchmark for the chat endpoints.
+
+Start the stub upstream and the wellness bot, then fire requests at it:
+
+    STUB_PROFILE='{"deepseek-r1-distill-llama-70b": {"slow_rate": 0.1}}' uvicorn upstream_stub:app --port 9000
+    GROQ_API_BASE=http://localhost:9000 GROQ_API_KEY=stub python well-nessbot.py
+    python bench_upstream.py --url http://localhost:8000/chat --requests 200 --concurrency 8
+
+Run once more with UPSTREAM_MAX_ATTEMPTS=1 (no hedging or fallback) to get the baseline.
+"""
+import argparse
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def send(url, timeout):
+    started = time.perf_counter()
+    try:
+        response = requests.post(
+            url,
+            json={"message": "What is a linked list?", "session_id": f"bench-{uuid.uuid4().hex}"},
+            timeout=timeout,
+        )
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/chat")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: send(args.url, args.timeout), range(args.requests)))
+
+    latencies = [latency for latency, ok in results if ok]
+    failures = sum(1 for _, ok in results if not ok)
+    print(f"requests={len(results)} ok={len(latencies)} failed={failures}")
+    if latencies:
+        print(
+            f"p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s "
+            f"p99={percentile(latencies, 99):.3f}s max={max(latencies):.3f}s "
+            f"mean={statistics.fmean(latencies):.3f}s"
+        )
+
+    stats_url = args.url.rsplit("/", 1)[0] + "/upstream/stats"
+    try:
+        print(requests.get(stats_url, timeout=5).json())
+    except (requests.RequestException, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Peak RSS per /process-video request: old triple-buffered upload path vs streaming ingestion.
+
+Each variant runs in a fresh interpreter so ru_maxrss only reflects that path:
+
+    python bench_video_ingest.py --size-mb 20
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from video_ingest import map_file, spool_upload
+
+
+class DiskUpload:
+    """Minimal stand-in for a Starlette UploadFile whose body was spooled to disk."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+
+    async def read(self, size=-1):
+        return self.file.read(size)
+
+    async def seek(self, offset):
+        self.file.seek(offset)
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def legacy_path(upload, temp_dir, max_size):
+    """validate_file + copyfileobj + full read, as /process-video used to do."""
+    content = await upload.read(max_size + 1)
+    await upload.seek(0)
+    if len(content) > max_size:
+        raise ValueError("too large")
+    temp_path = os.path.join(temp_dir, "upload.mp4")
+    with open(temp_path, "wb") as buffer:
+        shutil.copyfileobj(upload.file, buffer)
+    with open(temp_path, "rb") as f:
+        video_data = f.read()
+    return hashlib.sha256(video_data).hexdigest(), len(video_data)
+
+
+async def streaming_path(upload, temp_dir, max_size):
+    """spool_upload + mmap hash; the Gemini File API then uploads the spooled path itself."""
+    temp_path = os.path.join(temp_dir, "upload.mp4")
+    await spool_upload(upload, temp_path, max_size)
+    with map_file(temp_path) as view:
+        return hashlib.sha256(view).hexdigest(), len(view)
+
+
+def run_variant(variant, source, max_size):
+    baseline = peak_rss_mb()
+    upload = DiskUpload(source)
+    temp_dir = tempfile.mkdtemp()
+    started = time.perf_counter()
+    try:
+        if variant == "legacy":
+            asyncio.run(legacy_path(upload, temp_dir, max_size))
+        else:
+            asyncio.run(streaming_path(upload, temp_dir, max_size))
+    finally:
+        shutil.rmtree(temp_dir)
+    elapsed = time.perf_counter() - started
+    print(f"{variant:<10} peak_rss_growth={peak_rss_mb() - baseline:7.1f} MB  time={elapsed * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=20.0)
+    parser.add_argument("--variant", choices=["legacy", "streaming"])
+    parser.add_argument("--source")
+    args = parser.parse_args()
+    max_size = int(max(args.size_mb, 20.0) * 1024 * 1024)
+
+    if args.variant:
+        run_variant(args.variant, args.source, max_size)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        f.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+        source = f.name
+    try:
+        print(f"upload size: {args.size_mb} MB")
+        for variant in ("legacy", "streaming"):
+            subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--source", source, "--size-mb", str(args.size_mb)],
+                check=True,
+            )
+    finally:
+        os.remove(source)
+
+
+if __name__ == "__main__":
+    main()
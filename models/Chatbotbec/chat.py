@@ -8,8 +8,13 @@ from langchain_community.tools.tavily_search import TavilySearchResults
 from dotenv import load_dotenv
 import os
 
+from zenlearn_common import cassette
+from response_cache import ResponseCache
+from upstream import UpstreamError, build_policy
+
 # Load environment variables
 load_dotenv()
+cassette.ensure_offline_credentials("GROQ_API_KEY", "TAVILY_API_KEY")
 
 # Check for required API keys
 if not os.getenv("GROQ_API_KEY"):
@@ -36,26 +41,57 @@ class ChatRequest(BaseModel):
 class SearchQuery(BaseModel):
     query: str
 
+# Opt-in cache for repeated general questions (set RESPONSE_CACHE_ENABLED=1)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.85")),
+    min_words=int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "5")),
+) if RESPONSE_CACHE_ENABLED else None
+
+# Groq models behind a hedged, fallback-aware upstream policy (see upstream.py)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "deepseek-r1-distill-llama-70b")
+CHAT_FALLBACK_MODEL = os.getenv("CHAT_FALLBACK_MODEL", "llama3-70b-8192")
+# Retries are left to the policy's fallbacks
+chat_policy = build_policy([CHAT_MODEL, CHAT_FALLBACK_MODEL],
+                           lambda model, timeout: ChatGroq(model=model, timeout=timeout, max_retries=0))
+
 @app.post("/chat")
 async def chat_endpoint(chat_request: ChatRequest = Body(...)):
     """Handles chat requests and returns AI-generated responses."""
     try:
-        # Create a persistent memory for the conversation
-        memory = ConversationBufferMemory()
-        
-        # Initialize the Groq LLM
-        llm = ChatGroq(model="deepseek-r1-distill-llama-70b")
-        
-        # Create a conversation chain
-        chain = ConversationChain(llm=llm, memory=memory)
-        
-        # Process the user query
+        # Each request is stateless, so a cached answer is as good as a fresh one
+        if response_cache is not None:
+            cached = response_cache.get(chat_request.message)
+            if cached is not None:
+                return {"response": cached}
+
         user_query = chat_request.message
-        response = chain.invoke(user_query)
+
+        def invoke(llm):
+            # Each attempt gets its own chain and memory so hedged requests don't interfere
+            chain = ConversationChain(llm=llm, memory=ConversationBufferMemory())
+            return cassette.call(
+                "groq",
+                {"model": llm.model_name, "input": user_query},
+                lambda: chain.invoke(user_query),
+                synthetic=lambda: {"input": user_query, "history": "",
+                                   "response": cassette.synthetic_chat_response(user_query)},
+            )
+
+        # Attempts run on the policy's threads, off the event loop
+        response = await chat_policy.call(invoke)
+
+        if response_cache is not None:
+            response_cache.put(user_query, response["response"])
         
         # Return the response
         return {"response": response["response"]}
     
+    except UpstreamError as e:
+        print(f"Upstream unavailable for chat request: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Upstream unavailable: {str(e)}")
     except Exception as e:
         print(f"Error processing chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
@@ -76,7 +112,12 @@ async def search_products(search_query: SearchQuery):
         )
         
         # Execute search and get results
-        search_results = search_tool.invoke({"query": search_query.query})
+        search_results = await cassette.acall(
+            "tavily",
+            {"query": search_query.query, "max_results": 3, "search_depth": "advanced"},
+            lambda: search_tool.invoke({"query": search_query.query}),
+            synthetic=lambda: cassette.synthetic_search_results(search_query.query),
+        )
         
         return {
             "status": "success",
@@ -87,6 +128,18 @@ async def search_products(search_query: SearchQuery):
         print(f"Error in search_products: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/upstream/stats")
+async def upstream_stats():
+    """Latency, hedging and circuit breaker state for each chat upstream."""
+    return chat_policy.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit-rate metrics for the /chat response cache."""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,307 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Default chunk size offered to clients; the final chunk may be shorter
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadNotFound(KeyError):
+    """Raised when an upload id is unknown or has expired."""
+
+
+class UploadError(ValueError):
+    """Raised when a chunk or completion request is invalid."""
+
+
+class UploadInUse(UploadError):
+    """Raised when deleting an upload that a job or a running analysis still reads."""
+
+
+class ChunkedUploadStore:
+    """
+    Resumable uploads assembled on disk from independently sent chunks.
+
+    Each upload gets a directory with `upload.json` (metadata and the
+    received chunk offsets with their SHA-256) and a preallocated `data` file
+    that chunks are written into at their offset. A chunk that was already
+    received with the same hash is acknowledged without being written again,
+    so clients can blindly resend after a dropped connection. State changes
+    are serialized with an flock so several uvicorn workers can accept chunks
+    for the same upload.
+
+    `in_use(upload_id)` reports whether something still reads the upload, such
+    as a queued analysis job; `reading(upload_id)` marks it as read for the
+    duration of a synchronous analysis. Such uploads are neither expired nor
+    deleted.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_size: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ttl_seconds: float = 24 * 3600,
+        in_use: Optional[Callable[[str], bool]] = None,
+    ):
+        self.root = root
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.in_use = in_use or (lambda upload_id: False)
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> str:
+        # Ids are generated by create(); anything else (e.g. "..") must not become a path
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadNotFound(upload_id)
+        return os.path.join(self.root, upload_id)
+
+    def data_path(self, upload_id: str) -> str:
+        return os.path.join(self._dir(upload_id), "data")
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        """Exclusive access to an upload's state; yields its metadata and saves changes."""
+        directory = self._dir(upload_id)
+        try:
+            lock = open(os.path.join(directory, "lock"), "a")
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id)
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state_path = os.path.join(directory, "upload.json")
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                raise UploadNotFound(upload_id)
+            yield state
+            state["updated_at"] = time.time()
+            tmp_path = f"{state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+
+    def create(self, filename: str, size: int, content_type: Optional[str] = None) -> dict:
+        if size <= 0:
+            raise UploadError("Upload size must be positive")
+        if size > self.max_size:
+            raise UploadError(f"Video too large. Maximum size: {self.max_size/1024/1024}MB")
+        self.cleanup_expired()
+
+        upload_id = uuid.uuid4().hex
+        directory = self._dir(upload_id)
+        os.makedirs(directory)
+        with open(self.data_path(upload_id), "wb") as f:
+            f.truncate(size)
+        state = {
+            "upload_id": upload_id,
+            "filename": os.path.basename(filename),
+            "content_type": content_type,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "chunks": {},  # offset (as str) -> sha256
+            "complete": False,
+            "sealed": False,
+            "sha256": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        with open(os.path.join(directory, "upload.json"), "w") as f:
+            json.dump(state, f)
+        return self.describe(state)
+
+    def write_chunk(self, upload_id: str, offset: int, data: bytes, sha256: Optional[str] = None) -> dict:
+        """Store one chunk at `offset`, verifying it against `sha256` when given."""
+        digest = hashlib.sha256(data).hexdigest()
+        if sha256 is not None and sha256.lower() != digest:
+            raise UploadError("Chunk hash mismatch")
+
+        with self._locked(upload_id) as state:
+            if state["complete"]:
+                raise UploadError("Upload is already complete")
+            if state.get("sealed"):
+                raise UploadError("Upload is being completed")
+            chunk_size = state["chunk_size"]
+            if offset < 0 or offset % chunk_size:
+                raise UploadError(f"Chunk offset must be a multiple of {chunk_size}")
+            expected = min(chunk_size, state["size"] - offset)
+            if expected <= 0 or len(data) != expected:
+                raise UploadError(f"Chunk at offset {offset} must be {max(expected, 0)} bytes")
+
+            duplicate = state["chunks"].get(str(offset)) == digest
+            if not duplicate:
+                with open(self.data_path(upload_id), "r+b") as f:
+                    os.pwrite(f.fileno(), data, offset)
+                state["chunks"][str(offset)] = digest
+            result = self.describe(state)
+        result["duplicate"] = duplicate
+        return result
+
+    def status(self, upload_id: str) -> dict:
+        with self._locked(upload_id) as state:
+            return self.describe(state)
+
+    def complete(self, upload_id: str, sha256: Optional[str] = None) -> dict:
+        """
+        Check every chunk arrived, hash the assembled file once and mark it complete.
+
+        The upload is sealed against new chunks first, so the (possibly 1 GB)
+        file is hashed without holding the lock. This blocks for the whole
+        hash; async handlers should run it in a worker thread.
+        """
+        with self._locked(upload_id) as state:
+            if state["complete"]:
+                return self.describe(state)
+            missing = self._missing(state)
+            if missing:
+                raise UploadError(f"Upload is missing {len(missing)} chunk(s), first at offset {missing[0]}")
+            state["sealed"] = True
+
+        hasher = hashlib.sha256()
+        with open(self.data_path(upload_id), "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+
+        matches = sha256 is None or sha256.lower() == digest
+        with self._locked(upload_id) as state:
+            if state["complete"]:
+                return self.describe(state)
+            # On a mismatch the upload is unsealed so the client can resend chunks
+            state["sealed"] = matches
+            state["complete"] = matches
+            state["sha256"] = digest if matches else None
+            result = self.describe(state)
+        if not matches:
+            raise UploadError("File hash mismatch; resend the corrupted chunks")
+        return result
+
+    def completed(self, upload_id: str) -> dict:
+        """Metadata of a completed upload, for analysis by reference."""
+        state = self.status(upload_id)
+        if not state["complete"]:
+            raise UploadError("Upload is not complete")
+        return state
+
+    @contextmanager
+    def reading(self, upload_id: str):
+        """
+        Hold a completed upload open for reading; yields its metadata.
+
+        A reader marker in the upload's directory is locked for the whole
+        block, so no worker deletes or expires the upload meanwhile. A marker
+        left behind by a crashed process is no longer locked and is ignored.
+        """
+        readers = os.path.join(self._dir(upload_id), "readers")
+        with self._locked(upload_id) as state:
+            if not state["complete"]:
+                raise UploadError("Upload is not complete")
+            os.makedirs(readers, exist_ok=True)
+            marker_path = os.path.join(readers, uuid.uuid4().hex)
+            marker = open(marker_path, "w")
+            fcntl.flock(marker, fcntl.LOCK_SH)
+            result = self.describe(state)
+        try:
+            yield result
+        finally:
+            try:
+                os.remove(marker_path)
+            except FileNotFoundError:
+                pass
+            marker.close()
+
+    def _being_read(self, upload_id: str) -> bool:
+        # Called with the upload locked, so no new reader can register meanwhile
+        readers = os.path.join(self._dir(upload_id), "readers")
+        try:
+            names = os.listdir(readers)
+        except FileNotFoundError:
+            return False
+        for name in names:
+            try:
+                with open(os.path.join(readers, name), "a") as marker:
+                    try:
+                        fcntl.flock(marker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return True
+            except FileNotFoundError:
+                continue
+            os.remove(os.path.join(readers, name))
+        return False
+
+    def delete(self, upload_id: str):
+        """Remove an upload, unless a job or a running analysis still reads it."""
+        if not self._remove(upload_id):
+            raise UploadInUse("Upload is in use by a queued or running analysis")
+
+    def _remove(self, upload_id: str, expired_before: Optional[float] = None) -> bool:
+        """
+        Delete an upload under its lock unless it is in use; with
+        `expired_before`, only if not touched since. Returns False if it was
+        kept because it is in use.
+        """
+        try:
+            lock = open(os.path.join(self._dir(upload_id), "lock"), "a")
+        except FileNotFoundError:
+            return True
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if expired_before is not None:
+                try:
+                    if os.path.getmtime(os.path.join(self._dir(upload_id), "upload.json")) > expired_before:
+                        return True
+                except FileNotFoundError:
+                    pass
+            if self.in_use(upload_id) or self._being_read(upload_id):
+                return False
+            shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        return True
+
+    def cleanup_expired(self):
+        """Remove uploads that have not been touched for `ttl_seconds` and are not in use."""
+        expired_before = time.time() - self.ttl_seconds
+        for upload_id in os.listdir(self.root):
+            if not UPLOAD_ID_PATTERN.match(upload_id):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self._dir(upload_id), "upload.json")) > expired_before:
+                    continue
+            except OSError:
+                # Not created yet, or already removed; a directory without state expires by its own mtime
+                try:
+                    if os.path.getmtime(self._dir(upload_id)) > expired_before:
+                        continue
+                except OSError:
+                    continue
+            self._remove(upload_id, expired_before)
+
+    @staticmethod
+    def _missing(state: dict) -> list:
+        return [offset for offset in range(0, state["size"], state["chunk_size"])
+                if str(offset) not in state["chunks"]]
+
+    def describe(self, state: dict) -> dict:
+        """Public view of an upload's progress."""
+        received = sorted(int(offset) for offset in state["chunks"])
+        return {
+            "upload_id": state["upload_id"],
+            "filename": state["filename"],
+            "content_type": state["content_type"],
+            "size": state["size"],
+            "chunk_size": state["chunk_size"],
+            "received_offsets": received,
+            "received_bytes": sum(min(state["chunk_size"], state["size"] - o) for o in received),
+            "missing_offsets": self._missing(state),
+            "complete": state["complete"],
+            "sha256": state["sha256"],
+        }
@@ -0,0 +1,154 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Schema for the append-only conversation log. Rows are never updated in place;
+# the autoincrement id gives a global append order that every worker agrees on.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turns_session ON turns (session_id, id);
+"""
+
+
+class ConversationStore:
+    """
+    Durable conversation log backed by SQLite in WAL mode.
+
+    Appends are buffered in memory and committed together once `batch_size`
+    messages are pending or the oldest pending message is `flush_interval`
+    seconds old. Every uvicorn worker opens its own connection to the same
+    file, so any worker can serve any session; a turn written by one worker
+    becomes visible to the others within `flush_interval` seconds. A
+    `flush_interval` of 0 disables time-based commits entirely.
+
+    A batch that fails to commit is logged and put back in front of the
+    pending messages, and committed again with them after `retry_interval`
+    seconds doubling up to `max_retry_interval` while the failures last.
+    Messages still failing when the store is closed are logged as lost.
+    """
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.05,
+                 retry_interval: float = 1.0, max_retry_interval: float = 30.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self.failed_batches = 0
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """Bound the commit delay for messages that never fill a batch."""
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def append(self, session_id: str, role: str, content: str):
+        """Queue a single message for the session."""
+        self.append_many(session_id, [(role, content)])
+
+    def append_many(self, session_id: str, messages: List[Tuple[str, str]]):
+        """Queue several messages for the session, preserving their order."""
+        now = time.time()
+        with self._lock:
+            self._pending.extend((session_id, role, content, now) for role, content in messages)
+            should_flush = (
+                len(self._pending) >= self.batch_size
+                or (self.flush_interval > 0 and now - self._pending[0][3] >= self.flush_interval)
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self, force: bool = False):
+        """
+        Commit every pending message in a single transaction.
+
+        After a failed commit nothing is attempted until the retry is due,
+        unless `force` is set.
+        """
+        with self._lock:
+            if not self._pending or (not force and time.time() < self._retry_at):
+                return
+            batch, self._pending = self._pending, []
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO turns (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        batch,
+                    )
+                self._failures = 0
+                self._retry_at = 0.0
+            except sqlite3.Error:
+                self._failures += 1
+                self.failed_batches += 1
+                self._pending = batch
+                delay = min(self.retry_interval * 2 ** (self._failures - 1), self.max_retry_interval)
+                self._retry_at = time.time() + delay
+                logger.exception("Commit of %d messages to %s failed (attempt %d), retrying in %.1fs",
+                                 len(batch), self.path, self._failures, delay)
+
+    def load_window(self, session_id: str, max_messages: int) -> List[Tuple[str, str]]:
+        """
+        Return the last `max_messages` messages of a session, oldest first.
+
+        Only the requested window is read from disk; pending appends from this
+        process are committed first so a worker always sees its own writes
+        (except while their commit is failing and waiting to be retried).
+        """
+        if max_messages <= 0:
+            return []
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, max_messages),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        """Number of committed messages, optionally for a single session."""
+        self.flush()
+        with self._lock:
+            if session_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def close(self):
+        """Flush pending messages and close the connection."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=1.0)
+        self.flush(force=True)
+        with self._lock:
+            if self._pending:
+                self.lost += len(self._pending)
+                logger.error("Closing conversation store %s with %d uncommitted messages", self.path,
+                             len(self._pending))
+                self._pending = []
+            self._conn.close()
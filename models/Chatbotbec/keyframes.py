@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class Keyframe:
+    timestamp: float  # seconds from the start of the video
+    jpeg: bytes
+    reason: str       # "scene" or "uniform"
+    score: float = 0.0
+
+
+def _signature(frame: np.ndarray) -> np.ndarray:
+    """Normalized HSV histogram of a tiny copy of the frame, used for scene-change scoring."""
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    # Value is included so brightness changes (e.g. slide transitions) register
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, [8, 4, 8], [0, 180, 0, 256, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+def _encode(frame: np.ndarray, max_width: int, jpeg_quality: int) -> bytes:
+    height, width = frame.shape[:2]
+    if width > max_width:
+        frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not ok:
+        raise ValueError("Failed to encode keyframe as JPEG")
+    return buffer.tobytes()
+
+
+def extract_keyframes(
+    path: str,
+    max_frames: int = 32,
+    analysis_fps: float = 2.0,
+    scene_threshold: float = 0.35,
+    max_width: int = 512,
+    jpeg_quality: int = 80,
+    start: float = 0.0,
+    end: Optional[float] = None,
+) -> List[Keyframe]:
+    """
+    Pick a bounded set of downscaled JPEG keyframes from a video.
+
+    Frames are inspected at `analysis_fps` (other frames are only grabbed,
+    not decoded into images). Half of the budget goes to uniformly spaced
+    frames so slow lectures are still covered; the rest goes to the
+    strongest scene changes, scored by the Bhattacharyya distance between
+    colour histograms of consecutive inspected frames. Only the range from
+    `start` to `end` seconds is inspected; pass `end` when the duration is
+    already known.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video for keyframe extraction")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        # Without a frame count video_duration reads the whole file, so only
+        # ask for it when the caller did not bound the range; reads past the
+        # end of the video simply stop the loop
+        if end is None:
+            end = video_duration(path)
+
+        first_frame = int(start * fps)
+        if first_frame:
+            _seek(cap, start, first_frame)
+            first_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        stride = max(1, int(round(fps / analysis_fps)))
+
+        uniform_budget = max(1, max_frames // 2)
+        span = (end - start) if end else 0.0
+        uniform_times = [start + span * (i + 0.5) / uniform_budget for i in range(uniform_budget)] if span else []
+
+        uniform: List[Keyframe] = []
+        scenes: List[Keyframe] = []
+        previous = None
+        index = first_frame
+        while True:
+            if end and index / fps > end:
+                break
+            if (index - first_frame) % stride:
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            timestamp = index / fps
+            index += 1
+
+            signature = _signature(frame)
+            if previous is None:
+                score = 1.0
+            else:
+                score = float(cv2.compareHist(previous, signature, cv2.HISTCMP_BHATTACHARYYA))
+            previous = signature
+
+            if uniform_times and timestamp >= uniform_times[0]:
+                uniform_times.pop(0)
+                uniform.append(Keyframe(timestamp, _encode(frame, max_width, jpeg_quality), "uniform", score))
+            elif score >= scene_threshold:
+                scenes.append(Keyframe(timestamp, _encode(frame, max_width, jpeg_quality), "scene", score))
+                # Keep only the strongest scene changes so memory stays bounded
+                if len(scenes) > max_frames:
+                    scenes.remove(min(scenes, key=lambda k: k.score))
+    finally:
+        cap.release()
+
+    scene_budget = max(0, max_frames - len(uniform))
+    scenes = sorted(scenes, key=lambda k: k.score, reverse=True)[:scene_budget]
+    return sorted(uniform + scenes, key=lambda k: k.timestamp)
+
+
+def _seek(cap, seconds: float, frame: int):
+    """Move to `seconds` by timestamp, or by grabbing frames when the container cannot seek."""
+    if cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000) and cap.get(cv2.CAP_PROP_POS_FRAMES) > 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame):
+        if not cap.grab():
+            break
+
+
+def video_duration(path: str) -> float:
+    """
+    Duration in seconds (0.0 if unknown).
+
+    Taken from the container's frame count when it has one. Many webm files
+    (e.g. from browser MediaRecorder) report a frame count of zero or less, so
+    the stream is then grabbed through without decoding and the timestamp of
+    its last frame is used.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        if frame_count > 0:
+            return frame_count / fps
+        frames, last_timestamp = 0, 0.0
+        while cap.grab():
+            frames += 1
+            last_timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        return max(last_timestamp, frames / fps)
+    finally:
+        cap.release()
+
+
+def transcribe_audio(path: str, model_name: str = "base") -> str:
+    """Transcribe the video's audio track locally with Whisper (optional dependency)."""
+    try:
+        import whisper
+    except ImportError:
+        raise RuntimeError("Audio transcription requires the openai-whisper package")
+    return whisper.load_model(model_name).transcribe(path)["text"].strip()
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
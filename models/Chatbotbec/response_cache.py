@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# Large Mersenne prime used for the MinHash permutations (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+# Characters that make a token code or math: it must match exactly, never approximately
+CODE_CHARS = set("+-*/=<>^%&|_\\{}[]()#@$~.:")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def exact_tokens(text: str) -> tuple:
+    """
+    Number and code-like tokens of the question, in order.
+
+    "what is 2+2?" and "what is 2+2+2" normalize to nearly the same words
+    but need different answers, so these tokens are compared verbatim.
+    """
+    tokens = []
+    for token in text.lower().split():
+        token = token.strip("?!.,;:'\"")
+        if any(c.isdigit() for c in token) or any(c in CODE_CHARS for c in token):
+            tokens.append(token)
+    return tuple(tokens)
+
+
+class ResponseCache:
+    """
+    In-memory cache of LLM answers for stateless questions.
+
+    Lookups first try an exact match on the normalized question and then a
+    near-duplicate match using MinHash signatures over word unigrams and bigrams.
+    Signatures live in a preallocated numpy matrix so a near-duplicate lookup
+    is one vectorized comparison against every cached entry. A near-duplicate
+    must also have exactly the same number and code-like tokens (see
+    `exact_tokens`), and questions shorter than `min_words` words only ever
+    match exactly. Entries expire after `ttl_seconds` and the least recently
+    used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 60 * 60,
+        similarity_threshold: float = 0.85,
+        num_perm: int = 128,
+        shingle_size: int = 2,
+        min_words: int = 5,
+        seed: int = 1,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+
+        rng = np.random.default_rng(seed)
+        # Coefficients stay below 2^32 so (a * x + b) never overflows uint64
+        self._perm_a = rng.integers(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self._signatures = np.zeros((max_entries, num_perm), dtype=np.uint64)
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._stored_at = np.zeros(max_entries, dtype=np.float64)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # (normalized question, exact tokens) -> (slot, response, stored_at), in LRU order
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._slot_keys = [None] * max_entries
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        """MinHash signature of the question's word n-grams, 1 to `shingle_size` words long."""
+        words = normalized.split() or [""]
+        shingles = {" ".join(words[i:i + n])
+                    for n in range(1, self.shingle_size + 1) for i in range(len(words) - n + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a * x + b) mod p for every shingle and permutation, then min per permutation
+        permuted = (hashes[:, None] * self._perm_a[None, :] + self._perm_b[None, :]) % MERSENNE_PRIME
+        return (permuted & MAX_HASH).min(axis=0)
+
+    def _remove(self, key: tuple):
+        slot, _, _ = self._entries.pop(key)
+        self._active[slot] = False
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def _expire(self, key: tuple, now: float) -> bool:
+        """Drop the entry if it has outlived the TTL; expiry is checked lazily on lookup."""
+        if now - self._entries[key][2] < self.ttl_seconds:
+            return False
+        self._remove(key)
+        self.expirations += 1
+        return True
+
+    def get(self, question: str) -> Optional[str]:
+        """Return a cached response for the question or a near-duplicate of it."""
+        normalized = normalize_question(question)
+        tokens = exact_tokens(question)
+        key = (normalized, tokens)
+        now = time.time()
+        with self._lock:
+            if key in self._entries and not self._expire(key, now):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return self._entries[key][1]
+
+            near_allowed = len(normalized.split()) >= self.min_words and self.similarity_threshold < 1.0
+            if self._entries and near_allowed:
+                signature = self._signature(normalized)
+                similarity = (self._signatures == signature).mean(axis=1)
+                stale = ~self._active | (now - self._stored_at >= self.ttl_seconds)
+                similarity[stale] = -1.0
+                candidates = np.flatnonzero(similarity >= self.similarity_threshold)
+                for slot in candidates[np.argsort(-similarity[candidates])]:
+                    match = self._slot_keys[slot]
+                    if match[1] == tokens:
+                        self._entries.move_to_end(match)
+                        self.near_hits += 1
+                        return self._entries[match][1]
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, response: str):
+        """Store the response, evicting the least recently used entry if full."""
+        normalized = normalize_question(question)
+        key = (normalized, exact_tokens(question))
+        signature = self._signature(normalized)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            self._signatures[slot] = signature
+            now = time.time()
+            self._active[slot] = True
+            self._stored_at[slot] = now
+            self._slot_keys[slot] = key
+            self._entries[key] = (slot, response, now)
+
+    def stats(self) -> dict:
+        """Hit-rate metrics for monitoring."""
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+                "min_words": self.min_words,
+                "ttl_seconds": self.ttl_seconds,
+            }
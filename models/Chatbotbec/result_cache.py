@@ -0,0 +1,119 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class DiskLRUCache:
+    """
+    JSON result cache stored as one file per key, bounded by total size and entry count.
+
+    Recency is tracked with each file's mtime, which is bumped on every hit, so
+    the least recently used entries are the ones evicted once `max_bytes` or
+    `max_entries` is exceeded. Usage is always read back from the directory
+    under an exclusive file lock, so several worker processes can share one
+    cache directory without overrunning its bounds, and the cache survives
+    restarts. Hit and miss counts are per process.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024, max_entries: int = 10_000):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the directory's contents across threads and processes."""
+        with self._lock, open(os.path.join(self.root, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _entries(self) -> dict:
+        """key -> (size, last_used) for every entry currently on disk."""
+        entries = {}
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        data = json.dumps(value, default=str)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        with self._locked():
+            os.replace(tmp_path, path)
+            self._evict(self._entries())
+
+    def _evict(self, entries: dict):
+        # Called with the directory locked
+        total = sum(size for size, _ in entries.values())
+        count = len(entries)
+        if total <= self.max_bytes and count <= self.max_entries:
+            return
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            count -= 1
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(entries),
+                "bytes": sum(size for size, _ in entries.values()),
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -5,7 +5,10 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from langchain_community.tools.tavily_search import TavilySearchResults
 
+from zenlearn_common import cassette
+
 load_dotenv()
+cassette.ensure_offline_credentials("TAVILY_API_KEY")
 
 app = FastAPI()
 
@@ -38,7 +41,12 @@ async def search_products(search_query: SearchQuery):
         )
 
         # Execute search and get results
-        search_results = search_tool.invoke({"query": search_query.query})
+        search_results = await cassette.acall(
+            "tavily",
+            {"query": search_query.query, "max_results": 3, "search_depth": "advanced"},
+            lambda: search_tool.invoke({"query": search_query.query}),
+            synthetic=lambda: cassette.synthetic_search_results(search_query.query),
+        )
 
         return {
             "status": "success",
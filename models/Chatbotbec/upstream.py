@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """Raised when every upstream attempt failed, timed out or was short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending traffic to an upstream after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens for
+    `reset_timeout` seconds. After that a single call is let through as a
+    trial (half-open) while every other call is still refused; success
+    closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def available(self) -> bool:
+        """Whether a call could be let through now, without claiming the half-open trial."""
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial_in_flight)
+
+    def allow(self) -> bool:
+        """Let a call through; in half-open state only the one that claims the trial."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give up an allowed call without an outcome (e.g. it was cancelled)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class Upstream:
+    """One callable target (e.g. a ChatGroq model) with its own breaker and latency stats."""
+
+    def __init__(self, name: str, client: Any, breaker: CircuitBreaker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+
+class UpstreamPolicy:
+    """
+    Runs a blocking upstream call with timeouts, hedging and fallback.
+
+    The first attempt goes to the primary upstream. If it has not answered
+    after the hedge delay (the observed p95 latency of the primary, clamped
+    to [min_hedge_delay, max_hedge_delay]), a second request is sent to the
+    next healthy upstream. The first successful answer wins. Failed or timed
+    out attempts trip that upstream's circuit breaker and are replaced by the
+    next fallback; every upstream is tried at most once per call, and at most
+    `max_attempts` attempts are started.
+
+    Attempts run on the policy's own pool of `max_threads` threads. A thread
+    cannot be interrupted, so an abandoned hedge or timed-out attempt keeps
+    its thread until the client gives up; give the clients a timeout of
+    about `attempt_timeout` so they do.
+    """
+
+    def __init__(
+        self,
+        upstreams: List[Upstream],
+        attempt_timeout: float = 30.0,
+        hedge_percentile: float = 95.0,
+        min_hedge_delay: float = 0.5,
+        max_hedge_delay: float = 10.0,
+        max_attempts: int = 3,
+        max_threads: int = 32,
+    ):
+        self.upstreams = upstreams
+        self.attempt_timeout = attempt_timeout
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.max_attempts = max_attempts
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="upstream")
+        self.hedges_sent = 0
+        self.secondary_wins = 0
+
+    def hedge_delay(self, upstream: Upstream) -> float:
+        observed = upstream.latency.percentile(self.hedge_percentile)
+        if observed is None:
+            return self.max_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, observed))
+
+    def _candidates(self) -> List[Upstream]:
+        """Upstreams that may take a call, in priority order, each at most once."""
+        return [u for u in self.upstreams if u.breaker.available()][:self.max_attempts]
+
+    async def _attempt(self, upstream: Upstream, fn: Callable[[Any], Any]):
+        upstream.calls += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            result = await asyncio.wait_for(loop.run_in_executor(self.executor, fn, upstream.client),
+                                            self.attempt_timeout)
+        except asyncio.CancelledError:
+            # A losing hedge: no outcome to record, but a half-open trial must be freed
+            upstream.breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            upstream.timeouts += 1
+            upstream.breaker.record_failure()
+            raise UpstreamError(f"{upstream.name} timed out after {self.attempt_timeout}s")
+        except Exception as e:
+            upstream.errors += 1
+            upstream.breaker.record_failure()
+            raise UpstreamError(f"{upstream.name} failed: {str(e)}") from e
+        upstream.latency.record(time.perf_counter() - started)
+        upstream.breaker.record_success()
+        return result
+
+    async def call(self, fn: Callable[[Any], Any]):
+        """Call `fn(client)` against the upstreams and return the first successful result."""
+        candidates = self._candidates()
+        if not candidates:
+            raise UpstreamError("All upstreams are unavailable (circuit open)")
+
+        pending = {}
+        errors = []
+
+        def launch():
+            """Start an attempt on the next upstream that still allows one, or return None."""
+            while candidates:
+                upstream = candidates.pop(0)
+                # Claims the single trial call of a half-open breaker
+                if upstream.breaker.allow():
+                    task = asyncio.ensure_future(self._attempt(upstream, fn))
+                    pending[task] = upstream
+                    return upstream
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise UpstreamError("All upstreams are unavailable (circuit open)")
+        try:
+            while pending:
+                timeout = self.hedge_delay(primary) if candidates else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual: send a hedged request
+                    hedge = launch()
+                    if hedge is not None:
+                        self.hedges_sent += 1
+                        logger.info(f"Hedging {primary.name} with {hedge.name}")
+                    continue
+                for task in done:
+                    upstream = pending.pop(task)
+                    if task.exception() is None:
+                        if upstream is not primary:
+                            self.secondary_wins += 1
+                        return task.result()
+                    errors.append(str(task.exception()))
+                    logger.warning(str(task.exception()))
+                    if candidates:
+                        launch()
+        finally:
+            # Losing attempts are abandoned; their threads finish in the background,
+            # bounded by the client timeout
+            for task in pending:
+                task.cancel()
+        raise UpstreamError("; ".join(errors))
+
+    def stats(self) -> dict:
+        return {
+            "hedges_sent": self.hedges_sent,
+            "secondary_wins": self.secondary_wins,
+            "upstreams": [
+                {
+                    "name": u.name,
+                    "state": u.breaker.state,
+                    "calls": u.calls,
+                    "errors": u.errors,
+                    "timeouts": u.timeouts,
+                    "p50_seconds": u.latency.percentile(50),
+                    "p95_seconds": u.latency.percentile(95),
+                }
+                for u in self.upstreams
+            ],
+        }
+
+
+def build_policy(models: List[str], make_client: Callable[[str, float], Any]) -> UpstreamPolicy:
+    """
+    Policy over one upstream per model, primary first, tuned by UPSTREAM_*
+    environment variables. `make_client(model, timeout)` builds a client
+    whose own request timeout is `timeout` seconds.
+    """
+    attempt_timeout = float(os.getenv("UPSTREAM_ATTEMPT_TIMEOUT", "30"))
+    upstreams = [
+        Upstream(
+            model,
+            make_client(model, attempt_timeout),
+            CircuitBreaker(
+                failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30")),
+            ),
+        )
+        for model in models if model
+    ]
+    return UpstreamPolicy(
+        upstreams,
+        attempt_timeout=attempt_timeout,
+        hedge_percentile=float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "95")),
+        min_hedge_delay=float(os.getenv("UPSTREAM_MIN_HEDGE_DELAY", "0.5")),
+        max_hedge_delay=float(os.getenv("UPSTREAM_MAX_HEDGE_DELAY", "10")),
+        max_attempts=int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3")),
+        max_threads=int(os.getenv("UPSTREAM_MAX_THREADS", "32")),
+    )
@@ -0,0 +1,80 @@
+"""
+Local stand-in for the Groq chat completions API with configurable slowness and failures.
+
+Point the chat services at it with GROQ_API_BASE=http://localhost:9000 and set
+STUB_PROFILE to a JSON object keyed by model name, for example:
+
+    STUB_PROFILE='{"deepseek-r1-distill-llama-70b": {"latency": 0.8, "slow_rate": 0.1,
+                   "slow_latency": 8.0, "error_rate": 0.05}}'
+    uvicorn upstream_stub:app --port 9000
+
+Models missing from the profile use DEFAULT_PROFILE.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+
+DEFAULT_PROFILE = {
+    "latency": 0.5,       # median response time in seconds
+    "jitter": 0.1,        # uniform +/- jitter in seconds
+    "slow_rate": 0.0,     # fraction of requests that take slow_latency instead
+    "slow_latency": 10.0,
+    "error_rate": 0.0,    # fraction of requests answered with HTTP 503
+}
+
+PROFILES = json.loads(os.getenv("STUB_PROFILE", "{}"))
+
+app = FastAPI(title="Groq Upstream Stub")
+
+
+def profile_for(model: str) -> dict:
+    return {**DEFAULT_PROFILE, **PROFILES.get(model, {})}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Answer like the OpenAI-compatible Groq endpoint after a simulated delay."""
+    body = await request.json()
+    model = body.get("model", "unknown")
+    profile = profile_for(model)
+
+    if random.random() < profile["slow_rate"]:
+        delay = profile["slow_latency"]
+    else:
+        delay = profile["latency"] + random.uniform(-profile["jitter"], profile["jitter"])
+    await asyncio.sleep(max(0.0, delay))
+
+    if random.random() < profile["error_rate"]:
+        raise HTTPException(status_code=503, detail=f"Simulated failure for {model}")
+
+    last_message = body.get("messages", [{}])[-1].get("content", "")
+    content = f"[stub:{model}] You said: {last_message[-200:]}"
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": len(last_message.split()), "completion_tokens": len(content.split()),
+                  "total_tokens": len(last_message.split()) + len(content.split())},
+    }
+
+
+@app.get("/stub/profile")
+async def get_profiles():
+    """Show the latency and failure profile in effect."""
+    return {"default": DEFAULT_PROFILE, "models": PROFILES}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=9000)
@@ -1,5 +1,7 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Request, Header
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
 import logging
 import google.generativeai as genai
@@ -7,9 +9,22 @@ from dotenv import load_dotenv
 import tempfile
 from typing import Optional
 import shutil
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+
+from zenlearn_common import cassette
+from keyframes import extract_keyframes, format_timestamp, transcribe_audio, video_duration
+from video_ingest import UploadTooLarge, map_file, spool_upload
+from video_jobs import JobQueue
+from result_cache import DiskLRUCache
+from chunked_upload import ChunkedUploadStore, UploadError, UploadInUse, UploadNotFound
 
 # Load environment variables
 load_dotenv()
+cassette.ensure_offline_credentials("GEMINI_API_KEY")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -41,14 +56,165 @@ genai.configure(api_key=GEMINI_API_KEY)
 
 # Constants
 MAX_VIDEO_SIZE = 20 * 1024 * 1024  # 20MB limit
+# Keyframe mode only sends sampled JPEGs, so the upload itself can be much larger
+MAX_KEYFRAME_VIDEO_SIZE = int(os.getenv("MAX_KEYFRAME_VIDEO_SIZE", str(1024 * 1024 * 1024)))
+MAX_KEYFRAMES = int(os.getenv("MAX_KEYFRAMES", "32"))
+# Modes that sample frames locally instead of uploading the video itself
+LOCAL_SAMPLING_MODES = ("keyframes", "segments")
+MODE_PATTERN = "^(video|keyframes|segments)$"
+# Segment mode: analyze time slices concurrently, then merge the explanations
+SEGMENT_CONCURRENCY = int(os.getenv("VIDEO_SEGMENT_CONCURRENCY", "4"))
+MAX_SEGMENTS = int(os.getenv("VIDEO_MAX_SEGMENTS", "24"))
+KEYFRAMES_PER_SEGMENT = int(os.getenv("VIDEO_KEYFRAMES_PER_SEGMENT", "8"))
+# Whole videos go through the File API; uploads are processed before use
+GEMINI_FILE_POLL_SECONDS = float(os.getenv("GEMINI_FILE_POLL_SECONDS", "2"))
+GEMINI_FILE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_FILE_TIMEOUT_SECONDS", "300"))
 ALLOWED_EXTENSIONS = [".mp4", ".mov", ".avi", ".webm"]
 DEFAULT_MODEL = "gemini-2.0-flash"  # Changed to Gemini 2.0 Flash
 
+def build_keyframe_parts(video_path: str, prompt: Optional[str], transcribe: bool):
+    """Content parts made of sampled keyframes (and optionally the transcript) instead of the video."""
+    keyframes = extract_keyframes(video_path, max_frames=MAX_KEYFRAMES)
+    if not keyframes:
+        raise HTTPException(status_code=400, detail="Could not decode any frames from the video")
+    
+    content_parts = []
+    if prompt:
+        content_parts.append(prompt)
+    content_parts.append(
+        f"The following {len(keyframes)} images are keyframes sampled from a video, "
+        "each preceded by its timestamp. Explain the video based on them."
+    )
+    for keyframe in keyframes:
+        content_parts.append(f"Frame at {format_timestamp(keyframe.timestamp)}:")
+        content_parts.append({"mime_type": "image/jpeg", "data": keyframe.jpeg})
+    
+    if transcribe:
+        try:
+            transcript = transcribe_audio(video_path)
+        except RuntimeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if transcript:
+            content_parts.append(f"Audio transcript:\n{transcript}")
+    
+    return content_parts, {
+        "frames_sent": len(keyframes),
+        "payload_bytes": sum(len(k.jpeg) for k in keyframes),
+    }
+
+# Analysis results keyed on video content hash, prompt, model and mode
+result_cache = DiskLRUCache(
+    os.getenv("VIDEO_RESULT_CACHE_DIR", "video_result_cache"),
+    max_bytes=int(os.getenv("VIDEO_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    max_entries=int(os.getenv("VIDEO_RESULT_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# Segment calls from every request share one bounded pool, so concurrent long videos
+# cannot multiply the number of in-flight Gemini calls
+segment_executor = ThreadPoolExecutor(max_workers=max(1, SEGMENT_CONCURRENCY), thread_name_prefix="video-segment")
+
+def plan_segments(duration: float, segment_seconds: float):
+    """Split [0, duration) into equal slices, lengthening them if there would be too many."""
+    segment_seconds = max(segment_seconds, duration / MAX_SEGMENTS, 1.0)
+    segments = []
+    start = 0.0
+    while start < duration:
+        segments.append((start, min(start + segment_seconds, duration)))
+        start += segment_seconds
+    return segments
+
+def analyze_segments(model, video_path: str, video_sha256: str, model_name: str,
+                     prompt: Optional[str], segment_seconds: float) -> dict:
+    """
+    Map/reduce analysis for long videos.
+    
+    Each time segment is reduced to keyframes and explained by its own
+    Gemini call on `segment_executor`, with at most SEGMENT_CONCURRENCY calls
+    in flight across all requests. A final call merges the per-segment
+    explanations into one timestamped summary. This blocks until every
+    segment is done, so call it from a worker thread, never the event loop.
+    """
+    started = time.perf_counter()
+    duration = video_duration(video_path)
+    if duration <= 0:
+        raise HTTPException(status_code=400, detail="Could not determine the video duration")
+    segments = plan_segments(duration, segment_seconds)
+    
+    def analyze_segment(bounds):
+        start, end = bounds
+        segment_started = time.perf_counter()
+        keyframes = extract_keyframes(video_path, max_frames=KEYFRAMES_PER_SEGMENT, start=start, end=end)
+        extracted = time.perf_counter()
+        
+        content_parts = [
+            f"These images are keyframes from the part of a video between "
+            f"{format_timestamp(start)} and {format_timestamp(end)}, each preceded by its timestamp. "
+            "Explain what happens in this part."
+        ]
+        if prompt:
+            content_parts.insert(0, prompt)
+        for keyframe in keyframes:
+            content_parts.append(f"Frame at {format_timestamp(keyframe.timestamp)}:")
+            content_parts.append({"mime_type": "image/jpeg", "data": keyframe.jpeg})
+        
+        explanation = cassette.call(
+            "gemini",
+            {"model": model_name, "prompt": prompt, "mode": "segment", "video_sha256": video_sha256,
+             "start": start, "end": end, "frames": KEYFRAMES_PER_SEGMENT},
+            lambda: model.generate_content(content_parts).text,
+            synthetic=lambda: cassette.synthetic_chat_response(f"segment {format_timestamp(start)}"),
+        ) if keyframes else ""
+        finished = time.perf_counter()
+        return {
+            "start": start,
+            "end": end,
+            "explanation": explanation,
+            "frames_sent": len(keyframes),
+            "timings": {
+                "extract_seconds": extracted - segment_started,
+                "generate_seconds": finished - extracted,
+                "total_seconds": finished - segment_started,
+            },
+        }
+    
+    segment_results = list(segment_executor.map(analyze_segment, segments))
+    mapped = time.perf_counter()
+    
+    # Reduce: merge the per-segment explanations into one timestamped summary
+    notes = "\n\n".join(
+        f"[{format_timestamp(r['start'])} - {format_timestamp(r['end'])}]\n{r['explanation']}"
+        for r in segment_results if r["explanation"]
+    )
+    merge_prompt = (
+        "Below are explanations of consecutive parts of one video. Merge them into a single "
+        "coherent explanation of the whole video with a timestamped summary of the key moments."
+        + (f"\nThe viewer asked: {prompt}" if prompt else "")
+        + f"\n\n{notes}"
+    )
+    text_explanation = cassette.call(
+        "gemini",
+        {"model": model_name, "mode": "segment-merge", "prompt": merge_prompt},
+        lambda: model.generate_content(merge_prompt).text,
+        synthetic=lambda: notes,
+    )
+    finished = time.perf_counter()
+    
+    return {
+        "text_explanation": text_explanation,
+        "segments": segment_results,
+        "timings": {
+            "map_seconds": mapped - started,
+            "reduce_seconds": finished - mapped,
+            "total_seconds": finished - started,
+            "segment_seconds_sum": sum(r["timings"]["total_seconds"] for r in segment_results),
+            "concurrency": SEGMENT_CONCURRENCY,
+        },
+    }
+
 async def validate_file(
-    file: UploadFile = File(...),
-    max_size: int = MAX_VIDEO_SIZE
+    file: UploadFile = File(...)
 ):
-    """Validate the uploaded video file."""
+    """Validate the uploaded video file's format; size is enforced while spooling."""
     # Check extension
     file_ext = os.path.splitext(file.filename)[1].lower()
     if file_ext not in ALLOWED_EXTENSIONS:
@@ -57,23 +223,154 @@ async def validate_file(
             detail=f"Unsupported file format. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Check file size (read a chunk to determine size without loading entire file)
-    content = await file.read(max_size + 1)
-    await file.seek(0)  # Reset file pointer
+    return file
+
+@lru_cache(maxsize=16)
+def get_model(model_name: str):
+    """GenerativeModel instances are reused per model name instead of built per request."""
+    return genai.GenerativeModel(model_name)
+
+@contextmanager
+def gemini_file(video_path: str, mime_type: str):
+    """
+    Upload a spooled video through the Gemini File API and delete it afterwards.
+
+    The SDK streams the file from disk, so the video is never held in memory.
+    """
+    uploaded = genai.upload_file(video_path, mime_type=mime_type)
+    try:
+        deadline = time.monotonic() + GEMINI_FILE_TIMEOUT_SECONDS
+        while uploaded.state.name == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Gemini file {uploaded.name} still processing after {GEMINI_FILE_TIMEOUT_SECONDS:.0f}s")
+            time.sleep(GEMINI_FILE_POLL_SECONDS)
+            uploaded = genai.get_file(uploaded.name)
+        if uploaded.state.name == "FAILED":
+            raise RuntimeError(f"Gemini could not process file {uploaded.name}")
+        yield uploaded
+    finally:
+        try:
+            genai.delete_file(uploaded.name)
+        except Exception as e:
+            logger.warning(f"Could not delete Gemini file {uploaded.name}: {str(e)}")
+
+def analyze_video(
+    video_path: str,
+    content_type: Optional[str],
+    model_name: str,
+    prompt: Optional[str],
+    mode: str = "video",
+    transcribe: bool = False,
+    segment_seconds: float = 120.0,
+    video_sha256: Optional[str] = None
+) -> dict:
+    """
+    Analyze a spooled video file, serving repeated submissions from the result cache.
+    
+    Shared by the sync and job endpoints. `video_sha256` should be computed while
+    the upload streams in; it is only derived from the file here as a fallback.
+    """
+    if video_sha256 is None:
+        with map_file(video_path) as video_view:
+            video_sha256 = hashlib.sha256(video_view).hexdigest()
     
-    if len(content) > max_size:
+    cache_key = DiskLRUCache.make_key(
+        video_sha256=video_sha256,
+        model_name=model_name,
+        prompt=prompt,
+        mode=mode,
+        transcribe=transcribe if mode == "keyframes" else None,
+        segment_seconds=segment_seconds if mode == "segments" else None,
+    )
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
+    result = run_analysis(video_path, video_sha256, content_type, model_name, prompt, mode,
+                          transcribe, segment_seconds)
+    result_cache.put(cache_key, result)
+    return {**result, "cached": False}
+
+def run_analysis(
+    video_path: str,
+    video_sha256: str,
+    content_type: Optional[str],
+    model_name: str,
+    prompt: Optional[str],
+    mode: str,
+    transcribe: bool,
+    segment_seconds: float
+) -> dict:
+    """Run the Gemini analysis on a spooled video file."""
+    # Initialize the model
+    try:
+        model = get_model(model_name)
+    except Exception as e:
+        logger.error(f"Failed to initialize model {model_name}: {str(e)}")
         raise HTTPException(
-            status_code=400,
-            detail=f"Video too large. Maximum size: {max_size/1024/1024}MB"
+            status_code=400, 
+            detail=f"Invalid model name or API configuration: {str(e)}"
         )
     
-    return file
+    if mode == "segments":
+        try:
+            result = analyze_segments(model, video_path, video_sha256, model_name, prompt, segment_seconds)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Gemini API error: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error processing video with Gemini API: {str(e)}"
+            )
+        return {"model_used": model_name, "prompt_used": prompt, "mode": mode, **result}
+    
+    extraction = {}
+    
+    def generate():
+        if mode == "keyframes":
+            content_parts, summary = build_keyframe_parts(video_path, prompt, transcribe)
+            extraction.update(summary)
+            return model.generate_content(content_parts).text
+        
+        # Add the video by reference, after the prompt if provided
+        with gemini_file(video_path, content_type or "video/mp4") as video_file:
+            content_parts = [prompt, video_file] if prompt else [video_file]
+            return model.generate_content(content_parts).text
+    
+    # Generate content
+    try:
+        text_explanation = cassette.call(
+            "gemini",
+            lambda: {"model": model_name, "prompt": prompt, "mode": mode, "transcribe": transcribe,
+                     "video_sha256": video_sha256},
+            generate,
+            synthetic=lambda: cassette.synthetic_chat_response(prompt or "Explain this video"),
+        )
+        return {
+            "text_explanation": text_explanation,
+            "model_used": model_name,
+            "prompt_used": prompt,
+            "mode": mode,
+            **extraction
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Gemini API error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing video with Gemini API: {str(e)}"
+        )
 
 @app.post("/process-video/")
 async def process_video(
     file: UploadFile = Depends(validate_file),
     model_name: str = Query(DEFAULT_MODEL, description="Gemini model to use"),
-    prompt: Optional[str] = Query(None, description="Optional prompt to guide the video analysis")
+    prompt: Optional[str] = Query(None, description="Optional prompt to guide the video analysis"),
+    mode: str = Query("video", pattern=MODE_PATTERN, description="Send the whole video, sampled keyframes, or analyze segments in parallel"),
+    transcribe: bool = Query(False, description="Keyframe mode: also send a local audio transcript"),
+    segment_seconds: float = Query(120.0, gt=0, description="Segment mode: length of each analyzed time slice")
 ):
     """
     Process a video and generate a text explanation.
@@ -81,59 +378,32 @@ async def process_video(
     - **file**: The video file to analyze (MP4, MOV, AVI, WEBM)
     - **model_name**: Gemini model to use (default: gemini-2.0-flash)
     - **prompt**: Optional text to guide the analysis
+    - **mode**: "video" uploads the video itself (max 20MB); "keyframes" extracts
+      scene-change and uniformly sampled frames locally, allowing much longer videos
+    - **transcribe**: In keyframe mode, transcribe the audio locally and include it
+    - **segment_seconds**: In "segments" mode the video is split into slices of this
+      length that are analyzed concurrently and merged into a timestamped summary
     """
+    max_size = MAX_KEYFRAME_VIDEO_SIZE if mode in LOCAL_SAMPLING_MODES else MAX_VIDEO_SIZE
     temp_dir = None
     try:
         # Create a temporary directory
         temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, file.filename)
-        
-        # Save the file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        temp_path = os.path.join(temp_dir, os.path.basename(file.filename))
         
-        # Initialize the model
+        # Stream the upload to disk once, hashing it and rejecting it as soon as it exceeds the limit
+        hasher = hashlib.sha256()
         try:
-            model = genai.GenerativeModel(model_name)
-        except Exception as e:
-            logger.error(f"Failed to initialize model {model_name}: {str(e)}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid model name or API configuration: {str(e)}"
-            )
-        
-        # Process the video
-        with open(temp_path, "rb") as f:
-            video_data = f.read()
-        
-        # Prepare content parts
-        content_parts = []
-        
-        # Add prompt if provided
-        if prompt:
-            content_parts.append(prompt)
-        
-        # Add video
-        content_parts.append({
-            "mime_type": file.content_type or "video/mp4",
-            "data": video_data
-        })
+            await spool_upload(file, temp_path, max_size, hasher=hasher)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Generate content
-        try:
-            response = model.generate_content(content_parts)
-            return {
-                "text_explanation": response.text,
-                "model_used": model_name,
-                "prompt_used": prompt
-            }
-        except Exception as e:
-            logger.error(f"Gemini API error: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error processing video with Gemini API: {str(e)}"
-            )
-            
+        # Frame extraction and the Gemini calls block, so they run in a worker thread
+        return await run_in_threadpool(analyze_video, temp_path, file.content_type, model_name, prompt, mode,
+                                       transcribe, segment_seconds, video_sha256=hasher.hexdigest())
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -143,6 +413,265 @@ async def process_video(
         if temp_dir and os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
+def run_video_job(params: dict, video_path: str) -> dict:
+    """Worker entry point for queued /jobs/process-video/ submissions."""
+    return analyze_video(video_path, **params)
+
+# Background analysis queue; jobs and their uploads are kept under VIDEO_JOB_DIR
+video_jobs = JobQueue(
+    os.getenv("VIDEO_JOB_DIR", "video_jobs"),
+    run_video_job,
+    workers=int(os.getenv("VIDEO_JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("VIDEO_JOB_MAX_QUEUED", "100")),
+    ttl_seconds=float(os.getenv("VIDEO_JOB_TTL_SECONDS", "3600")),
+)
+
+@app.on_event("startup")
+def start_video_jobs():
+    video_jobs.start()
+
+@app.on_event("shutdown")
+def stop_video_jobs():
+    video_jobs.stop()
+
+def job_status(job: dict) -> dict:
+    """Public view of a job, without its result payload or internal paths."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "cancel_requested": job["cancel_requested"],
+        "error": job["error"],
+    }
+
+@app.post("/jobs/process-video/", status_code=202)
+async def submit_video_job(
+    file: UploadFile = Depends(validate_file),
+    model_name: str = Query(DEFAULT_MODEL, description="Gemini model to use"),
+    prompt: Optional[str] = Query(None, description="Optional prompt to guide the video analysis"),
+    mode: str = Query("video", pattern=MODE_PATTERN, description="Send the whole video, sampled keyframes, or analyze segments in parallel"),
+    transcribe: bool = Query(False, description="Keyframe mode: also send a local audio transcript"),
+    segment_seconds: float = Query(120.0, gt=0, description="Segment mode: length of each analyzed time slice")
+):
+    """
+    Queue a video for analysis and return a job id immediately.
+    
+    Poll `GET /jobs/{job_id}` for the status and fetch the explanation from
+    `GET /jobs/{job_id}/result` once it is done. Parameters match `/process-video/`.
+    """
+    max_size = MAX_KEYFRAME_VIDEO_SIZE if mode in LOCAL_SAMPLING_MODES else MAX_VIDEO_SIZE
+    job_id, job_dir = video_jobs.new_job_dir()
+    video_path = os.path.join(job_dir, "input" + os.path.splitext(file.filename)[1].lower())
+    try:
+        hasher = hashlib.sha256()
+        await spool_upload(file, video_path, max_size, hasher=hasher)
+        job = video_jobs.submit(job_id, video_path, {
+            "video_sha256": hasher.hexdigest(),
+            "content_type": file.content_type,
+            "model_name": model_name,
+            "prompt": prompt,
+            "mode": mode,
+            "transcribe": transcribe,
+            "segment_seconds": segment_seconds,
+        })
+    except UploadTooLarge as e:
+        video_jobs.discard(job_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    except OverflowError as e:
+        video_jobs.discard(job_id)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        video_jobs.discard(job_id)
+        logger.error(f"Failed to queue video job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return job_status(job)
+
+@app.get("/cache/stats")
+async def video_cache_stats():
+    """Hit rate and size of the video analysis result cache."""
+    return result_cache.stats()
+
+@app.get("/jobs/metrics")
+async def video_job_metrics():
+    """Queue depth, worker count and outcome counters for the job queue."""
+    return video_jobs.metrics()
+
+@app.get("/jobs/{job_id}")
+async def get_video_job(job_id: str):
+    """Status of a queued video analysis job."""
+    job = video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_video_job_result(job_id: str):
+    """Result of a finished video analysis job."""
+    job = video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job.get("status_code") or 500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@app.delete("/jobs/{job_id}")
+async def cancel_video_job(job_id: str):
+    """Cancel a queued or running video analysis job."""
+    job = video_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_status(job)
+
+def upload_in_use(upload_id: str) -> bool:
+    """Whether an unfinished job reads this upload, which keeps it from expiring or being deleted."""
+    return os.path.abspath(chunked_uploads.data_path(upload_id)) in video_jobs.active_inputs()
+
+# Resumable chunked uploads, analyzed by reference once complete
+chunked_uploads = ChunkedUploadStore(
+    os.getenv("VIDEO_UPLOAD_DIR", "video_uploads"),
+    max_size=MAX_KEYFRAME_VIDEO_SIZE,
+    chunk_size=int(os.getenv("VIDEO_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("VIDEO_UPLOAD_TTL_SECONDS", str(24 * 3600))),
+    in_use=upload_in_use,
+)
+
+class UploadRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
+@contextmanager
+def upload_errors():
+    """Map chunked upload errors to HTTP responses."""
+    try:
+        yield
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    except UploadInUse as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def completed_upload(upload_id: str, mode: str) -> dict:
+    """Look up a completed upload and check it fits the requested analysis mode."""
+    with upload_errors():
+        upload = chunked_uploads.completed(upload_id)
+    if mode not in LOCAL_SAMPLING_MODES and upload["size"] > MAX_VIDEO_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Video too large for mode=video. Maximum size: {MAX_VIDEO_SIZE/1024/1024}MB"
+        )
+    return upload
+
+@app.post("/uploads/")
+async def create_upload(upload_request: UploadRequest):
+    """
+    Start a resumable upload.
+    
+    Send the file with `PUT /uploads/{upload_id}/chunks?offset=N`, one chunk of
+    `chunk_size` bytes per request (optionally with an `X-Chunk-SHA256` header),
+    then call `POST /uploads/{upload_id}/complete`. After an interruption,
+    `GET /uploads/{upload_id}` lists the offsets that still need to be sent.
+    """
+    file_ext = os.path.splitext(upload_request.filename)[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file format. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    with upload_errors():
+        return chunked_uploads.create(upload_request.filename, upload_request.size, upload_request.content_type)
+
+@app.put("/uploads/{upload_id}/chunks")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk in the file"),
+    x_chunk_sha256: Optional[str] = Header(None, description="SHA-256 of the chunk body")
+):
+    """Store one chunk; resending a chunk that already arrived intact is a no-op."""
+    data = await request.body()
+    with upload_errors():
+        return chunked_uploads.write_chunk(upload_id, offset, data, x_chunk_sha256)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Progress of an upload, including the offsets still missing."""
+    with upload_errors():
+        return chunked_uploads.status(upload_id)
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    sha256: Optional[str] = Query(None, description="Optional SHA-256 of the whole file to verify")
+):
+    """Verify that every chunk arrived and seal the upload for analysis."""
+    with upload_errors():
+        # Hashing up to MAX_KEYFRAME_VIDEO_SIZE bytes blocks, so it runs in a worker thread
+        return await run_in_threadpool(chunked_uploads.complete, upload_id, sha256)
+
+@app.delete("/uploads/{upload_id}")
+async def delete_upload(upload_id: str):
+    """Discard an upload and its data, unless a job or a running analysis still reads it."""
+    with upload_errors():
+        chunked_uploads.delete(upload_id)
+    return {"upload_id": upload_id, "deleted": True}
+
+@app.post("/uploads/{upload_id}/process")
+async def process_uploaded_video(
+    upload_id: str,
+    model_name: str = Query(DEFAULT_MODEL, description="Gemini model to use"),
+    prompt: Optional[str] = Query(None, description="Optional prompt to guide the video analysis"),
+    mode: str = Query("video", pattern=MODE_PATTERN, description="Send the whole video, sampled keyframes, or analyze segments in parallel"),
+    transcribe: bool = Query(False, description="Keyframe mode: also send a local audio transcript"),
+    segment_seconds: float = Query(120.0, gt=0, description="Segment mode: length of each analyzed time slice")
+):
+    """Analyze a completed chunked upload; parameters match `/process-video/`."""
+    upload = completed_upload(upload_id, mode)
+    try:
+        # Marked as being read so a concurrent delete or the expiry sweep leaves it alone
+        with upload_errors(), chunked_uploads.reading(upload_id):
+            return await run_in_threadpool(analyze_video, chunked_uploads.data_path(upload_id),
+                                           upload["content_type"], model_name, prompt, mode, transcribe,
+                                           segment_seconds, video_sha256=upload["sha256"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/uploads/{upload_id}/jobs", status_code=202)
+async def submit_uploaded_video_job(
+    upload_id: str,
+    model_name: str = Query(DEFAULT_MODEL, description="Gemini model to use"),
+    prompt: Optional[str] = Query(None, description="Optional prompt to guide the video analysis"),
+    mode: str = Query("video", pattern=MODE_PATTERN, description="Send the whole video, sampled keyframes, or analyze segments in parallel"),
+    transcribe: bool = Query(False, description="Keyframe mode: also send a local audio transcript"),
+    segment_seconds: float = Query(120.0, gt=0, description="Segment mode: length of each analyzed time slice")
+):
+    """Queue a completed chunked upload for analysis; poll it like `/jobs/process-video/`."""
+    upload = completed_upload(upload_id, mode)
+    job_id, _ = video_jobs.new_job_dir()
+    try:
+        job = video_jobs.submit(job_id, chunked_uploads.data_path(upload_id), {
+            "video_sha256": upload["sha256"],
+            "content_type": upload["content_type"],
+            "model_name": model_name,
+            "prompt": prompt,
+            "mode": mode,
+            "transcribe": transcribe,
+            "segment_seconds": segment_seconds,
+        }, owns_input=False)
+    except OverflowError as e:
+        video_jobs.discard(job_id)
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_status(job)
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
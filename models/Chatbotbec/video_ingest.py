@@ -0,0 +1,53 @@
+import mmap
+import os
+from contextlib import contextmanager
+
+# Upload chunks are read and written 1MB at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised as soon as an upload exceeds the configured size limit."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Video too large. Maximum size: {max_size/1024/1024}MB")
+        self.max_size = max_size
+
+
+async def spool_upload(file, dest_path: str, max_size: int, chunk_size: int = CHUNK_SIZE, hasher=None) -> int:
+    """
+    Stream an UploadFile to `dest_path` once, enforcing `max_size` as it goes.
+
+    At most one chunk of the upload is held in memory at a time. If a hashlib
+    object is passed as `hasher` it is fed every chunk, so the content hash is
+    ready without reading the file again. The partial file is removed if the
+    limit is exceeded. Returns the number of bytes written.
+    """
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                out.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+    except UploadTooLarge:
+        os.remove(dest_path)
+        raise
+    return size
+
+
+@contextmanager
+def map_file(path: str):
+    """Read-only memory map of a spooled upload; pages are loaded on demand."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
@@ -0,0 +1,402 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    File-backed job queue with a bounded pool of worker threads.
+
+    Each job lives in its own directory under `root` holding `job.json` (state,
+    parameters, result) and the uploaded input file. The directory is the
+    queue: workers in every process scan it for queued jobs, oldest first, and
+    claim one by creating its `claim` file exclusively, so several uvicorn
+    workers share the same jobs without running one twice. State changes are
+    serialized with an flock on the job's `lock` file.
+
+    A claim records the owner's host and pid, and the owner touches it every
+    `heartbeat_seconds` while the job runs. A claim whose owner died (its pid
+    is gone, or its heartbeat is older than `stale_seconds`) is released and
+    the job queued again, up to `max_attempts` runs. Finished jobs are deleted
+    `ttl_seconds` after they complete.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        handler: Callable[[dict, str], dict],
+        workers: int = 2,
+        max_queued: int = 100,
+        ttl_seconds: float = 3600.0,
+        poll_seconds: float = 1.0,
+        heartbeat_seconds: float = 10.0,
+        stale_seconds: float = 60.0,
+        max_attempts: int = 3,
+    ):
+        self.root = root
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.host = socket.gethostname()
+        self.owner = uuid.uuid4().hex
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        # Jobs claimed by this process, whose claims get heartbeats
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.recovered = 0
+        os.makedirs(root, exist_ok=True)
+
+    # Job files
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, os.path.basename(job_id))
+
+    def _claim_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "claim")
+
+    def _job_ids(self) -> list:
+        return [name for name in os.listdir(self.root)
+                if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name))]
+
+    def _read(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._job_dir(job_id), "job.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            return None
+
+    def _write(self, job: dict):
+        path = os.path.join(self._job_dir(job["id"]), "job.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _flock(self, path: str):
+        with open(path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    @contextmanager
+    def _locked(self, job_id: str):
+        """Exclusive access to a job across threads and processes; yields its state or None."""
+        try:
+            lock = open(os.path.join(self._job_dir(job_id), "lock"), "a")
+        except FileNotFoundError:
+            # The job directory was removed
+            yield None
+            return
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield self._read(job_id)
+
+    def _claim(self, job_id: str) -> bool:
+        try:
+            fd = os.open(self._claim_path(job_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except (FileExistsError, FileNotFoundError):
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({"host": self.host, "pid": os.getpid(), "owner": self.owner, "claimed_at": time.time()}, f)
+        return True
+
+    def _claim_is_stale(self, job_id: str, now: float) -> bool:
+        path = self._claim_path(job_id)
+        try:
+            heartbeat = os.path.getmtime(path)
+            with open(path) as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, json.JSONDecodeError):
+            # Claimed a moment ago and not written yet, or unreadable: judge by the heartbeat only
+            owner = {}
+        if now - heartbeat >= self.stale_seconds:
+            return True
+        if owner.get("host") != self.host:
+            return False
+        if owner.get("owner") == self.owner:
+            with self._running_lock:
+                return job_id not in self._running
+        return not pid_alive(owner.get("pid", 0))
+
+    # Public API
+
+    def new_job_dir(self) -> tuple:
+        """Reserve a job id and directory to spool the input into before submitting."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+        return job_id, self._job_dir(job_id)
+
+    def discard(self, job_id: str):
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def queued_job_ids(self) -> list:
+        """Ids of queued, unclaimed jobs across all processes, oldest first."""
+        queued = []
+        for job_id in self._job_ids():
+            job = self._read(job_id)
+            if job is not None and job["status"] == QUEUED and not os.path.exists(self._claim_path(job_id)):
+                queued.append((job["submitted_at"], job_id))
+        return [job_id for _, job_id in sorted(queued)]
+
+    def active_inputs(self) -> set:
+        """Input paths of every job that has not finished yet, across all processes."""
+        inputs = set()
+        for job_id in self._job_ids():
+            job = self._read(job_id)
+            if job is not None and job["status"] not in FINISHED_STATES:
+                inputs.add(os.path.abspath(job["input_path"]))
+        return inputs
+
+    def submit(self, job_id: str, input_path: str, params: dict, owns_input: bool = True) -> dict:
+        """
+        Queue a job. With `owns_input` the input file (normally spooled into the
+        job directory) is deleted once the job has run; pass False for inputs
+        that live elsewhere, such as completed chunked uploads.
+        """
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "params": params,
+            "input_path": input_path,
+            "owns_input": owns_input,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "attempts": 0,
+            "cancel_requested": False,
+            "result": None,
+            "error": None,
+            "status_code": None,
+        }
+        # Counting and adding under one lock keeps concurrent submits from overshooting the limit
+        with self._flock(os.path.join(self.root, ".submit.lock")):
+            if len(self.queued_job_ids()) >= self.max_queued:
+                raise OverflowError("Job queue is full")
+            with self._locked(job_id):
+                self._write(job)
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._read(job_id)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a job. Queued jobs never run; a running job's upstream call cannot
+        be interrupted, so its result is discarded when it finishes.
+        """
+        with self._locked(job_id) as job:
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            if job["status"] == QUEUED:
+                job.update(status=CANCELLED, finished_at=time.time())
+                self.cancelled += 1
+            else:
+                job["cancel_requested"] = True
+            self._write(job)
+            return job
+
+    def metrics(self) -> dict:
+        running = 0
+        queued = 0
+        for job_id in self._job_ids():
+            job = self._read(job_id)
+            if job is None:
+                continue
+            if job["status"] == RUNNING:
+                running += 1
+            elif job["status"] == QUEUED:
+                queued += 1
+        with self._running_lock:
+            running_here = len(self._running)
+        return {
+            "queue_depth": queued,
+            "running": running,
+            "running_here": running_here,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "recovered": self.recovered,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    # Workers
+
+    def start(self):
+        """Release claims left by dead workers, then start workers and the maintenance thread."""
+        self.recover_stale()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"video-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        reaper = threading.Thread(target=self._reap, name="video-job-reaper", daemon=True)
+        reaper.start()
+        self._threads.append(reaper)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _next_job(self) -> Optional[dict]:
+        """Claim the oldest queued job, or None if there is nothing to run."""
+        for job_id in self.queued_job_ids():
+            # Registered before claiming so the claim is never mistaken for a dead worker's
+            with self._running_lock:
+                self._running.add(job_id)
+            if self._claim(job_id):
+                with self._locked(job_id) as job:
+                    # A job cancelled after it was listed keeps the claim, so it is not listed again
+                    if job is not None and job["status"] == QUEUED:
+                        job.update(status=RUNNING, started_at=time.time(), attempts=job.get("attempts", 0) + 1)
+                        self._write(job)
+                        return job
+            with self._running_lock:
+                self._running.discard(job_id)
+        return None
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._next_job()
+            if job is None:
+                # Jobs submitted by other processes are found on the next scan
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job["id"])
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+        try:
+            result = self.handler(job["params"], job["input_path"])
+            changes = {"status": DONE, "result": result}
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Video job {job_id} failed: {detail}")
+            # Keep the HTTP status of handler errors such as a 400 for an undecodable video
+            changes = {"status": FAILED, "error": detail, "status_code": getattr(e, "status_code", 500)}
+        finally:
+            # The input is no longer needed once the job has run
+            if job.get("owns_input", True):
+                try:
+                    os.remove(job["input_path"])
+                except OSError:
+                    pass
+
+        with self._locked(job_id) as current:
+            if current is None:
+                return
+            if current.get("cancel_requested"):
+                changes = {"status": CANCELLED, "result": None}
+            current.update(changes, finished_at=time.time())
+            self._write(current)
+        if current["status"] == DONE:
+            self.completed += 1
+        elif current["status"] == FAILED:
+            self.failed += 1
+        else:
+            self.cancelled += 1
+
+    def recover_stale(self):
+        """Queue again (or fail, after `max_attempts`) unfinished jobs whose claim owner died."""
+        now = time.time()
+        for job_id in self._job_ids():
+            job = self._read(job_id)
+            if job is None or job["status"] in FINISHED_STATES or not self._claim_is_stale(job_id, now):
+                continue
+            with self._locked(job_id) as job:
+                if job is None or job["status"] in FINISHED_STATES or not self._claim_is_stale(job_id, now):
+                    continue
+                if job.get("cancel_requested"):
+                    job.update(status=CANCELLED, finished_at=now)
+                elif job.get("attempts", 0) >= self.max_attempts:
+                    job.update(status=FAILED, finished_at=now, status_code=500,
+                               error=f"Worker died while running the job ({job['attempts']} attempts)")
+                else:
+                    job.update(status=QUEUED, started_at=None)
+                self._write(job)
+                try:
+                    os.remove(self._claim_path(job_id))
+                except FileNotFoundError:
+                    pass
+            self.recovered += 1
+            logger.warning(f"Video job {job_id} was abandoned by a dead worker; now {job['status']}")
+            if job["status"] in FINISHED_STATES and job.get("owns_input", True):
+                try:
+                    os.remove(job["input_path"])
+                except OSError:
+                    pass
+        self._wake.set()
+
+    def _heartbeat(self):
+        with self._running_lock:
+            running = list(self._running)
+        for job_id in running:
+            try:
+                os.utime(self._claim_path(job_id))
+            except OSError:
+                pass
+
+    def _reap(self):
+        """Heartbeat this process's claims, recover dead workers' jobs and delete expired ones."""
+        interval = max(1.0, min(60.0, self.ttl_seconds / 10, self.heartbeat_seconds))
+        last_reap = 0.0
+        while not self._stop.wait(interval):
+            self._heartbeat()
+            self.recover_stale()
+            now = time.time()
+            if now - last_reap < max(1.0, min(60.0, self.ttl_seconds / 10)):
+                continue
+            last_reap = now
+            for job_id in self._job_ids():
+                job = self._read(job_id)
+                if job is None:
+                    # Upload that never became a job (e.g. rejected while spooling)
+                    try:
+                        expired = now - os.path.getmtime(self._job_dir(job_id)) >= self.ttl_seconds
+                    except OSError:
+                        continue
+                else:
+                    expired = job["status"] in FINISHED_STATES and now - job["finished_at"] >= self.ttl_seconds
+                if expired:
+                    self.discard(job_id)
@@ -47,18 +47,25 @@
 #     return {"response": response}
 
 from fastapi import FastAPI, Body, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationChain
 from langchain_groq import ChatGroq
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
+from typing import Optional
 import os
 
+from zenlearn_common import cassette
+from history_store import ConversationStore
+from upstream import UpstreamError, UpstreamPolicy, build_policy
+
 # Load environment variables
 load_dotenv()
+cassette.ensure_offline_credentials("GROQ_API_KEY", "TAVILY_API_KEY")
 
 # Check for required API keys
 if not os.getenv("GROQ_API_KEY"):
@@ -82,19 +89,34 @@ app.add_middleware(
 # Define Pydantic models
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None
 
 class SearchQuery(BaseModel):
     query: str
 
-# Shared memory for conversation tracking
-memory = ConversationBufferMemory()
+# Durable conversation log shared by every worker serving this app
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "conversations.db")
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "10"))
+DEFAULT_SESSION_ID = "default"
+
+history_store = ConversationStore(
+    HISTORY_DB_PATH,
+    batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "64")),
+    flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.05")),
+)
 
-# Initialize Groq LLMs
-general_llm = ChatGroq(model="deepseek-r1-distill-llama-70b")
-wellness_llm = ChatGroq(model="llama3-70b-8192", temperature=1.0)
+# Initialize Groq LLMs behind a hedged, fallback-aware upstream policy
+GENERAL_MODEL = os.getenv("GENERAL_MODEL", "deepseek-r1-distill-llama-70b")
+GENERAL_FALLBACK_MODEL = os.getenv("GENERAL_FALLBACK_MODEL", "llama3-70b-8192")
+WELLNESS_MODEL = os.getenv("WELLNESS_MODEL", "llama3-70b-8192")
+WELLNESS_FALLBACK_MODEL = os.getenv("WELLNESS_FALLBACK_MODEL", "llama3-8b-8192")
 
-# Create conversation chains
-general_chat_chain = ConversationChain(llm=general_llm, memory=memory)
+def groq_clients(**llm_kwargs):
+    """ChatGroq factory for build_policy; retries are left to the policy's fallbacks."""
+    return lambda model, timeout: ChatGroq(model=model, timeout=timeout, max_retries=0, **llm_kwargs)
+
+general_policy = build_policy([GENERAL_MODEL, GENERAL_FALLBACK_MODEL], groq_clients())
+wellness_policy = build_policy([WELLNESS_MODEL, WELLNESS_FALLBACK_MODEL], groq_clients(temperature=1.0))
 
 WELLNESS_PROMPT = """
 You are a compassionate wellness assistant. Consider this information about the user:
@@ -112,18 +134,59 @@ You are a compassionate wellness assistant. Consider this information about the
     Assistant:
 """
 
-wellness_chat_chain = ConversationChain(
-    llm=wellness_llm,
-    prompt=ChatPromptTemplate.from_template(WELLNESS_PROMPT),
-    memory=memory
-)
+wellness_prompt = ChatPromptTemplate.from_template(WELLNESS_PROMPT)
+
+def build_memory(history) -> ConversationBufferWindowMemory:
+    """Build a memory holding only the window of history the prompt needs."""
+    memory = ConversationBufferWindowMemory(k=HISTORY_WINDOW_TURNS)
+    for role, content in history:
+        if role == "human":
+            memory.chat_memory.add_user_message(content)
+        else:
+            memory.chat_memory.add_ai_message(content)
+    return memory
+
+async def run_conversation(policy: UpstreamPolicy, chat_request: ChatRequest, prompt=None):
+    """Run one turn against the session's history and append it to the log."""
+    session_id = chat_request.session_id or DEFAULT_SESSION_ID
+    # SQLite reads and commits run in the threadpool so they never stall the event loop
+    history = await run_in_threadpool(history_store.load_window, session_id, HISTORY_WINDOW_TURNS * 2)
+
+    def invoke(llm):
+        # Each attempt gets its own memory so hedged requests don't interfere
+        chain_kwargs = {"llm": llm, "memory": build_memory(history)}
+        if prompt is not None:
+            chain_kwargs["prompt"] = prompt
+        return cassette.call(
+            "groq",
+            {"model": llm.model_name, "prompt": prompt.template if prompt is not None else None,
+             "history": history, "input": chat_request.message},
+            lambda: ConversationChain(**chain_kwargs).invoke(chat_request.message),
+            synthetic=lambda: {"input": chat_request.message, "history": "",
+                               "response": cassette.synthetic_chat_response(chat_request.message)},
+        )
+
+    response = await policy.call(invoke)
+    await run_in_threadpool(history_store.append_many, session_id, [
+        ("human", chat_request.message),
+        ("ai", response["response"]),
+    ])
+    return response
+
+@app.on_event("shutdown")
+def close_history_store():
+    """Commit any buffered turns before the worker exits."""
+    history_store.close()
 
 @app.post("/chat")
 async def chat_endpoint(chat_request: ChatRequest = Body(...)):
     """Handles general chat requests and returns AI-generated responses."""
     try:
-        response = general_chat_chain.invoke(chat_request.message)
+        response = await run_conversation(general_policy, chat_request)
         return {"response": response}
+    except UpstreamError as e:
+        print(f"Upstream unavailable for chat request: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Upstream unavailable: {str(e)}")
     except Exception as e:
         print(f"Error processing chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
@@ -132,8 +195,11 @@ async def chat_endpoint(chat_request: ChatRequest = Body(...)):
 async def wellness_chat_endpoint(chat_request: ChatRequest = Body(...)):
     """Handles wellness-related chat and provides supportive responses."""
     try:
-        response = wellness_chat_chain.invoke(chat_request.message)
+        response = await run_conversation(wellness_policy, chat_request, prompt=wellness_prompt)
         return {"response": response}
+    except UpstreamError as e:
+        print(f"Upstream unavailable for wellness chat request: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Upstream unavailable: {str(e)}")
     except Exception as e:
         print(f"Error processing wellness chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
@@ -150,12 +216,22 @@ async def search_products(search_query: SearchQuery):
             include_raw_content=True,
             include_images=True,
         )
-        search_results = search_tool.invoke({"query": search_query.query})
+        search_results = await cassette.acall(
+            "tavily",
+            {"query": search_query.query, "max_results": 3, "search_depth": "advanced"},
+            lambda: search_tool.invoke({"query": search_query.query}),
+            synthetic=lambda: cassette.synthetic_search_results(search_query.query),
+        )
         return {"status": "success", "results": search_results}
     except Exception as e:
         print(f"Error in search_products: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/upstream/stats")
+async def upstream_stats():
+    """Latency, hedging and circuit breaker state for each chat upstream."""
+    return {"chat": general_policy.stats(), "wellness-chat": wellness_policy.stats()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint to verify the API is running."""
@@ -0,0 +1,122 @@
+"""
+Per-frame cost of the meditation landmark checks, full frame vs head region.
+
+Runs the same frames through PoseFacePipeline in several configurations:
+
+  full          Pose and FaceMesh on every full frame (the previous behaviour)
+  roi/pose=N    FaceMesh on the head region from Pose, Pose every N frames
+
+and reports wall and CPU milliseconds per frame (CPU time counts every
+MediaPipe thread), plus how far the eye landmarks and the eyes-closed
+decision of each configuration are from the full-frame run. Use a recording
+of a seated person; pass a camera index to record --frames frames first:
+
+    python bench_head_roi.py --source session.mp4 --frames 300 --pose-every 1 2 3
+
+Footage without a person only measures skipping Pose: the head-region path
+never runs. "roi misses" counts head regions in which FaceMesh found no face
+and the full frame was searched again; if it is close to "roi runs", the
+region does not hold the face and the configuration costs more, not less.
+"""
+import argparse
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from head_roi import LEFT_EYE_INDICES, RIGHT_EYE_INDICES, PoseFacePipeline
+
+EAR_THRESHOLD = 0.20
+
+
+def read_frames(source, count):
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def eye_points(face, box):
+    """The 12 eye landmarks in full-frame pixels."""
+    landmarks, width, height = face
+    x, y = (box[0], box[1]) if box is not None else (0, 0)
+    return np.array([(landmarks[i].x * width + x, landmarks[i].y * height + y)
+                     for i in LEFT_EYE_INDICES + RIGHT_EYE_INDICES])
+
+
+def eye_aspect_ratio(points):
+    def ear(p):
+        return (np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])) / (2 * np.linalg.norm(p[0] - p[3]))
+    return (ear(points[:6]) + ear(points[6:])) / 2
+
+
+def open_models():
+    """Pose, full-frame FaceMesh and head-region FaceMesh, as the meditation app creates them."""
+    mp_pose, mp_face = mp.solutions.pose, mp.solutions.face_mesh
+    return (mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5),
+            mp_face.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5),
+            mp_face.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5))
+
+
+def run(frames, roi, pose_every):
+    """Per-frame eye landmarks (or None), wall and CPU seconds, and pipeline stats."""
+    # Warm up on throwaway instances: the timed ones must not start with tracking state from it
+    pose, face_mesh, roi_face_mesh = open_models()
+    with pose, face_mesh, roi_face_mesh:
+        PoseFacePipeline(pose, face_mesh, roi_face_mesh if roi else None).process(frames[0])
+
+    pose, face_mesh, roi_face_mesh = open_models()
+    with pose, face_mesh, roi_face_mesh:
+        pipeline = PoseFacePipeline(pose, face_mesh, roi_face_mesh if roi else None, pose_every=pose_every)
+
+        eyes = []
+        wall, cpu = time.perf_counter(), time.process_time()
+        for frame in frames:
+            _, _, face = pipeline.process(frame)
+            eyes.append(eye_points(face, pipeline.face_box) if face is not None else None)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        return eyes, wall, cpu, pipeline.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="0", help="Video file or camera index")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--pose-every", type=int, nargs="+", default=[1, 2, 3])
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        raise SystemExit(f"Could not read frames from {args.source}")
+
+    configs = [("full", False, 1)] + [(f"roi/pose={n}", True, n) for n in args.pose_every]
+    baseline = None
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'config':<12} {'wall ms':>8} {'cpu ms':>7} {'cpu %full':>9} {'faces':>6} {'eye px err':>10} "
+          f"{'closed agree':>12} {'pose runs':>9} {'roi runs':>8} {'roi misses':>10} {'roi moves':>9}")
+    for name, roi, pose_every in configs:
+        eyes, wall, cpu, stats = run(frames, roi, pose_every)
+        if baseline is None:
+            baseline = (eyes, cpu)
+        both = [(a, b) for a, b in zip(baseline[0], eyes) if a is not None and b is not None]
+        if both:
+            error = np.mean([np.linalg.norm(a - b, axis=1).mean() for a, b in both])
+            closed = [(eye_aspect_ratio(a) < EAR_THRESHOLD) == (eye_aspect_ratio(b) < EAR_THRESHOLD) for a, b in both]
+            error, agree = f"{error:>10.2f}", f"{np.mean(closed):>12.1%}"
+        else:
+            error, agree = f"{'-':>10}", f"{'-':>12}"
+        found = sum(e is not None for e in eyes)
+        print(f"{name:<12} {wall / len(frames) * 1000:>8.2f} {cpu / len(frames) * 1000:>7.2f} "
+              f"{cpu / baseline[1]:>9.0%} {found:>6} {error} {agree} "
+              f"{stats['pose_runs']:>9} {stats['roi_face_mesh_runs']:>8} {stats['roi_misses']:>10} "
+              f"{stats['roi_updates']:>9}")
+
+
+if __name__ == "__main__":
+    main()
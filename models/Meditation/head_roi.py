@@ -0,0 +1,151 @@
+import numpy as np
+
+# Face mesh indices
+LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
+
+# Pose landmarks 0-10: nose, eyes, ears and mouth corners
+HEAD_LANDMARKS = range(11)
+
+
+def head_box(pose_landmarks, frame_width, frame_height, margin=0.6, min_visibility=0.5):
+    """
+    Square pixel box (x, y, w, h) around the head from Pose landmarks, or None.
+
+    The Pose head landmarks span roughly ear to ear and eyes to mouth, so the
+    box is grown by `margin` of that extent on every side to hold the whole
+    face, then clipped to the frame.
+    """
+    points = np.array([(lm.x * frame_width, lm.y * frame_height)
+                       for lm in (pose_landmarks[i] for i in HEAD_LANDMARKS)
+                       if getattr(lm, 'visibility', 1.0) >= min_visibility])
+    if len(points) < 3:
+        return None
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    half = max(x1 - x0, y1 - y0) * (1 + 2 * margin) / 2
+    x, y = int(max(0, cx - half)), int(max(0, cy - half))
+    w, h = int(min(frame_width, cx + half)) - x, int(min(frame_height, cy + half)) - y
+    return (x, y, w, h) if w > 0 and h > 0 else None
+
+
+class HeadRoi:
+    """
+    Head region for FaceMesh, taken from Pose and kept while the head is stable.
+
+    Feeding FaceMesh the same crop frame after frame lets it keep tracking its
+    landmarks instead of detecting the face again. The box is only replaced
+    when the head's centre moved more than `move_tolerance` of the box size
+    or its size changed by more than `resize_tolerance`.
+    """
+
+    def __init__(self, margin=0.6, move_tolerance=0.15, resize_tolerance=0.25):
+        self.margin = margin
+        self.move_tolerance = move_tolerance
+        self.resize_tolerance = resize_tolerance
+        self.box = None
+        self.updates = 0
+
+    def update(self, pose_landmarks, frame_width, frame_height):
+        candidate = head_box(pose_landmarks, frame_width, frame_height, self.margin)
+        if candidate is not None and (self.box is None or not self._stable(candidate)):
+            self.box = candidate
+            self.updates += 1
+        return self.box
+
+    def _stable(self, candidate):
+        x, y, w, h = self.box
+        cx, cy, cw, ch = candidate
+        size = max(w, h)
+        moved = np.hypot((cx + cw / 2) - (x + w / 2), (cy + ch / 2) - (y + h / 2))
+        return moved <= self.move_tolerance * size and abs(max(cw, ch) - size) <= self.resize_tolerance * size
+
+    def reset(self):
+        self.box = None
+
+
+def face_landmarks(face_mesh, rgb_frame, box=None):
+    """
+    FaceMesh landmarks of the first face within `box` (the whole frame if None).
+
+    Returns (landmarks, width, height) of the searched region, or None if no
+    face was found. Landmarks are relative to that region, so an eye aspect
+    ratio computed with its width and height equals the full-frame one.
+    """
+    if box is not None:
+        x, y, w, h = box
+        rgb_frame = np.ascontiguousarray(rgb_frame[y:y+h, x:x+w])
+    results = face_mesh.process(rgb_frame)
+    if not results.multi_face_landmarks:
+        return None
+    height, width = rgb_frame.shape[:2]
+    return results.multi_face_landmarks[0].landmark, width, height
+
+
+class PoseFacePipeline:
+    """
+    Pose and FaceMesh results for each frame of a meditation session.
+
+    Pose runs every `pose_every` frames, with its last result reused in
+    between, and gives the head region. FaceMesh runs every frame, but only
+    on that region, using `roi_face_mesh`. It falls back to `face_mesh` on the
+    full frame when there is no region yet or no face was found in it.
+    Without `roi_face_mesh`, both models see every full frame, as before.
+    """
+
+    def __init__(self, pose, face_mesh, roi_face_mesh=None, pose_every=1, margin=0.6):
+        self.pose = pose
+        self.face_mesh = face_mesh
+        self.roi_face_mesh = roi_face_mesh
+        self.pose_every = max(1, pose_every)
+        self.roi = HeadRoi(margin)
+        self.pose_results = None
+        # Region the last face was found in, None for the full frame
+        self.face_box = None
+        self.frames = 0
+        self.pose_runs = 0
+        self.roi_runs = 0
+        self.roi_misses = 0
+        self.full_frame_runs = 0
+
+    def process(self, rgb_frame):
+        """(pose_results, pose_fresh, face) for one RGB frame; `face` as from `face_landmarks`."""
+        height, width = rgb_frame.shape[:2]
+        pose_fresh = self.pose_results is None or self.frames % self.pose_every == 0
+        self.frames += 1
+        if pose_fresh:
+            self.pose_results = self.pose.process(rgb_frame)
+            self.pose_runs += 1
+            if self.roi_face_mesh is not None and self.pose_results.pose_landmarks:
+                self.roi.update(self.pose_results.pose_landmarks.landmark, width, height)
+
+        face = None
+        self.face_box = None
+        if self.roi_face_mesh is not None and self.roi.box is not None:
+            face = face_landmarks(self.roi_face_mesh, rgb_frame, self.roi.box)
+            self.roi_runs += 1
+            if face is None:
+                # The head left the region; search the full frame until Pose finds it again
+                self.roi_misses += 1
+                self.roi.reset()
+            else:
+                self.face_box = self.roi.box
+        if face is None:
+            face = face_landmarks(self.face_mesh, rgb_frame)
+            self.full_frame_runs += 1
+        return self.pose_results, pose_fresh, face
+
+    def reset(self):
+        self.roi.reset()
+        self.pose_results = None
+        self.frames = 0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "pose_runs": self.pose_runs,
+            "roi_face_mesh_runs": self.roi_runs,
+            "roi_misses": self.roi_misses,
+            "full_frame_face_mesh_runs": self.full_frame_runs,
+            "roi_updates": self.roi.updates,
+        }
@@ -18,6 +18,10 @@ import threading
 import io
 from pygame import mixer
 
+from zenlearn_common.downsample import bucket_edges, lttb_indices
+from zenlearn_common.frame_pipeline import CaptureThread, RateMeter
+from head_roi import LEFT_EYE_INDICES, RIGHT_EYE_INDICES, PoseFacePipeline
+
 # Load environment variables
 load_dotenv()
 
@@ -36,9 +40,11 @@ def load_mediapipe_models():
     mp_face = mp.solutions.face_mesh
     pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
     face = mp_face.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-    return mp_pose, mp_face, pose, face
+    # Separate instance for head crops so its tracking state is not mixed with full frames
+    roi_face = mp_face.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    return mp_pose, mp_face, pose, face, roi_face
 
-mp_pose, mp_face, pose, face = load_mediapipe_models()
+mp_pose, mp_face, pose, face, roi_face = load_mediapipe_models()
 
 # Constants
 MOVEMENT_THRESHOLD = 0.015
@@ -46,6 +52,9 @@ POSTURE_ANGLE_THRESHOLD = 8
 EAR_THRESHOLD = 0.20
 CLOSED_FRAMES_THRESHOLD = 3
 MEDITATION_DURATION = 120  # 2 minutes in seconds
+CHART_POINT_BUDGET = 200  # Most sessions drawn per progress chart; older ones are aggregated
+POSE_EVERY_N_FRAMES = 2  # Posture and movement change slowly; the eye check still runs every frame
+HEAD_ROI_MARGIN = 0.6  # Head box from Pose, grown by this share of the head's extent per side
 
 # Initialize Eleven Labs client
 @st.cache_resource
@@ -89,10 +98,6 @@ def play_voice_feedback(message, client):
         except Exception as e:
             st.error(f"Error playing audio: {str(e)}")
 
-# Face mesh indices
-LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
-RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
-
 # Initialize session state
 if 'session_active' not in st.session_state:
     st.session_state.session_active = False
@@ -108,7 +113,14 @@ if 'session_data' not in st.session_state:
             'total': 0
         },
         'focus_score': 0.0,
-        'feedback': []
+        'feedback': [],
+        # Capture pipeline health: frames the camera delivered, frames replaced
+        # before analysis reached them, and capture-to-feedback latency
+        'frames_captured': 0,
+        'frames_dropped': 0,
+        'latency_total': 0.0,
+        'latency_max': 0.0,
+        'loop_fps': 0.0
     }
 if 'movement_history' not in st.session_state:
     st.session_state.movement_history = []
@@ -120,6 +132,12 @@ if 'camera_index' not in st.session_state:
     st.session_state.camera_index = 0
 if 'last_feedback_time' not in st.session_state:
     st.session_state.last_feedback_time = {}
+if 'landmark_pipeline' not in st.session_state:
+    # FaceMesh runs on the head region from Pose instead of the full frame
+    st.session_state.landmark_pipeline = PoseFacePipeline(pose, face, roi_face, pose_every=POSE_EVERY_N_FRAMES,
+                                                          margin=HEAD_ROI_MARGIN)
+if 'movement_detected' not in st.session_state:
+    st.session_state.movement_detected = False
 
 # Helper functions
 def calculate_ear(eye_landmarks, frame_width, frame_height):
@@ -189,6 +207,13 @@ def save_session_report():
         writer.writerow(["Eye Openings", data['mistakes']['eyes']])
         writer.writerow(["Movement Instances", data['mistakes']['movement']])
         writer.writerow(["Total Mistakes", data['mistakes']['total']])
+        writer.writerow(["Frames Captured", data['frames_captured']])
+        writer.writerow(["Frames Analyzed", data['total_frames']])
+        writer.writerow(["Frames Dropped", data['frames_dropped']])
+        writer.writerow(["Average Feedback Latency (ms)",
+                         data['latency_total'] / data['total_frames'] * 1000 if data['total_frames'] else 0])
+        writer.writerow(["Max Feedback Latency (ms)", data['latency_max'] * 1000])
+        writer.writerow(["Analysis FPS", data['total_frames'] / duration if duration > 0 else 0])
     
     # Create DataFrame for report display
     df = pd.DataFrame({
@@ -230,9 +255,8 @@ def process_frame(frame, elevenlabs_client):
         play_voice_feedback("Your meditation session is complete. Well done.", elevenlabs_client)
         return frame, True
     
-    # Process frame with MediaPipe
-    pose_results = pose.process(rgb_frame)
-    face_results = face.process(rgb_frame)
+    # Process frame with MediaPipe; pose may be the previous frame's result
+    pose_results, pose_fresh, eye_region = st.session_state.landmark_pipeline.process(rgb_frame)
 
     # Posture check
     posture_good = False
@@ -248,10 +272,11 @@ def process_frame(frame, elevenlabs_client):
 
     # Eye state check
     eyes_closed = False
-    if face_results.multi_face_landmarks:
-        face_landmarks = face_results.multi_face_landmarks[0].landmark
-        left_ear = calculate_ear([face_landmarks[i] for i in LEFT_EYE_INDICES], frame_width, frame_height)
-        right_ear = calculate_ear([face_landmarks[i] for i in RIGHT_EYE_INDICES], frame_width, frame_height)
+    if eye_region is not None:
+        # Landmarks are relative to the head region, so EAR uses the region's size
+        face_landmarks, region_width, region_height = eye_region
+        left_ear = calculate_ear([face_landmarks[i] for i in LEFT_EYE_INDICES], region_width, region_height)
+        right_ear = calculate_ear([face_landmarks[i] for i in RIGHT_EYE_INDICES], region_width, region_height)
         avg_ear = (left_ear + right_ear) / 2
 
         if avg_ear < EAR_THRESHOLD:
@@ -270,9 +295,14 @@ def process_frame(frame, elevenlabs_client):
                 play_voice_feedback("Gently close your eyes to help focus inward.", elevenlabs_client)
                 st.session_state.last_feedback_time['eyes'] = time.time()
 
-    # Movement detection
+    # Movement detection, only on frames with a fresh pose; in between the last verdict stands
     movement_detected = False
-    if pose_results.pose_landmarks:
+    if pose_results.pose_landmarks and not pose_fresh:
+        if st.session_state.movement_detected:
+            current_mistakes.append('movement')
+            feedback_lines.append("Stay still!")
+            movement_detected = True
+    elif pose_results.pose_landmarks:
         nose = pose_results.pose_landmarks.landmark[mp_pose.PoseLandmark.NOSE.value]
         current_pos = np.array([nose.x, nose.y])
         
@@ -293,6 +323,7 @@ def process_frame(frame, elevenlabs_client):
         st.session_state.movement_history.append(current_pos)
         if len(st.session_state.movement_history) > 10:
             st.session_state.movement_history.pop(0)
+        st.session_state.movement_detected = movement_detected
 
     # Update session data
     if not current_mistakes:
@@ -331,6 +362,18 @@ def process_frame(frame, elevenlabs_client):
     
     return frame, False
 
+def update_pipeline_stats(captured_at, capture, loop_meter):
+    """Record loop rate, dropped frames and capture-to-feedback latency for the frame just shown"""
+    data = st.session_state.session_data
+    latency = time.time() - captured_at
+    loop_meter.tick()
+    data['frames_captured'] = capture.meter.count
+    data['frames_dropped'] = capture.frames.dropped
+    data['latency_total'] += latency
+    data['latency_max'] = max(data['latency_max'], latency)
+    data['loop_fps'] = loop_meter.rate()
+    return latency
+
 def reset_session_data():
     """Reset session data for a new meditation session"""
     st.session_state.session_data = {
@@ -344,11 +387,20 @@ def reset_session_data():
             'total': 0
         },
         'focus_score': 0.0,
-        'feedback': []
+        'feedback': [],
+        # Capture pipeline health: frames the camera delivered, frames replaced
+        # before analysis reached them, and capture-to-feedback latency
+        'frames_captured': 0,
+        'frames_dropped': 0,
+        'latency_total': 0.0,
+        'latency_max': 0.0,
+        'loop_fps': 0.0
     }
     st.session_state.movement_history = []
     st.session_state.eye_closed_frames = 0
     st.session_state.last_feedback_time = {}
+    st.session_state.landmark_pipeline.reset()
+    st.session_state.movement_detected = False
 
 def generate_progress_charts():
     """Generate charts to visualize progress across sessions"""
@@ -366,10 +418,11 @@ def generate_progress_charts():
         for mistake_type in mistake_types.keys():
             mistake_types[mistake_type].append(session['mistakes'][mistake_type])
     
-    # Focus score trend
+    # Focus score trend, downsampled with LTTB so dips and peaks stay visible
+    keep = lttb_indices(np.arange(len(focus_scores)), focus_scores, CHART_POINT_BUDGET)
     focus_df = pd.DataFrame({
-        'Session': timestamps,
-        'Focus Score': focus_scores
+        'Session': [timestamps[i] for i in keep],
+        'Focus Score': [focus_scores[i] for i in keep]
     })
     focus_chart = px.line(focus_df, x='Session', y='Focus Score', 
                          title='Focus Score Trend',
@@ -378,12 +431,14 @@ def generate_progress_charts():
                              yaxis_title='Focus Score (%)',
                              yaxis_range=[0, 100])
     
-    # Mistakes breakdown
+    # Mistakes breakdown; beyond the budget, consecutive sessions are averaged into one bar
+    edges = bucket_edges(len(timestamps), CHART_POINT_BUDGET)
     mistakes_df = pd.DataFrame({
-        'Session': timestamps,
-        'Posture': mistake_types['posture'],
-        'Eyes': mistake_types['eyes'],
-        'Movement': mistake_types['movement']
+        'Session': [timestamps[start] if end - start == 1 else f"{timestamps[start]} - {timestamps[end - 1]}"
+                    for start, end in zip(edges[:-1], edges[1:])],
+        'Posture': np.add.reduceat(mistake_types['posture'], edges[:-1]) / np.diff(edges),
+        'Eyes': np.add.reduceat(mistake_types['eyes'], edges[:-1]) / np.diff(edges),
+        'Movement': np.add.reduceat(mistake_types['movement'], edges[:-1]) / np.diff(edges)
     })
     
     mistakes_chart = px.bar(mistakes_df.melt(id_vars=['Session'], 
@@ -520,12 +575,20 @@ def main():
                     st.error(f"Error: Camera index {st.session_state.camera_index} not available. Try a different index.")
                     st.session_state.session_active = False
                 else:
+                    # The capture thread keeps only the newest frame, so analysis always
+                    # works on fresh input instead of the camera's backlog
+                    capture = CaptureThread(cap, name="meditation-capture").start()
+                    loop_meter = RateMeter()
+                    stats_placeholder = st.empty()
                     try:
                         while st.session_state.session_active:
-                            ret, frame = cap.read()
-                            if not ret:
-                                st.error("Failed to capture frame from camera.")
-                                break
+                            item = capture.frames.take(timeout=1.0)
+                            if item is None:
+                                if not capture.is_alive():
+                                    st.error("Failed to capture frame from camera.")
+                                    break
+                                continue
+                            _, captured_at, frame = item
                             
                             # Process the frame
                             processed_frame, session_ended = process_frame(frame, elevenlabs_client)
@@ -533,6 +596,13 @@ def main():
                             # Display the processed frame
                             video_placeholder.image(processed_frame, channels="BGR", use_container_width=True)
                             
+                            latency = update_pipeline_stats(captured_at, capture, loop_meter)
+                            stats_placeholder.caption(
+                                f"Camera {capture.meter.rate():.1f} FPS · Analysis {loop_meter.rate():.1f} FPS · "
+                                f"Feedback latency {latency * 1000:.0f} ms · "
+                                f"Dropped frames {capture.frames.dropped}"
+                            )
+                            
                             # Check if session ended due to time limit
                             if session_ended:
                                 report_df = save_session_report()
@@ -542,7 +612,8 @@ def main():
                     except Exception as e:
                         st.error(f"Error occurred: {str(e)}")
                     finally:
-                        cap.release()
+                        # Stops the thread and releases the camera
+                        capture.stop()
             
             with col2:
                 # Real-time feedback box
@@ -0,0 +1,207 @@
+"""
+Offline stress analysis of recorded videos, sharded across a process pool.
+
+Each video is split into fixed-length segments that worker processes analyze
+independently; every worker loads the emotion model once. Frames are sampled
+at --fps, and for each video a per-frame CSV and a JSON report with the same
+statistics as the live app's report are written to --out:
+
+    python batch_stress.py recordings/ lecture.mp4 --fps 2 --workers 4 --out stress_batch
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+FRAME_COLUMNS = ["time_seconds", "face_detected", "emotion", "stress_level", "face_x", "face_y"]
+
+
+def find_videos(paths):
+    """
+    Video files among `paths`, expanding directories recursively, mapped to
+    their output name.
+
+    Names come from the path relative to the directory given on the command
+    line ("week1/lecture" becomes "week1__lecture"), so same-named videos in
+    different folders do not overwrite each other's outputs; a hash of the
+    full path is appended if two names still collide.
+    """
+    videos = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                        video = os.path.join(root, name)
+                        videos.setdefault(video, os.path.relpath(video, path))
+        elif os.path.isfile(path):
+            videos.setdefault(path, os.path.basename(path))
+        else:
+            print(f"Skipping {path}: not found")
+
+    names = {}
+    taken = set()
+    for video, relative in videos.items():
+        name = os.path.splitext(relative)[0].replace(os.sep, "__")
+        if name in taken:
+            name += "-" + hashlib.sha1(os.path.abspath(video).encode()).hexdigest()[:8]
+        taken.add(name)
+        names[video] = name
+    return names
+
+
+def count_frames(cap):
+    """Frames in an opened video by grabbing through it, for containers (often webm) without a frame count."""
+    frames = 0
+    while cap.grab():
+        frames += 1
+    return frames
+
+
+def plan_tasks(videos, segment_seconds):
+    """Split each video into (path, start_frame, end_frame, source_fps) segments."""
+    tasks = []
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"Skipping {path}: could not open video")
+            continue
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            frame_count = count_frames(cap)
+        cap.release()
+        if frame_count <= 0:
+            print(f"Skipping {path}: no frames could be read")
+            continue
+        segment_frames = max(1, int(segment_seconds * source_fps))
+        for start in range(0, frame_count, segment_frames):
+            tasks.append((path, start, min(start + segment_frames, frame_count), source_fps))
+    return tasks
+
+
+# The worker process's stress system, built once by init_worker
+_system = None
+
+
+def init_worker(backend, onnx_path):
+    """Load the emotion model and face detector once per worker process."""
+    global _system
+    from stress import CONFIG, StressDetectionSystem
+    cv2.setNumThreads(1)
+    CONFIG['emotion_backend'] = backend
+    CONFIG['emotion_onnx_path'] = onnx_path
+    _system = StressDetectionSystem(persist=False)
+
+
+def analyze_segment(task, sample_fps):
+    """Analyze one segment; returns (path, rows, frames analyzed, busy seconds)."""
+    path, start_frame, end_frame, source_fps = task
+    started = time.perf_counter()
+    # A fresh tracker and change gate per segment; the detector and model are the worker's
+    system = _system
+    system.reset()
+    step = max(1, round(source_fps / sample_fps))
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    rows = []
+    for index in range(start_frame, end_frame):
+        # Frames between samples are only grabbed, never decoded into images
+        if (index - start_frame) % step:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        time_seconds = index / source_fps
+        emotion, stress_level, _, metadata = system.detect_emotion(frame, timestamp=time_seconds)
+        rows.append({
+            "time_seconds": round(time_seconds, 3),
+            "face_detected": emotion is not None,
+            "emotion": emotion,
+            "stress_level": stress_level,
+            "face_x": metadata['face_x'] if metadata else None,
+            "face_y": metadata['face_y'] if metadata else None,
+        })
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return path, rows, frame_size, time.perf_counter() - started
+
+
+def write_outputs(path, name, rows, frame_size, out_dir):
+    """Write the per-frame CSV and the JSON report for one video; returns the report."""
+    from session_stats import SessionStats
+    from session_store import EMOTION_CODES
+    from stress import CONFIG, NumpyEncoder
+
+    rows.sort(key=lambda row: row["time_seconds"])
+    with open(os.path.join(out_dir, f"{name}_frames.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FRAME_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # Replay the samples in order so segment results combine into one session
+    stats = SessionStats(heatmap_bins=CONFIG['heatmap_bins'])
+    for row in rows:
+        if row["face_detected"]:
+            stats.update(row["time_seconds"], EMOTION_CODES[row["emotion"]], row["stress_level"],
+                         row["face_x"], row["face_y"], frame_size)
+    report = stats.summary() if stats.count else {"total_data_points": 0}
+    report.update(video=path, frames_analyzed=len(rows))
+    with open(os.path.join(out_dir, f"{name}_report.json"), "w") as f:
+        json.dump(report, f, cls=NumpyEncoder)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Video files or directories")
+    parser.add_argument("--fps", type=float, default=2.0, help="Frames analyzed per second of video")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--segment-seconds", type=float, default=60.0, help="Video length per work unit")
+    parser.add_argument("--out", default="stress_batch", help="Output directory")
+    parser.add_argument("--backend", choices=["keras", "onnx"], default="keras", help="Emotion inference backend")
+    parser.add_argument("--onnx-path", help="ONNX model for --backend onnx (default weights/emotion_int8.onnx, else weights/emotion.onnx)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.paths)
+    tasks = plan_tasks(videos, args.segment_seconds)
+    if not tasks:
+        raise SystemExit("No readable videos found")
+    os.makedirs(args.out, exist_ok=True)
+
+    results = {path: ([], None) for path, _, _, _ in tasks}
+    busy_seconds = 0.0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.backend, args.onnx_path)) as pool:
+        futures = [pool.submit(analyze_segment, task, args.fps) for task in tasks]
+        for future in as_completed(futures):
+            path, rows, frame_size, busy = future.result()
+            results[path][0].extend(rows)
+            results[path] = (results[path][0], frame_size)
+            busy_seconds += busy
+    wall_seconds = time.perf_counter() - started
+
+    total_frames = 0
+    for path, (rows, frame_size) in results.items():
+        report = write_outputs(path, videos[path], rows, frame_size, args.out)
+        total_frames += len(rows)
+        print(f"{path}: {len(rows)} frames, average stress {report.get('average_stress', 0) or 0:.1f}, "
+              f"dominant emotion {report.get('dominant_emotion')}")
+
+    print(f"{total_frames} frames from {len(results)} video(s) in {wall_seconds:.1f}s "
+          f"with {args.workers} worker(s): {total_frames / wall_seconds:.1f} FPS total, "
+          f"{total_frames / busy_seconds if busy_seconds else 0:.1f} FPS per core")
+
+
+if __name__ == "__main__":
+    main()
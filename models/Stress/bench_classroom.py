@@ -0,0 +1,121 @@
+"""
+Classroom-mode throughput at 1, 4 and 16 faces per frame.
+
+Frames are a grid of copies of one face image (random noise if none is
+given), with a little per-frame noise. Two paths are timed per face count:
+
+  per-face    every face classified on its own, as one DeepFace call per face did
+  classroom   StressDetectionSystem.detect_all: shared tracking and one batched forward pass
+
+The change gate is off in both, so every face pays for inference and the
+speedup is that of batching alone. --change-gate keeps the configured gate
+on in both paths and reports the share of faces it skipped next to the
+timings. With --known-boxes (the default without --face) the grid cells stand in for
+MediaPipe detections, so only tracking and emotion inference are measured:
+
+    python bench_classroom.py --face face.jpg --faces 1 4 16 --frames 100
+"""
+import argparse
+import math
+import time
+
+import cv2
+import numpy as np
+
+from change_gate import ChangeGate
+from stress import CONFIG, StressDetectionSystem
+
+CELL = 160
+
+
+def grid_frame(face, count):
+    """A frame with `count` copies of `face` laid out on a square grid, and their boxes."""
+    side = math.ceil(math.sqrt(count))
+    frame = np.full((side * CELL, side * CELL, 3), 90, dtype=np.uint8)
+    boxes = []
+    tile = cv2.resize(face, (CELL - 20, CELL - 20))
+    for i in range(count):
+        row, col = divmod(i, side)
+        x, y = col * CELL + 10, row * CELL + 10
+        frame[y:y + CELL - 20, x:x + CELL - 20] = tile
+        boxes.append((x, y, CELL - 20, CELL - 20))
+    return frame, boxes
+
+
+def noisy(frame, rng, amount):
+    noise = rng.integers(-amount, amount + 1, size=frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def bench_per_face(system, frames, boxes):
+    start = time.perf_counter()
+    for frame in frames:
+        for i, box in enumerate(boxes):
+            system.classify_faces(frame, [box], [i])
+    return time.perf_counter() - start
+
+
+def bench_classroom(system, frames):
+    start = time.perf_counter()
+    faces = 0
+    for frame in frames:
+        faces += len(system.detect_all(frame))
+    return time.perf_counter() - start, faces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--face", help="Image of a single face to tile")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--noise", type=int, default=6, help="Per-pixel noise added to each frame")
+    parser.add_argument("--known-boxes", action="store_true", help="Use grid cells instead of MediaPipe detection")
+    parser.add_argument("--change-gate", action="store_true",
+                        help="Keep the change gate on in both paths and report its skip rate")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.face:
+        face = cv2.imread(args.face)
+        if face is None:
+            raise SystemExit(f"Could not read {args.face}")
+    else:
+        face = cv2.GaussianBlur(rng.integers(0, 256, size=(CELL, CELL, 3), dtype=np.uint8), (7, 7), 0)
+        args.known_boxes = True
+
+    # -1 never reuses a result: every face is inferred in both paths
+    gate_threshold = CONFIG['change_gate_threshold'] if args.change_gate else -1
+    gate_headers = f" {'per-face skip':>13} {'classroom skip':>14}" if args.change_gate else ""
+    print(f"{'faces':>5}  {'per-face fps':>12} {'classroom fps':>14} {'faces/s':>9} {'ms/face':>8} {'speedup':>8}"
+          f"{gate_headers}")
+    for count in args.faces:
+        base, boxes = grid_frame(face, count)
+        frames = [noisy(base, rng, args.noise) for _ in range(args.frames)]
+
+        per_face_system = StressDetectionSystem(persist=False, classroom=True)
+        per_face_system.classify_faces(frames[0], boxes[:1], [0])  # warm up
+        per_face_system.change_gate = ChangeGate(gate_threshold, CONFIG['change_gate_max_age'])
+        per_face_seconds = bench_per_face(per_face_system, frames, boxes)
+
+        system = StressDetectionSystem(persist=False, classroom=True)
+        if args.known_boxes:
+            system.tracker.detect = lambda frame: list(boxes)
+        system.detect_all(frames[0])  # warm up
+        # A fresh gate so the warm-up frame is neither reused nor counted
+        system.change_gate = ChangeGate(gate_threshold, CONFIG['change_gate_max_age'])
+        classroom_seconds, faces_seen = bench_classroom(system, frames)
+        if faces_seen < count * len(frames):
+            print(f"       note: {faces_seen / len(frames):.1f} of {count} faces found per frame")
+
+        face_rate = faces_seen / classroom_seconds
+        print(f"{count:>5}  {len(frames) / per_face_seconds:>12.1f} {len(frames) / classroom_seconds:>14.1f} "
+              f"{face_rate:>9.1f} {1000 / face_rate if face_rate else float('nan'):>8.2f} "
+              f"{per_face_seconds / classroom_seconds:>7.1f}x"
+              + (f" {per_face_system.change_gate.stats()['skip_rate']:>13.1%}"
+                 f" {system.change_gate.stats()['skip_rate']:>14.1%}" if args.change_gate else ""))
+    gate = f"change gate threshold {gate_threshold} bits" if args.change_gate else "change gate off"
+    print(f"(tracking redetects every {CONFIG['redetect_every']} frames; {gate})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Plotly payload size and build time of the Analytics tab charts vs session length,
+with every sample plotted and with server-side downsampling. The raw heatmap is
+the original px.density_heatmap over every sample; the downsampled one is built
+from the pre-binned running histogram:
+
+    python bench_dashboard_payload.py --samples 1000 10000 100000 --budget 2000
+"""
+import argparse
+import time
+
+import numpy as np
+import plotly.express as px
+
+from zenlearn_common.downsample import payload_bytes
+from emotion_model import EMOTION_LABELS, STRESS_MAP
+from session_stats import SessionStats
+from session_store import SessionStore
+from stress_charts import CHART_LAYOUT, movement_chart, position_heatmap, timeline_chart
+
+
+def synthetic_session(n, seed=0):
+    """A random-walk face position and emotion sequence sampled at 10 Hz."""
+    rng = np.random.default_rng(seed)
+    store = SessionStore(max_samples=max(n, 1))
+    stats = SessionStats()
+    x, y = 320.0, 240.0
+    codes = rng.choice(len(EMOTION_LABELS), size=n, p=[0.05, 0.02, 0.05, 0.2, 0.1, 0.08, 0.5])
+    start = time.time() - n / 10
+    for i in range(n):
+        x = min(max(x + rng.normal(0, 3), 0), 639)
+        y = min(max(y + rng.normal(0, 2), 0), 479)
+        emotion = EMOTION_LABELS[codes[i]]
+        stress = STRESS_MAP[emotion]
+        movement = stats.update(start + i / 10, codes[i], stress, int(x), int(y), (640, 480))
+        store.append(start + i / 10, emotion, stress, int(x), int(y), movement)
+    return store, stats
+
+
+def density_heatmap(store):
+    """The heatmap as the Analytics tab built it before pre-binning: every sample goes to the browser."""
+    fig = px.density_heatmap(store.to_frame(), x='face_x', y='face_y', z='stress_level',
+                             nbinsx=20, nbinsy=20,
+                             labels={'face_x': 'X Position', 'face_y': 'Y Position'},
+                             title='Stress Level Heatmap by Face Position')
+    fig.update_layout(**CHART_LAYOUT)
+    return fig
+
+
+def measure(build):
+    start = time.perf_counter()
+    fig = build()
+    built = time.perf_counter() - start
+    return payload_bytes(fig), built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--budget", type=int, default=2000, help="Points per chart after downsampling")
+    args = parser.parse_args()
+
+    charts = {
+        "timeline": lambda store, stats, budget: timeline_chart(store, budget),
+        "movement": lambda store, stats, budget: movement_chart(store, budget),
+        "heatmap": lambda store, stats, budget: density_heatmap(store) if budget is None else position_heatmap(stats),
+    }
+    print(f"{'samples':>8}  {'chart':<9} {'raw KB':>9} {'raw ms':>8} {'down KB':>9} {'down ms':>8}")
+    for n in args.samples:
+        store, stats = synthetic_session(n)
+        for name, build in charts.items():
+            raw_bytes, raw_time = measure(lambda: build(store, stats, None))
+            down_bytes, down_time = measure(lambda: build(store, stats, args.budget))
+            print(f"{n:>8}  {name:<9} {raw_bytes / 1024:>9.1f} {raw_time * 1000:>8.1f} "
+                  f"{down_bytes / 1024:>9.1f} {down_time * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per-face emotion latency: DeepFace.analyze on each crop vs the preloaded, batched EmotionModel.
+
+Crops are taken from an image or video frame with a face (whole frame if no
+face box is given), or are random noise when no source is passed:
+
+    python bench_emotion.py --source face.jpg --faces 1 4 16 --repeat 20
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from emotion_model import EmotionModel, get_emotion_model
+
+
+def load_crop(source, box):
+    if source is None:
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 256, size=(160, 160, 3), dtype=np.uint8)
+    cap = cv2.VideoCapture(source)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        raise SystemExit(f"Could not read a frame from {source}")
+    if box:
+        x, y, w, h = box
+        frame = frame[y:y+h, x:x+w]
+    return frame
+
+
+def percentiles(samples):
+    return {p: float(np.percentile(samples, p)) for p in (50, 95)}
+
+
+def bench_deepface(crops, repeat):
+    from deepface import DeepFace
+    DeepFace.analyze(crops[0], actions=['emotion'], enforce_detection=False)  # warm up and load weights
+    per_face = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for crop in crops:
+            DeepFace.analyze(crop, actions=['emotion'], enforce_detection=False, silent=True)
+        per_face.append((time.perf_counter() - start) / len(crops))
+    return per_face
+
+
+def bench_batched(model: EmotionModel, crops, repeat):
+    model.predict(crops)  # warm up the graph for this batch size
+    per_face = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(crops)
+        per_face.append((time.perf_counter() - start) / len(crops))
+    return per_face
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="Image or video file to take the face crop from")
+    parser.add_argument("--box", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="Face box within the frame")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4, 16], help="Faces per frame")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-deepface", action="store_true", help="Only benchmark the batched model")
+    args = parser.parse_args()
+
+    crop = load_crop(args.source, args.box)
+    start = time.perf_counter()
+    model = get_emotion_model()
+    print(f"EmotionModel load: {(time.perf_counter() - start) * 1000:.0f} ms (once per process)")
+
+    print(f"{'faces':>5}  {'path':<22} {'p50 ms/face':>12} {'p95 ms/face':>12}")
+    for faces in args.faces:
+        crops = [crop.copy() for _ in range(faces)]
+        paths = [("batched EmotionModel", bench_batched(model, crops, args.repeat))]
+        if not args.skip_deepface:
+            paths.insert(0, ("DeepFace.analyze", bench_deepface(crops, args.repeat)))
+        for name, samples in paths:
+            stats = percentiles(samples)
+            print(f"{faces:>5}  {name:<22} {stats[50] * 1000:>12.2f} {stats[95] * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
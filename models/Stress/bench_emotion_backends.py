@@ -0,0 +1,192 @@
+"""
+Emotion backends side by side: agreement with the Keras model, latency and memory.
+
+Each backend runs in a fresh process so its import time and peak RSS are
+measured on their own (TensorFlow alone accounts for hundreds of MB). The
+first backend is the reference; every other one is checked against it on
+the fixture crops for top-1 agreement and the largest difference in any
+emotion percentage. When the fixtures sit in folders named after emotions
+(e.g. fixtures/happy/0001.png) accuracy against those labels is shown too.
+The exit status is 1 if a backend agrees with the reference on fewer than
+--min-agreement of the crops.
+
+The default fixtures are the face crops committed in fixtures/emotion (the
+faces in the frontend's artwork, shifted, scaled, tilted, flipped and
+relit; unlabelled, so they measure agreement only). The "onnx" backend
+refuses a model until its agreement on them has been recorded with
+--record against the Keras reference, which writes weights/emotion_parity.json:
+
+    python bench_emotion_backends.py --record \\
+        --backends keras onnx:weights/emotion.onnx onnx:weights/emotion_int8.onnx
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+def parse_backend(spec):
+    """("keras", None) or ("onnx", path) from "keras", "onnx" or "onnx:PATH"."""
+    backend, _, path = spec.partition(":")
+    return backend, path or None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_backend(spec, fixtures, batch_sizes, repeat):
+    """Measure one backend in this process; returns a JSON-serializable result."""
+    started = time.perf_counter()
+    from emotion_model import EMOTION_LABELS, get_emotion_model
+    from export_emotion_onnx import load_crops
+    import_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # This bench is what records parity, so it has to load unrecorded models
+    model = get_emotion_model(*parse_backend(spec), require_parity=False)
+    load_seconds = time.perf_counter() - started
+
+    crops, labels = load_crops(fixtures)
+    if not crops:
+        raise SystemExit(f"No images found in {fixtures}")
+
+    scores = []
+    for i in range(0, len(crops), 32):
+        for result in model.predict(crops[i:i + 32]):
+            scores.append([result["emotion"][label] for label in EMOTION_LABELS])
+
+    latency = {}
+    for size in batch_sizes:
+        batch = [crops[i % len(crops)] for i in range(size)]
+        model.predict(batch)  # warm up this batch size
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.predict(batch)
+            samples.append((time.perf_counter() - start) / size)
+        latency[size] = float(np.percentile(samples, 50)) * 1000
+
+    return {
+        "import_seconds": import_seconds,
+        "load_seconds": load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "scores": scores,
+        "labels": labels,
+        "ms_per_face": latency,
+    }
+
+
+def record_parity(spec, agreement, max_diff, crops, fixtures, reference):
+    """Store `spec`'s agreement under its model file's sha256 in PARITY_RECORD_PATH."""
+    from emotion_model import PARITY_RECORD_PATH, file_sha256, load_parity_records, onnx_model_path
+
+    path = onnx_model_path(parse_backend(spec)[1])
+    records = load_parity_records()
+    records[file_sha256(path)] = {
+        "model": os.path.relpath(path, os.path.dirname(PARITY_RECORD_PATH)),
+        "reference": reference,
+        "fixtures": os.path.relpath(os.path.abspath(fixtures), os.path.dirname(os.path.abspath(__file__))),
+        "crops": crops,
+        "agreement": agreement,
+        "max_diff": max_diff,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    os.makedirs(os.path.dirname(PARITY_RECORD_PATH), exist_ok=True)
+    with open(PARITY_RECORD_PATH, "w") as f:
+        json.dump(records, f, indent=2, sort_keys=True)
+
+
+def measure(spec, args):
+    """Run `spec` in a child process and return its result."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", spec, "--result", result_path,
+                   "--fixtures", os.path.abspath(args.fixtures),
+                   "--batch-sizes", *map(str, args.batch_sizes), "--repeat", str(args.repeat)]
+        subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["keras", "onnx"],
+                        help='"keras", "onnx" (weights/emotion_int8.onnx) or "onnx:PATH"; the first is the reference')
+    parser.add_argument("--fixtures", help="Folder of face crops (default: fixtures/emotion)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--min-agreement", type=float,
+                        help="Smallest share of fixtures where a backend must pick the reference's emotion "
+                             "(default: the 95% the onnx backend requires)")
+    parser.add_argument("--record", action="store_true",
+                        help="Record each ONNX backend's agreement in weights/emotion_parity.json")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_backend(args.worker, args.fixtures, args.batch_sizes, args.repeat)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    # Imported only here so the workers' import time includes emotion_model
+    from emotion_model import EMOTION_LABELS, FIXTURES_PATH, MIN_PARITY_AGREEMENT, PARITY_RECORD_PATH
+    args.fixtures = args.fixtures or FIXTURES_PATH
+    if args.min_agreement is None:
+        args.min_agreement = MIN_PARITY_AGREEMENT
+    if args.record and parse_backend(args.backends[0])[0] != "keras":
+        parser.error("--record needs the keras backend as the reference (first in --backends)")
+
+    results = {spec: measure(spec, args) for spec in args.backends}
+    reference = np.array(results[args.backends[0]]["scores"])
+    labels = results[args.backends[0]]["labels"]
+    labelled = [i for i, label in enumerate(labels) if label]
+
+    latency_headers = "".join(f"{f'ms/face@{size}':>12}" for size in args.batch_sizes)
+    width = max(len(spec) for spec in results) + 2
+    print(f"{'backend':<{width}} {'import s':>8} {'load s':>7} {'RSS MB':>7}{latency_headers} "
+          f"{'agree':>6} {'max diff':>8} {'accuracy':>8}")
+    failed = []
+    for spec, result in results.items():
+        scores = np.array(result["scores"])
+        agreement = float((scores.argmax(axis=1) == reference.argmax(axis=1)).mean())
+        max_diff = float(np.abs(scores - reference).max())
+        if labelled:
+            predicted = scores.argmax(axis=1)
+            correct = sum(EMOTION_LABELS[predicted[i]] == labels[i] for i in labelled)
+            accuracy = f"{correct / len(labelled):>8.1%}"
+        else:
+            accuracy = f"{'-':>8}"
+        latency = "".join(f"{result['ms_per_face'][str(size)]:>12.2f}" for size in args.batch_sizes)
+        print(f"{spec:<{width}} {result['import_seconds']:>8.2f} {result['load_seconds']:>7.2f} "
+              f"{result['peak_rss_mb']:>7.0f}{latency} {agreement:>6.1%} {max_diff:>7.1f}% {accuracy}")
+        if agreement < args.min_agreement:
+            failed.append(spec)
+        if args.record and parse_backend(spec)[0] == "onnx":
+            record_parity(spec, agreement, max_diff, len(reference), args.fixtures, args.backends[0])
+
+    print(f"({len(reference)} crops, reference {args.backends[0]}; "
+          f"max diff is the largest change in any emotion percentage)")
+    if args.record:
+        print(f"Recorded in {PARITY_RECORD_PATH}")
+    if failed:
+        print(f"Below {args.min_agreement:.0%} agreement: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
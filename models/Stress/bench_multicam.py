@@ -0,0 +1,68 @@
+"""
+Multi-camera throughput: per-source capture rate, inference rate and latency.
+
+Opens every source at once through CaptureManager (video files play at their
+own frame rate, like live cameras) and reports, after --seconds, how many
+frames per second each source captured and analyzed, the capture-to-result
+latency and how many frames were dropped because inference was busy. Each
+--threads value is a separate run with that many shared inference threads:
+
+    python bench_multicam.py lecture1.mp4 lecture2.mp4 0 --threads 1 2 4 --seconds 20
+"""
+import argparse
+import time
+
+from capture_manager import CaptureManager
+from stress import StressDetectionSystem
+
+
+def run(specs, threads, seconds, classroom):
+    manager = CaptureManager(lambda name: StressDetectionSystem(persist=False, classroom=classroom, source=name),
+                             inference_threads=threads)
+    for spec in specs:
+        if manager.open(spec) is None:
+            print(f"Could not open {spec}")
+    if not manager.sources:
+        raise SystemExit("No sources could be opened")
+
+    # Rates are measured over the meters' sliding window, so sample them just before stopping.
+    # Latencies are keyed on the frame's sequence number: one per analyzed frame, however
+    # often the workers' history is polled
+    latencies = {source.name: {} for source in manager.sources}
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        time.sleep(0.1)
+        for source in manager.sources:
+            for seq, latency in source.worker.latencies.copy():
+                latencies[source.name][seq] = latency * 1000
+    stats = manager.stats()
+    analyzed = {source.name: source.worker.meter.count for source in manager.sources}
+    manager.close()
+    return stats, analyzed, {name: list(samples.values()) for name, samples in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="Camera indices, video files or stream URLs")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2], help="Shared inference threads")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--classroom", action="store_true", help="Score every face in each source")
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        stats, analyzed, latencies = run(args.sources, threads, args.seconds, args.classroom)
+        print(f"\n{threads} inference thread(s), {len(stats)} source(s), {args.seconds:.0f}s")
+        print(f"{'source':<20} {'capture fps':>11} {'infer fps':>9} {'analyzed':>8} {'dropped':>8} "
+              f"{'p50 ms':>7} {'max ms':>7}")
+        for row in stats:
+            samples = sorted(latencies[row['source']])
+            p50 = f"{samples[len(samples) // 2]:>7.0f}" if samples else f"{'-':>7}"
+            worst = f"{samples[-1]:>7.0f}" if samples else f"{'-':>7}"
+            print(f"{row['source']:<20} {row['capture_fps']:>11.1f} {row['inference_fps']:>9.1f} "
+                  f"{analyzed[row['source']]:>8} {row['frames_dropped']:>8} {p50} {worst}")
+        total = sum(analyzed.values()) / args.seconds
+        print(f"{'total':<20} {'':>11} {total:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import math
+import os
+import re
+
+import cv2
+import numpy as np
+
+from zenlearn_common.frame_pipeline import CaptureThread, InferencePool
+
+
+def parse_source(spec):
+    """Camera index for "0", "1", ...; otherwise the file path or stream URL unchanged."""
+    spec = str(spec).strip()
+    return int(spec) if spec.isdigit() else spec
+
+
+def source_name(spec) -> str:
+    """Short, filename-safe name for a source: "camera-0", "lecture", "stream"."""
+    source = parse_source(spec)
+    if isinstance(source, int):
+        return f"camera-{source}"
+    base = os.path.splitext(os.path.basename(source.rstrip("/")))[0]
+    return re.sub(r"[^\w.-]", "_", base) or "source"
+
+
+def open_capture(spec, width: int = 640, height: int = 480):
+    """Open a camera, video file or stream; None if it cannot be opened."""
+    source = parse_source(spec)
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        # Lower resolution for better performance
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    return cap
+
+
+class CameraSource:
+    """One opened source with its capture thread, inference handle and stress system."""
+
+    def __init__(self, name, spec, capture, worker, system, is_file=False):
+        self.name = name
+        self.spec = spec
+        self.capture = capture
+        self.worker = worker
+        self.system = system
+        self.is_file = is_file
+        self.last_seq = -1
+        self.last_frame = None
+
+    def latest_frame(self):
+        """Newest captured frame, or the last one seen if nothing new arrived."""
+        item = self.capture.frames.wait_newer(self.last_seq, timeout=0)
+        if item is not None:
+            self.last_seq, _, self.last_frame = item
+        return self.last_frame
+
+    def status(self) -> str:
+        if self.capture.is_alive():
+            return "live"
+        return "ended" if self.is_file else "lost"
+
+    def stats(self) -> dict:
+        latency = self.worker.latency
+        return {
+            "source": self.name,
+            "status": self.status(),
+            "capture_fps": round(self.capture.meter.rate(), 1),
+            "inference_fps": round(self.worker.meter.rate(), 1),
+            "latency_ms": round(latency * 1000) if latency is not None else None,
+            "frames_dropped": self.worker.frames.dropped,
+            "faces": len(self.worker.result or []),
+            "data_points": self.system.data_points(),
+            "error": self.worker.error,
+        }
+
+
+class CaptureManager:
+    """
+    Several cameras, video files or streams captured and analyzed at once.
+
+    Every source gets its own capture thread, which hands each frame straight
+    to a shared `InferencePool`: only the newest frame of each source is
+    analyzed, so a slow model drops frames instead of falling behind, and a
+    few inference threads serve any number of sources. `make_system(name)`
+    builds the per-source analysis state (tracker, change gate, statistics);
+    the emotion model itself is shared by the whole process.
+    """
+
+    def __init__(self, make_system, inference_threads: int = 2):
+        self.make_system = make_system
+        self.pool = InferencePool(inference_threads, name="multicam-inference").start()
+        self.sources = []
+
+    def open(self, spec):
+        """Start capturing and analyzing `spec`; None if it cannot be opened."""
+        cap = open_capture(spec)
+        if cap is None:
+            return None
+        name = source_name(spec)
+        taken = {source.name for source in self.sources}
+        if name in taken:
+            name = next(f"{name}-{i}" for i in range(2, len(taken) + 2) if f"{name}-{i}" not in taken)
+
+        # Files are read at their own frame rate instead of as fast as they decode
+        is_file = not isinstance(parse_source(spec), int) and os.path.isfile(str(spec).strip())
+        max_fps = (cap.get(cv2.CAP_PROP_FPS) or 30.0) if is_file else None
+
+        system = self.make_system(name)
+        worker = self.pool.add(system.analyze_faces)
+        capture = CaptureThread(cap, name=f"capture-{name}", on_frame=worker.submit, max_fps=max_fps).start()
+        source = CameraSource(name, spec, capture, worker, system, is_file)
+        self.sources.append(source)
+        return source
+
+    def stats(self) -> list:
+        return [source.stats() for source in self.sources]
+
+    def close(self):
+        """Stop every capture and the shared inference threads, and flush recorded samples."""
+        for source in self.sources:
+            source.capture.stop()
+            source.worker.stop()
+        self.pool.stop()
+        for source in self.sources:
+            if source.system.metadata_writer is not None:
+                source.system.metadata_writer.flush(timeout=5.0)
+        self.sources = []
+
+
+def draw_faces(frame, faces):
+    """Box and label every (face_id, emotion, stress_level, bbox) result on `frame` in place."""
+    for face_id, emotion, stress_level, (x, y, w, h) in faces:
+        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{face_id} {emotion} {stress_level}%", (x, max(15, y - 8)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return frame
+
+
+def mosaic(tiles, tile_width: int = 480, columns: int = None):
+    """
+    One image with every source's frame side by side.
+
+    `tiles` is a list of (name, frame or None). Sending a single image to the
+    browser per refresh is much cheaper than one image per source.
+    """
+    columns = columns or math.ceil(math.sqrt(len(tiles)))
+    tile_height = tile_width * 3 // 4
+    rows = math.ceil(len(tiles) / columns)
+    canvas = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    for i, (name, frame) in enumerate(tiles):
+        row, col = divmod(i, columns)
+        x, y = col * tile_width, row * tile_height
+        if frame is not None:
+            # Letterbox to keep the aspect ratio
+            scale = min(tile_width / frame.shape[1], tile_height / frame.shape[0])
+            w, h = int(frame.shape[1] * scale), int(frame.shape[0] * scale)
+            ox, oy = x + (tile_width - w) // 2, y + (tile_height - h) // 2
+            canvas[oy:oy+h, ox:ox+w] = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        cv2.putText(canvas, name, (x + 10, y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return canvas
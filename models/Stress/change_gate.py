@@ -0,0 +1,61 @@
+import time
+
+import cv2
+import numpy as np
+
+
+def dhash(crop, size: int = 8) -> int:
+    """64-bit difference hash of an image: brightness gradients of a 9x8 thumbnail."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ChangeGate:
+    """
+    Skips emotion inference for faces whose crop has not visibly changed.
+
+    Each face (keyed by its track id) remembers the perceptual hash of the
+    crop it was last classified on. A new crop within `threshold` differing
+    hash bits reuses that result, for at most `max_age` seconds, after which
+    the face is classified again regardless.
+    """
+
+    def __init__(self, threshold: int = 5, max_age: float = 2.0):
+        self.threshold = threshold
+        self.max_age = max_age
+        # key -> (hash, result, analyzed_at)
+        self._last = {}
+        self.checks = 0
+        self.skipped = 0
+
+    def lookup(self, key, crop, now: float = None):
+        """Returns (reusable result or None, hash of `crop`)."""
+        now = time.time() if now is None else now
+        crop_hash = dhash(crop)
+        self.checks += 1
+        last = self._last.get(key)
+        if last is not None:
+            last_hash, result, analyzed_at = last
+            if now - analyzed_at <= self.max_age and bin(crop_hash ^ last_hash).count("1") <= self.threshold:
+                self.skipped += 1
+                return result, crop_hash
+        return None, crop_hash
+
+    def store(self, key, crop_hash: int, result, now: float = None):
+        self._last[key] = (crop_hash, result, time.time() if now is None else now)
+
+    def retain(self, keys):
+        """Forget faces that are no longer tracked."""
+        keys = set(keys)
+        for key in list(self._last):
+            if key not in keys:
+                del self._last[key]
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.checks if self.checks else 0.0,
+        }
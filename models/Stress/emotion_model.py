@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Output order of DeepFace's facial expression model
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+INPUT_SIZE = 48
+# DeepFace pads every face to this square before the emotion model shrinks it to INPUT_SIZE
+DEEPFACE_TARGET_SIZE = 224
+
+# Where export_emotion_onnx.py writes the float32 model and, with --quantize, the int8 one.
+# The "onnx" backend uses the int8 model by default and the float32 one if there is no int8 model.
+FLOAT_ONNX_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "emotion.onnx")
+ONNX_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "emotion_int8.onnx")
+# bench_emotion_backends.py --record stores each ONNX model's agreement with the Keras model on
+# FIXTURES_PATH here, keyed by the model file's sha256; the "onnx" backend only loads a model
+# whose record reaches MIN_PARITY_AGREEMENT
+PARITY_RECORD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "emotion_parity.json")
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "emotion")
+MIN_PARITY_AGREEMENT = 0.95
+
+# Stress level (0-100) attributed to each emotion
+STRESS_MAP = {
+    "angry": 80, "fear": 70, "sad": 60,
+    "disgust": 50, "neutral": 30,
+    "happy": 10, "surprise": 20
+}
+
+
+def load_emotion_model():
+    """Load DeepFace's facial expression network and return the underlying Keras model."""
+    from deepface import DeepFace
+    try:
+        model = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+    except TypeError:
+        # deepface < 0.0.93 takes only the model name
+        model = DeepFace.build_model("Emotion")
+    # Newer deepface versions wrap the Keras model in a client object
+    return getattr(model, "model", model)
+
+
+def pad_to_square(image: np.ndarray, size: int) -> np.ndarray:
+    """`image` scaled to fit `size`x`size` without distortion and centred on black, as DeepFace does."""
+    height, width = image.shape[:2]
+    factor = min(size / height, size / width)
+    image = cv2.resize(image, (max(1, int(width * factor)), max(1, int(height * factor))))
+    pad_y, pad_x = size - image.shape[0], size - image.shape[1]
+    image = np.pad(image, ((pad_y // 2, pad_y - pad_y // 2), (pad_x // 2, pad_x - pad_x // 2)), "constant")
+    if image.shape[:2] != (size, size):
+        image = cv2.resize(image, (size, size))
+    return image
+
+
+def preprocess_faces(crops) -> np.ndarray:
+    """
+    Turn BGR face crops into the model's input batch.
+
+    Follows DeepFace's own preprocessing for the emotion model: the crop is
+    scaled to fit 224x224 with its aspect ratio kept and padded with black
+    to a square (`resize_image`), then converted to grayscale, resized to
+    48x48 and scaled to [0, 1]. Returns a float32 array of shape
+    (N, 48, 48, 1).
+    """
+    batch = np.empty((len(crops), INPUT_SIZE, INPUT_SIZE, 1), dtype=np.float32)
+    for i, crop in enumerate(crops):
+        # Grayscale is a per-pixel weighted sum, so converting before the
+        # resize and the zero padding gives the same result on one channel
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        batch[i, :, :, 0] = cv2.resize(pad_to_square(gray, DEEPFACE_TARGET_SIZE), (INPUT_SIZE, INPUT_SIZE))
+    batch *= 1.0 / 255.0
+    return batch
+
+
+def postprocess_scores(scores) -> list:
+    """Per-face results shaped like `DeepFace.analyze` output: dominant emotion and percentages."""
+    scores = np.asarray(scores, dtype=np.float32)
+    results = []
+    for row in scores:
+        total = float(row.sum()) or 1.0
+        results.append({
+            "dominant_emotion": EMOTION_LABELS[int(row.argmax())],
+            "emotion": {label: float(value) * 100 / total for label, value in zip(EMOTION_LABELS, row)},
+        })
+    return results
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_parity_records(record_path: str = PARITY_RECORD_PATH) -> dict:
+    """The recorded bench results, keyed by model sha256 (empty if nothing was recorded yet)."""
+    try:
+        with open(record_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def check_parity(path: str, record_path: str = PARITY_RECORD_PATH) -> dict:
+    """
+    The parity record of the ONNX model at `path`; raises RuntimeError if there is none or it failed.
+
+    The record has to match the file's contents, so re-exporting or
+    re-quantizing the model means running the bench again.
+    """
+    record = load_parity_records(record_path).get(file_sha256(path))
+    if record is None:
+        raise RuntimeError(
+            f"{path} has no recorded agreement with the Keras model; run "
+            f"bench_emotion_backends.py --record --backends keras onnx:{path} first")
+    if record["agreement"] < MIN_PARITY_AGREEMENT:
+        raise RuntimeError(
+            f"{path} agrees with the Keras model on only {record['agreement']:.1%} of "
+            f"{record['crops']} fixture crops (needs {MIN_PARITY_AGREEMENT:.0%}); keep the keras backend")
+    return record
+
+
+class EmotionModel:
+    """
+    DeepFace's emotion classifier, loaded once and fed face crops directly.
+
+    The crops come from MediaPipe detection already, so DeepFace's second
+    detection and alignment pass is skipped, and all faces of a frame go
+    through the network in one forward pass.
+    """
+
+    def __init__(self, model=None):
+        self.model = model if model is not None else load_emotion_model()
+        self._lock = threading.Lock()
+
+    def predict(self, crops) -> list:
+        if len(crops) == 0:
+            return []
+        batch = preprocess_faces(crops)
+        with self._lock:
+            scores = self.model(batch, training=False)
+        return postprocess_scores(scores)
+
+
+class OnnxEmotionModel:
+    """
+    The same emotion network exported to ONNX (optionally int8), run with ONNX Runtime.
+
+    Takes the same crops and returns the same results as `EmotionModel`, but
+    never imports TensorFlow or DeepFace. ONNX Runtime sessions can be run
+    from several threads at once, so no lock is needed.
+    """
+
+    def __init__(self, path: str = ONNX_MODEL_PATH, threads: int = None):
+        import onnxruntime as ort
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; create it with export_emotion_onnx.py")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, crops) -> list:
+        if len(crops) == 0:
+            return []
+        scores = self.session.run(None, {self.input_name: preprocess_faces(crops)})[0]
+        return postprocess_scores(scores)
+
+
+def get_emotion_model(backend: str = "keras", path: str = None, require_parity: bool = True):
+    """
+    Process-wide model instance, shared by every StressDetectionSystem.
+
+    `backend` is "keras" (DeepFace's TensorFlow model) or "onnx" (the model at
+    `path`; by default `ONNX_MODEL_PATH`, or `FLOAT_ONNX_MODEL_PATH` when the
+    export was run without --quantize). An ONNX model is only loaded once
+    its parity with the Keras model has been recorded (see `check_parity`);
+    `require_parity=False` is for the bench that records it.
+    """
+    if backend == "onnx":
+        return _cached_model(backend, onnx_model_path(path), require_parity)
+    return _cached_model(backend, None, False)
+
+
+def onnx_model_path(path: str = None) -> str:
+    """Absolute path of the model the "onnx" backend loads for `path` (None picks the default)."""
+    if path is None and not os.path.exists(ONNX_MODEL_PATH) and os.path.exists(FLOAT_ONNX_MODEL_PATH):
+        path = FLOAT_ONNX_MODEL_PATH
+    return os.path.abspath(path or ONNX_MODEL_PATH)
+
+
+@lru_cache(maxsize=None)
+def _cached_model(backend, path, require_parity):
+    # Keyed on normalized arguments so default and explicit calls share one instance
+    if backend == "keras":
+        return EmotionModel()
+    if backend == "onnx":
+        if require_parity and os.path.exists(path):
+            check_parity(path)
+        return OnnxEmotionModel(path)
+    raise ValueError(f"Unknown emotion backend: {backend}")
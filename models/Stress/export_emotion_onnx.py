@@ -0,0 +1,101 @@
+"""
+Export DeepFace's emotion network to ONNX for the "onnx" emotion backend.
+
+Writes the float32 model and, with --quantize, an int8 copy; the backend
+uses the int8 model when there is one and the float32 model otherwise. Without
+--calibration the weights are quantized dynamically; with a folder of face
+crops the activations are calibrated on them too (static quantization),
+which is usually both faster and closer to the float model:
+
+    python export_emotion_onnx.py --quantize --calibration fixtures/
+
+The export itself needs tensorflow, deepface and tf2onnx; running the result
+only needs onnxruntime. The "onnx" backend refuses the exported models until
+bench_emotion_backends.py --record has stored their agreement with the Keras
+model on the committed fixture crops (see emotion_model.check_parity).
+"""
+import argparse
+import os
+
+from emotion_model import (EMOTION_LABELS, FLOAT_ONNX_MODEL_PATH, INPUT_SIZE, ONNX_MODEL_PATH, load_emotion_model,
+                           preprocess_faces)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def load_crops(directory):
+    """
+    Every image under `directory` as a BGR crop, with its label.
+
+    The label is the name of the image's folder when that is an emotion
+    (FER-2013 layout, e.g. fixtures/happy/0001.png), otherwise None.
+    """
+    import cv2
+    crops, labels = [], []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        label = os.path.basename(root).lower()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                crop = cv2.imread(os.path.join(root, name))
+                if crop is not None:
+                    crops.append(crop)
+                    labels.append(label if label in EMOTION_LABELS else None)
+    return crops, labels
+
+
+def export_float(path, opset):
+    import tensorflow as tf
+    import tf2onnx
+
+    model = load_emotion_model()
+    spec = (tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 1), tf.float32, name="faces"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path)
+
+
+def quantize(float_path, int8_path, calibration_crops=None, batch_size=16):
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    if not calibration_crops:
+        quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+        return
+
+    class CropReader(CalibrationDataReader):
+        def __init__(self):
+            batches = [preprocess_faces(calibration_crops[i:i + batch_size])
+                       for i in range(0, len(calibration_crops), batch_size)]
+            self._feeds = iter({"faces": batch} for batch in batches)
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    quantize_static(float_path, int8_path, CropReader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default=os.path.dirname(ONNX_MODEL_PATH))
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 model")
+    parser.add_argument("--calibration", help="Folder of face crops for static int8 calibration")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    float_path = os.path.join(args.out_dir, os.path.basename(FLOAT_ONNX_MODEL_PATH))
+    export_float(float_path, args.opset)
+    print(f"Wrote {float_path} ({os.path.getsize(float_path) / 1e6:.1f} MB)")
+
+    if args.quantize:
+        crops = load_crops(args.calibration)[0] if args.calibration else None
+        if args.calibration and not crops:
+            raise SystemExit(f"No images found in {args.calibration}")
+        int8_path = os.path.join(args.out_dir, os.path.basename(ONNX_MODEL_PATH))
+        quantize(float_path, int8_path, crops)
+        mode = f"static, calibrated on {len(crops)} crops" if crops else "dynamic"
+        print(f"Wrote {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB, {mode})")
+
+
+if __name__ == "__main__":
+    main()
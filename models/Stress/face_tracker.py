@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+
+
+def iou(a, b) -> float:
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detection_boxes(detections, frame_shape) -> list:
+    """Pixel (x, y, w, h) boxes from MediaPipe face detections, clipped to the frame."""
+    boxes = []
+    if detections.detections:
+        ih, iw = frame_shape[:2]
+        for detection in detections.detections:
+            bboxC = detection.location_data.relative_bounding_box
+            x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), int(bboxC.width * iw), int(bboxC.height * ih)
+
+            # Ensure coordinates are within frame boundaries
+            x = max(0, x)
+            y = max(0, y)
+            w = min(w, iw - x)
+            h = min(h, ih - y)
+
+            # Only keep valid face regions
+            if w > 0 and h > 0:
+                boxes.append((x, y, w, h))
+    return boxes
+
+
+class Track:
+    """A face box followed across frames, with a stable id."""
+
+    def __init__(self, track_id: int, box):
+        self.id = track_id
+        self.box = box
+        self.points = None
+        self.confidence = 1.0
+
+
+class FaceTracker:
+    """
+    Carries face boxes from one detection to the next with sparse optical flow.
+
+    `detect(frame)` (e.g. MediaPipe) only runs every `redetect_every` frames,
+    when no face is being tracked, or when a track's confidence (the share of
+    its corner points that survived a forward-backward Lucas-Kanade check)
+    drops below `min_confidence`. In between, each box is shifted and scaled
+    by the median motion of its points. Detections are matched to existing
+    tracks by IoU so a face keeps its id across redetections.
+    """
+
+    def __init__(self, detect, redetect_every: int = 10, min_confidence: float = 0.6,
+                 min_points: int = 6, match_iou: float = 0.3, max_points: int = 40):
+        self.detect = detect
+        self.redetect_every = redetect_every
+        self.min_confidence = min_confidence
+        self.min_points = min_points
+        self.match_iou = match_iou
+        self.max_points = max_points
+        self.tracks = []
+        self._next_id = 0
+        self._prev_gray = None
+        self._since_detection = 0
+        self.frames = 0
+        self.detections = 0
+
+    def update(self, frame) -> list:
+        """Face tracks for this frame, as a list of `Track`."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frames += 1
+
+        if self.tracks and self._prev_gray is not None and self._since_detection < self.redetect_every:
+            self._flow(self._prev_gray, gray)
+            tracked = all(t.confidence >= self.min_confidence for t in self.tracks)
+        else:
+            tracked = False
+
+        if tracked:
+            self._since_detection += 1
+        else:
+            self._redetect(frame, gray)
+
+        self._prev_gray = gray
+        return list(self.tracks)
+
+    def _redetect(self, frame, gray):
+        boxes = self.detect(frame)
+        self.detections += 1
+        self._since_detection = 0
+
+        unmatched = list(self.tracks)
+        tracks = []
+        for box in boxes:
+            best = max(unmatched, key=lambda t: iou(t.box, box), default=None)
+            if best is not None and iou(best.box, box) >= self.match_iou:
+                unmatched.remove(best)
+                best.box = box
+                track = best
+            else:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+            track.confidence = 1.0
+            track.points = self._seed_points(gray, box)
+            tracks.append(track)
+        self.tracks = tracks
+
+    def _seed_points(self, gray, box):
+        x, y, w, h = box
+        points = cv2.goodFeaturesToTrack(gray[y:y+h, x:x+w], maxCorners=self.max_points, qualityLevel=0.01,
+                                         minDistance=max(2, min(w, h) // 10))
+        if points is not None:
+            points += np.array([x, y], dtype=np.float32)
+        return points
+
+    def _flow(self, prev_gray, gray):
+        height, width = gray.shape
+        active = []
+        for track in self.tracks:
+            if track.points is None or len(track.points) < self.min_points:
+                track.confidence = 0.0
+            else:
+                active.append(track)
+        if not active:
+            return
+
+        # One forward and one backward Lucas-Kanade pass for the points of all
+        # faces together, so the image pyramids are built once per frame
+        counts = [len(track.points) for track in active]
+        old_all = np.concatenate([track.points for track in active])
+        new_all, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, old_all, None)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, new_all, None)
+        error = np.linalg.norm((old_all - back).reshape(-1, 2), axis=1)
+        good_all = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < 1.0)
+
+        offset = 0
+        for track, count in zip(active, counts):
+            part = slice(offset, offset + count)
+            offset += count
+            good = good_all[part]
+            track.confidence = float(good.mean())
+            if good.sum() < self.min_points:
+                track.confidence = 0.0
+                continue
+
+            old = old_all[part].reshape(-1, 2)[good]
+            new = new_all[part].reshape(-1, 2)[good]
+            dx, dy = np.median(new - old, axis=0)
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            scale = float(np.median(new_spread) / np.median(old_spread)) if np.median(old_spread) > 0 else 1.0
+
+            x, y, w, h = track.box
+            cx, cy = x + w / 2 + dx, y + h / 2 + dy
+            w, h = w * scale, h * scale
+            x = int(round(max(0, cx - w / 2)))
+            y = int(round(max(0, cy - h / 2)))
+            w = int(round(min(w, width - x)))
+            h = int(round(min(h, height - y)))
+            if w <= 0 or h <= 0:
+                track.confidence = 0.0
+                continue
+            track.box = (x, y, w, h)
+            track.points = new.reshape(-1, 1, 2)
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "detections_saved": self.frames - self.detections,
+            "tracks": len(self.tracks),
+        }
@@ -0,0 +1,264 @@
+import atexit
+import csv
+import logging
+import os
+import queue
+import threading
+import time
+
+FSYNC_POLICIES = ("batch", "close", "never")
+# Queue timeout sentinel: no new rows, but failed ones are due to be retried
+_RETRY = object()
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataWriter:
+    """
+    Persists every sample from a background thread, in batches.
+
+    `write` only enqueues the row, so the frame loop never waits on disk. The
+    writer thread flushes a batch once `batch_size` rows are waiting or
+    `flush_interval` seconds after the first row of the batch arrived. The
+    queue is unbounded, so samples are never dropped; a slow disk only makes
+    `pending` grow. With fsync="batch" every batch is fsynced, "close" only
+    fsyncs on shutdown, and "never" leaves it to the OS.
+
+    A batch that fails to write is logged and kept, and written again together
+    with the next one, after `retry_interval` seconds doubling up to
+    `max_retry_interval` while the failures last. `flush` waits for those rows
+    too; rows still failing when the writer is closed are logged as lost.
+
+    CSV output appends to an existing file. Parquet output (needs pyarrow)
+    writes each batch as a row group of a new file (timestamped if `path`
+    already exists), which is only readable once the writer is closed.
+    """
+
+    def __init__(self, path: str, columns, format: str = "csv", batch_size: int = 256,
+                 flush_interval: float = 1.0, fsync: str = "batch", retry_interval: float = 1.0,
+                 max_retry_interval: float = 30.0):
+        if format not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported metadata format: {format}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.columns = list(columns)
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._queue = queue.Queue()
+        # Rows of failed batches and flush markers waiting on them (writer thread only)
+        self._failed = []
+        self._waiting = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._file = None
+        self._csv = None
+        self._parquet = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.lost = 0
+        self.last_batch_seconds = 0.0
+        self.max_batch_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="metadata-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, row: dict):
+        self._queue.put(row)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None):
+        """Block until every row written so far is on disk."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Write out remaining rows, fsync and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            try:
+                # With rows to retry, wake up for the retry even if nothing new arrives
+                item = self._queue.get(timeout=max(0.0, self._retry_at - time.time()) if self._failed else None)
+            except queue.Empty:
+                item = _RETRY
+            batch, markers, stop = [], [], False
+            deadline = time.time() + self.flush_interval
+            while item is not _RETRY:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or markers or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+
+            batch = self._failed + batch
+            self._failed = []
+            if batch and not stop and time.time() < self._retry_at:
+                # The last attempt failed and the next one is not due yet
+                self._failed = batch
+            elif batch:
+                try:
+                    self._write_batch(batch)
+                    self._failures = 0
+                except Exception:
+                    self._failures += 1
+                    self.failed_batches += 1
+                    self._failed = batch
+                    self._retry_at = time.time() + self._retry_delay()
+                    logger.exception("Metadata write of %d rows to %s failed (attempt %d), retrying in %.1fs",
+                                     len(batch), self.path, self._failures, self._retry_delay())
+            # Flush markers are released once everything before them is written
+            self._waiting.extend(markers)
+            if not self._failed:
+                for marker in self._waiting:
+                    marker.set()
+                self._waiting = []
+            if stop:
+                if self._failed:
+                    self.lost += len(self._failed)
+                    logger.error("Closing metadata writer for %s with %d unwritten rows", self.path,
+                                 len(self._failed))
+                for marker in self._waiting:
+                    marker.set()
+                self._finish()
+                return
+
+    def _retry_delay(self) -> float:
+        return min(self.retry_interval * 2 ** max(0, self._failures - 1), self.max_retry_interval)
+
+    def _write_batch(self, batch):
+        start = time.perf_counter()
+        if self.format == "csv":
+            if self._file is None:
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                self._file = open(self.path, "a", newline="")
+                self._csv = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+                if new_file:
+                    self._csv.writeheader()
+                    self._file.flush()
+            offset = self._file.tell()
+            try:
+                self._csv.writerows(batch)
+                self._file.flush()
+                if self.fsync == "batch":
+                    os.fsync(self._file.fileno())
+            except Exception:
+                self._discard_csv(offset)
+                raise
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist(batch)
+            if self._parquet is None:
+                self.path = self._unused_path(self.path)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            try:
+                self._parquet.write_table(table)
+            except Exception:
+                # A half-written row group leaves the file unusable; the retry starts a new one
+                try:
+                    self._parquet.close()
+                except Exception:
+                    pass
+                self._parquet = None
+                raise
+        self.written += len(batch)
+        self.batches += 1
+        self.last_batch_seconds = time.perf_counter() - start
+        self.max_batch_seconds = max(self.max_batch_seconds, self.last_batch_seconds)
+
+    def _discard_csv(self, offset):
+        """Cut a partly written batch off the CSV file and reopen it on the next attempt."""
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        self._file = None
+        self._csv = None
+        try:
+            os.truncate(self.path, offset)
+        except OSError:
+            logger.exception("Could not remove a partly written batch from %s", self.path)
+
+    @staticmethod
+    def _unused_path(path: str) -> str:
+        if not os.path.exists(path):
+            return path
+        root, ext = os.path.splitext(path)
+        candidate, n = f"{root}_{time.strftime('%Y%m%d%H%M%S')}{ext}", 1
+        while os.path.exists(candidate):
+            candidate = f"{root}_{time.strftime('%Y%m%d%H%M%S')}_{n}{ext}"
+            n += 1
+        return candidate
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+            if self.fsync != "never":
+                fd = os.open(self.path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "pending": self.pending,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "retrying": len(self._failed),
+            "lost": self.lost,
+            "last_batch_ms": self.last_batch_seconds * 1000,
+            "max_batch_ms": self.max_batch_seconds * 1000,
+        }
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def shared_writer(path: str, columns, **options) -> MetadataWriter:
+    """
+    One writer per output file for the whole process, flushed and closed at exit.
+
+    Streamlit re-executes the app script on every rerun, so the writer has to
+    live here rather than in the script for all sessions to share it.
+    """
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = MetadataWriter(path, columns, **options)
+            atexit.register(writer.close)
+            _writers[path] = writer
+        return writer
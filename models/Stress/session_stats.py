@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+from emotion_model import EMOTION_LABELS
+
+
+class RunningStats:
+    """Welford's online mean and variance, plus min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (ddof=1), like pandas; NaN with fewer than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / self.count) if self.count else math.nan
+
+
+class PositionHistogram:
+    """
+    Fixed-grid 2D histogram of face positions with the stress summed per cell.
+
+    The grid spans the frame, whose size is taken from the first sample, so
+    adding a sample is a single cell update and the heatmap is always ready.
+    """
+
+    def __init__(self, bins: int = 20):
+        self.bins = bins
+        self.frame_size = None
+        self.counts = np.zeros((bins, bins), dtype=np.int64)
+        self.stress_sum = np.zeros((bins, bins), dtype=np.float64)
+
+    def update(self, x: float, y: float, stress_level: float, frame_size):
+        if self.frame_size is None:
+            self.frame_size = frame_size
+        width, height = self.frame_size
+        col = min(max(int(x * self.bins / width), 0), self.bins - 1)
+        row = min(max(int(y * self.bins / height), 0), self.bins - 1)
+        self.counts[row, col] += 1
+        self.stress_sum[row, col] += stress_level
+
+    def centers(self):
+        """Bin centres in pixels along x and y."""
+        width, height = self.frame_size or (self.bins, self.bins)
+        edges = (np.arange(self.bins) + 0.5) / self.bins
+        return edges * width, edges * height
+
+
+class SessionStats:
+    """
+    Session aggregates updated in O(1) per sample, so the dashboard and the
+    report cost the same after one minute or one day of recording.
+
+    Stress levels only take integer values 0-100, so a 101-bin value count is
+    kept next to the Welford stats. It gives the exact number of samples with
+    a z-score above `peak_zscore` against the whole-session mean and standard
+    deviation (what `scipy.stats.zscore` computed over the full history) in
+    a constant-time query.
+    """
+
+    def __init__(self, heatmap_bins: int = 20, peak_zscore: float = 2.0):
+        self.peak_zscore = peak_zscore
+        self.stress = RunningStats()
+        self.movement = RunningStats()
+        self.emotion_counts = np.zeros(len(EMOTION_LABELS), dtype=np.int64)
+        self.stress_counts = np.zeros(101, dtype=np.int64)
+        self.positions = PositionHistogram(heatmap_bins)
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self._last_position = None
+
+    @property
+    def count(self) -> int:
+        return self.stress.count
+
+    def update(self, timestamp: float, emotion_code: int, stress_level: int, face_x: int, face_y: int, frame_size) -> float:
+        """Add one sample; returns the face movement since the previous sample (NaN for the first)."""
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.stress.update(stress_level)
+        self.emotion_counts[emotion_code] += 1
+        self.stress_counts[min(max(int(stress_level), 0), 100)] += 1
+        self.positions.update(face_x, face_y, stress_level, frame_size)
+
+        movement = math.nan
+        if self._last_position is not None:
+            movement = math.hypot(face_x - self._last_position[0], face_y - self._last_position[1])
+            self.movement.update(movement)
+        self._last_position = (face_x, face_y)
+        return movement
+
+    def dominant_emotion(self):
+        return EMOTION_LABELS[int(self.emotion_counts.argmax())] if self.count else None
+
+    def stress_peaks(self) -> int:
+        std = self.stress.std
+        if self.count < 2 or not std:
+            return 0
+        levels = np.arange(101)
+        return int(self.stress_counts[(levels - self.stress.mean) / std > self.peak_zscore].sum())
+
+    def summary(self) -> dict:
+        return {
+            "average_stress": self.stress.mean,
+            "max_stress": int(self.stress.max) if self.count else None,
+            "stress_variance": self.stress.variance,
+            "dominant_emotion": self.dominant_emotion(),
+            "face_position_changes": max(self.count - 1, 0),
+            "average_movement": self.movement.mean if self.movement.count else None,
+            "stress_peaks": self.stress_peaks(),
+            "total_data_points": self.count,
+            "session_duration_seconds": (self.last_timestamp - self.first_timestamp) if self.count > 1 else 0,
+        }
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from emotion_model import EMOTION_LABELS
+
+# Column layout of one sample: 8 + 1 + 1 + 2 + 2 + 4 = 18 bytes
+SAMPLE_DTYPES = {
+    "timestamp": np.float64,   # seconds since the epoch
+    "emotion": np.uint8,       # index into EMOTION_LABELS
+    "stress_level": np.uint8,  # 0-100
+    "face_x": np.int16,        # face centre in pixels
+    "face_y": np.int16,
+    "movement": np.float32,    # face displacement since the previous sample, NaN for the first
+}
+BYTES_PER_SAMPLE = sum(np.dtype(dtype).itemsize for dtype in SAMPLE_DTYPES.values())
+
+EMOTION_CODES = {label: code for code, label in enumerate(EMOTION_LABELS)}
+
+
+class SessionStore:
+    """
+    Columnar store of stress samples in preallocated numpy arrays.
+
+    Each sample costs BYTES_PER_SAMPLE (18) bytes. Arrays start at
+    `initial_capacity` rows and double as the session grows. Once
+    `max_samples` are retained, the oldest samples roll over: the buffer is
+    sized to twice `max_samples` and the newest `max_samples` rows are moved
+    back to the front whenever the write position reaches the end. That
+    single move per `max_samples` appends keeps appends amortized O(1) and
+    the retained window contiguous, so `columns()` always returns views
+    rather than copies. Peak memory is 2 * max_samples * 18 bytes (about
+    7.2MB for the default 200k samples).
+    """
+
+    def __init__(self, max_samples: int = 200_000, initial_capacity: int = 1024):
+        self.max_samples = max_samples
+        self._arrays = {name: np.empty(min(initial_capacity, 2 * max_samples), dtype=dtype)
+                        for name, dtype in SAMPLE_DTYPES.items()}
+        self._start = 0
+        self._end = 0
+        # Samples ever appended, including rolled-over ones
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def capacity(self) -> int:
+        return len(self._arrays["timestamp"])
+
+    def append(self, timestamp: float, emotion: str, stress_level: int, face_x: int, face_y: int,
+               movement: float = float("nan")):
+        if self._end == self.capacity:
+            self._make_room()
+        i = self._end
+        arrays = self._arrays
+        arrays["timestamp"][i] = timestamp
+        arrays["emotion"][i] = EMOTION_CODES[emotion]
+        arrays["stress_level"][i] = stress_level
+        arrays["face_x"][i] = face_x
+        arrays["face_y"][i] = face_y
+        arrays["movement"][i] = movement
+        self._end += 1
+        if self._end - self._start > self.max_samples:
+            self._start += 1
+        self.total += 1
+
+    def _make_room(self):
+        if self.capacity < 2 * self.max_samples:
+            # Grow: double, keeping the retained rows at the front
+            size = min(2 * self.capacity, 2 * self.max_samples)
+            for name, array in self._arrays.items():
+                grown = np.empty(size, dtype=array.dtype)
+                grown[:len(self)] = array[self._start:self._end]
+                self._arrays[name] = grown
+        else:
+            # Roll over: move the retained window back to the front in place
+            for array in self._arrays.values():
+                array[:len(self)] = array[self._start:self._end]
+        self._end -= self._start
+        self._start = 0
+
+    def columns(self) -> dict:
+        """Views of the retained samples, oldest first; valid until the next append."""
+        return {name: array[self._start:self._end] for name, array in self._arrays.items()}
+
+    def copy(self) -> "SessionStore":
+        """Independent copy of the retained samples, for reading while this store keeps growing."""
+        clone = SessionStore.__new__(SessionStore)
+        clone.max_samples = self.max_samples
+        clone._arrays = {name: column.copy() for name, column in self.columns().items()}
+        clone._start = 0
+        clone._end = len(self)
+        clone.total = self.total
+        return clone
+
+    def emotions(self) -> np.ndarray:
+        """Emotion labels of the retained samples."""
+        return np.asarray(EMOTION_LABELS)[self.columns()["emotion"]]
+
+    def to_frame(self, index=None) -> pd.DataFrame:
+        """
+        DataFrame for plotting, with local datetime timestamps and categorical
+        emotions. `index` (positions or a slice) selects samples first, so only
+        the selected rows are converted.
+        """
+        columns = self.columns()
+        if index is not None:
+            columns = {name: column[index] for name, column in columns.items()}
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(columns["timestamp"], unit="s", utc=True)
+                           .tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None),
+            "emotion": pd.Categorical.from_codes(columns["emotion"], EMOTION_LABELS),
+            "stress_level": columns["stress_level"],
+            "face_x": columns["face_x"],
+            "face_y": columns["face_y"],
+            "movement": columns["movement"],
+        })
+
+    def memory_bytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays.values())
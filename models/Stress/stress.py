@@ -4,15 +4,22 @@ import numpy as np
 import mediapipe as mp
 import pandas as pd
 from datetime import datetime
-from deepface import DeepFace
 from collections import deque
 import json
 import os
-import matplotlib.pyplot as plt
-from scipy.stats import zscore
-import plotly.express as px
+import copy
+import threading
 import plotly.graph_objects as go
 import time
+from zenlearn_common.frame_pipeline import CaptureThread, InferenceWorker, RateMeter
+from capture_manager import CaptureManager, draw_faces, mosaic
+from emotion_model import STRESS_MAP, get_emotion_model
+from face_tracker import FaceTracker, detection_boxes
+from change_gate import ChangeGate
+from session_store import EMOTION_CODES, SessionStore
+from session_stats import SessionStats
+from metadata_writer import shared_writer
+from stress_charts import emotion_pie, movement_chart, position_heatmap, timeline_chart
 
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -27,113 +34,408 @@ class NumpyEncoder(json.JSONEncoder):
 CONFIG = {
     "data_path": "stress_data",
     "metadata_file": "metadata.csv",
+    # Every sample is persisted by a background writer: "csv" or "parquet" (needs pyarrow),
+    # flushed every metadata_batch_size rows or metadata_flush_interval seconds.
+    # metadata_fsync: "batch" (fsync each batch), "close" (only on shutdown) or "never"
+    "metadata_format": "csv",
+    "metadata_batch_size": 256,
+    "metadata_flush_interval": 1.0,
+    "metadata_fsync": "batch",
     "report_path": "reports",
-    "stress_map": {
-        "angry": 80, "fear": 70, "sad": 60, 
-        "disgust": 50, "neutral": 30, 
-        "happy": 10, "surprise": 20
-    }
+    # The live view reruns the page this often to refresh the gauge and analytics
+    "ui_refresh_seconds": 1.0,
+    # Full face detection runs every N frames; faces are tracked with optical flow in between
+    "redetect_every": 10,
+    "track_min_confidence": 0.6,
+    # Reuse a face's last emotion while its crop hash differs by at most this many of 64 bits
+    "change_gate_threshold": 5,
+    "change_gate_max_age": 2.0,
+    # Samples kept in memory per session (18 bytes each); older samples roll over
+    "session_max_samples": 200_000,
+    "heatmap_bins": 20,
+    # Most points sent to the browser per chart, and rows shown in the raw data table
+    "chart_point_budget": 2000,
+    "raw_table_rows": 1000,
+    # Classroom mode scores every face; each tracked person keeps this many samples
+    "person_max_samples": 20_000,
+    # People unseen this long are folded into a summary row and their samples freed
+    "person_expire_seconds": 60.0,
+    "classroom_metadata_file": "classroom_metadata.csv",
+    # Multi-camera mode: sources opened at once (camera indices, video files or stream URLs),
+    # inference threads shared by all of them, and the prefix of their metadata files
+    "camera_sources": "0",
+    "multicam_inference_threads": 2,
+    "multicam_tile_width": 480,
+    "multicam_metadata_prefix": "multicam_",
+    # Emotion inference: "keras" (DeepFace/TensorFlow) or "onnx" (ONNX Runtime, see export_emotion_onnx.py);
+    # emotion_onnx_path None uses weights/emotion_int8.onnx next to this file, or weights/emotion.onnx without it;
+    # either must have passed bench_emotion_backends.py --record first
+    "emotion_backend": "keras",
+    "emotion_onnx_path": None,
+    "stress_map": STRESS_MAP
 }
 
+class PersonTrack:
+    """Samples and running aggregates of one tracked face in classroom mode"""
+    def __init__(self, face_id):
+        self.face_id = face_id
+        self.samples = SessionStore(max_samples=CONFIG['person_max_samples'], initial_capacity=256)
+        self.stats = SessionStats(heatmap_bins=CONFIG['heatmap_bins'])
+        self.last_seen = None
+
 class StressDetectionSystem:
-    def __init__(self):
+    def __init__(self, persist=True, classroom=False, source=None):
+        # persist=False keeps samples in memory only (used by batch mode)
+        self.persist = persist
+        # Classroom mode scores every face in the frame, not just the first
+        self.classroom = classroom
+        # Name of the camera this system analyzes in multi-camera mode; recorded with every sample
+        self.source = source
         self.mp_face_detection = mp.solutions.face_detection
         self.face_detection = self.mp_face_detection.FaceDetection(
-            min_detection_confidence=0.6
+            min_detection_confidence=0.6,
+            # The full-range model finds the smaller faces of a group further from the camera
+            model_selection=1 if classroom else 0
         )
-        self.stress_levels = deque(maxlen=300)
-        self.metadata = []
+        # Loaded once per process and shared across sessions
+        self.emotion_model = get_emotion_model(CONFIG['emotion_backend'], CONFIG['emotion_onnx_path'])
+        # Samples, statistics and people are written by the inference worker and read by the UI
+        self.lock = threading.RLock()
+        self.reset()
         self._init_filesystem()
+
+    def reset(self):
+        """Start a new session with the same face detector and model: fresh tracking, samples and statistics"""
+        with self.lock:
+            self.people = {}
+            # face_id -> summary of people who left the frame, see _expire_people
+            self.departed = {}
+            self.tracker = FaceTracker(self.detect_faces,
+                                       redetect_every=CONFIG['redetect_every'],
+                                       min_confidence=CONFIG['track_min_confidence'])
+            self.change_gate = ChangeGate(threshold=CONFIG['change_gate_threshold'],
+                                          max_age=CONFIG['change_gate_max_age'])
+            self.stress_levels = deque(maxlen=300)
+            self.samples = SessionStore(max_samples=CONFIG['session_max_samples'])
+            # Whole-session aggregates, updated per sample
+            self.stats = SessionStats(heatmap_bins=CONFIG['heatmap_bins'])
         
     def _init_filesystem(self):
-        """Initialize required directories and files"""
+        """Initialize required directories and the shared metadata writer"""
+        if not self.persist:
+            self.metadata_writer = None
+            return
         os.makedirs(CONFIG['data_path'], exist_ok=True)
         os.makedirs(CONFIG['report_path'], exist_ok=True)
-        if not os.path.exists(os.path.join(CONFIG['data_path'], CONFIG['metadata_file'])):
-            pd.DataFrame(columns=['timestamp', 'emotion', 'stress_level', 'face_x', 'face_y']).to_csv(
-                os.path.join(CONFIG['data_path'], CONFIG['metadata_file']), index=False)
+        metadata_file = CONFIG['classroom_metadata_file'] if self.classroom else CONFIG['metadata_file']
+        columns = ['timestamp', 'emotion', 'stress_level', 'face_x', 'face_y']
+        if self.classroom:
+            columns.insert(1, 'face_id')
+        if self.source is not None:
+            metadata_file = CONFIG['multicam_metadata_prefix'] + metadata_file
+            columns.insert(1, 'source')
+        if CONFIG['metadata_format'] == 'parquet':
+            metadata_file = os.path.splitext(metadata_file)[0] + '.parquet'
+        # The writer adds the CSV header when it creates the file
+        self.metadata_writer = shared_writer(
+            os.path.join(CONFIG['data_path'], metadata_file),
+            columns,
+            format=CONFIG['metadata_format'],
+            batch_size=CONFIG['metadata_batch_size'],
+            flush_interval=CONFIG['metadata_flush_interval'],
+            fsync=CONFIG['metadata_fsync'])
 
     def _save_metadata(self, data):
-        """Save metadata to CSV"""
-        df = pd.DataFrame([data])
-        df.to_csv(os.path.join(CONFIG['data_path'], CONFIG['metadata_file']), 
-                  mode='a', header=False, index=False)
+        """Queue a sample for the background writer; never blocks on disk"""
+        if self.metadata_writer is not None:
+            if self.source is not None:
+                data = dict(data, source=self.source)
+            self.metadata_writer.write(data)
+
+    def detect_faces(self, frame):
+        """Face bounding boxes (x, y, w, h) clipped to the frame, in detection order"""
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return detection_boxes(self.face_detection.process(rgb_frame), frame.shape)
+
+    def classify_faces(self, frame, boxes, keys=None, now=None):
+        """
+        Emotion and stress level for each face box.
+
+        Faces whose crop is visually unchanged since they were last classified
+        (keyed by track id) reuse that result; the rest share one batched
+        forward pass. `now` is the frame time in seconds (wall clock if None).
+        """
+        keys = list(range(len(boxes))) if keys is None else keys
+        crops = [frame[y:y+h, x:x+w] for x, y, w, h in boxes]
+        results = [None] * len(crops)
+        hashes = [None] * len(crops)
+        pending = []
+        for i, (key, crop) in enumerate(zip(keys, crops)):
+            results[i], hashes[i] = self.change_gate.lookup(key, crop, now)
+            if results[i] is None:
+                pending.append(i)
+        
+        predictions = self.emotion_model.predict([crops[i] for i in pending])
+        for i, prediction in zip(pending, predictions):
+            emotion = prediction['dominant_emotion']
+            results[i] = (emotion, CONFIG['stress_map'].get(emotion, 0))
+            self.change_gate.store(keys[i], hashes[i], results[i], now)
+        self.change_gate.retain(keys)
+        return results
+
+    def detect_emotion(self, frame, timestamp=None):
+        """
+        Detect faces and classify the first one without drawing on the frame.
+
+        Safe to run on the background inference worker. Faces are tracked
+        between periodic detections; only the first tracked face is
+        classified and recorded, so other people in view cost no inference. `timestamp` (seconds since the epoch) overrides the wall
+        clock, e.g. for frames from a recorded video. Returns (emotion,
+        stress_level, bbox, metadata), all None when no face was found.
+        """
+        tracks = self.tracker.update(frame)
+        if not tracks:
+            return None, None, None, None
+        
+        now = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
+        track = tracks[0]
+        emotion, stress_level = self.classify_faces(frame, [track.box], [track.id], now.timestamp())[0]
+        x, y, w, h = track.box
+        
+        current_metadata = {
+            'timestamp': now.isoformat(),
+            'emotion': emotion,
+            'stress_level': int(stress_level), 
+            'face_x': int(x + w/2),
+            'face_y': int(y + h/2)
+        }
+        
+        face_x, face_y = current_metadata['face_x'], current_metadata['face_y']
+        with self.lock:
+            self.stress_levels.append(stress_level)
+            movement = self.stats.update(now.timestamp(), EMOTION_CODES[emotion], stress_level,
+                                         face_x, face_y, (frame.shape[1], frame.shape[0]))
+            self.samples.append(now.timestamp(), emotion, stress_level, face_x, face_y, movement)
+        
+        self._save_metadata(current_metadata)
+        
+        return emotion, stress_level, track.box, current_metadata
+
+    def detect_all(self, frame, timestamp=None):
+        """
+        Classroom mode: classify every tracked face and record it under its track id.
+
+        All faces share one detection (every few frames) and one batched
+        forward pass, so the cost per face drops as the group grows. Returns a
+        list of (face_id, emotion, stress_level, bbox, metadata).
+        """
+        tracks = self.tracker.update(frame)
+        now = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
+        with self.lock:
+            self._expire_people(now.timestamp())
+        if not tracks:
+            return []
+        
+        results = self.classify_faces(frame, [track.box for track in tracks], [track.id for track in tracks],
+                                      now.timestamp())
+        faces = []
+        for track, (emotion, stress_level) in zip(tracks, results):
+            x, y, w, h = track.box
+            current_metadata = {
+                'timestamp': now.isoformat(),
+                'face_id': track.id,
+                'emotion': emotion,
+                'stress_level': int(stress_level),
+                'face_x': int(x + w/2),
+                'face_y': int(y + h/2)
+            }
+            
+            with self.lock:
+                person = self.people.get(track.id)
+                if person is None:
+                    person = self.people[track.id] = PersonTrack(track.id)
+                movement = person.stats.update(now.timestamp(), EMOTION_CODES[emotion], stress_level,
+                                               current_metadata['face_x'], current_metadata['face_y'],
+                                               (frame.shape[1], frame.shape[0]))
+                person.samples.append(now.timestamp(), emotion, stress_level,
+                                      current_metadata['face_x'], current_metadata['face_y'], movement)
+                person.last_seen = now.timestamp()
+            
+            self._save_metadata(current_metadata)
+            faces.append((track.id, emotion, stress_level, track.box, current_metadata))
+        return faces
+
+    def _expire_people(self, now):
+        """Fold people unseen for person_expire_seconds into `departed`, dropping their samples; call with the lock held"""
+        cutoff = now - CONFIG['person_expire_seconds']
+        for face_id in [face_id for face_id, person in self.people.items() if person.last_seen < cutoff]:
+            person = self.people.pop(face_id)
+            self.departed[face_id] = dict(person.stats.summary(), last_seen=person.last_seen)
+
+    def analyze_faces(self, frame, timestamp=None):
+        """
+        Analyze a frame in the current mode, for the live view's inference worker.
+
+        Returns a list of (face_id, emotion, stress_level, bbox): every tracked
+        face in classroom mode, otherwise only the recorded one.
+        """
+        if self.classroom:
+            return [face[:4] for face in self.detect_all(frame, timestamp)]
+        emotion, stress_level, bbox, _ = self.detect_emotion(frame, timestamp)
+        if emotion is None:
+            return []
+        return [(self.tracker.tracks[0].id, emotion, stress_level, bbox)]
+
+    def data_points(self):
+        """Samples recorded this session, across all people in classroom mode"""
+        with self.lock:
+            if self.classroom:
+                return (sum(person.stats.count for person in self.people.values())
+                        + sum(summary['total_data_points'] for summary in self.departed.values()))
+            return self.stats.count
+
+    def person_summaries(self):
+        """face_id -> running aggregates of everyone seen this session, departed people included"""
+        with self.lock:
+            summaries = dict(self.departed)
+            summaries.update((face_id, person.stats.summary()) for face_id, person in self.people.items())
+            return summaries
+
+    def average_stress(self):
+        """Mean stress level over every sample of the session"""
+        if not self.classroom:
+            with self.lock:
+                return self.stats.stress.mean if self.stats.count else None
+        summaries = self.person_summaries().values()
+        count = sum(summary['total_data_points'] for summary in summaries)
+        if not count:
+            return None
+        return sum(summary['average_stress'] * summary['total_data_points'] for summary in summaries) / count
+
+    def people_summary(self):
+        """One row of running aggregates per person, in view first, then most observed"""
+        rows = []
+        with self.lock:
+            summaries = self.person_summaries()
+            in_view = set(self.people)
+        for face_id, summary in summaries.items():
+            rows.append({
+                'face_id': face_id,
+                'in_view': face_id in in_view,
+                'samples': summary['total_data_points'],
+                'average_stress': round(summary['average_stress'], 1),
+                'max_stress': summary['max_stress'],
+                'dominant_emotion': summary['dominant_emotion'],
+                'seconds_tracked': round(summary['session_duration_seconds'], 1),
+            })
+        return sorted(rows, key=lambda row: (row['in_view'], row['samples']), reverse=True)
+
+    def snapshot(self, face_id=None):
+        """
+        Copies of the session's (or one tracked person's) statistics and samples.
+
+        The inference worker keeps appending while the UI builds charts, so the
+        UI reads these copies instead of the live objects. Returns None if
+        `face_id` is no longer tracked.
+        """
+        with self.lock:
+            if face_id is None:
+                stats, samples = self.stats, self.samples
+            else:
+                person = self.people.get(face_id)
+                if person is None:
+                    return None
+                stats, samples = person.stats, person.samples
+            return copy.deepcopy(stats), samples.copy()
 
     def analyze_frame(self, frame):
         """Analyze a single frame for stress detection"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        detections = self.face_detection.process(rgb_frame)
+        try:
+            emotion, stress_level, bbox, metadata = self.detect_emotion(frame)
+        except Exception as e:
+            st.error(f"Analysis error: {str(e)}")
+            return frame, None, None, None, None
         
-        if detections.detections:
-            for detection in detections.detections:
-                bboxC = detection.location_data.relative_bounding_box
-                ih, iw, _ = frame.shape
-                x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), int(bboxC.width * iw), int(bboxC.height * ih)
-                
-                # Ensure coordinates are within frame boundaries
-                x = max(0, x)
-                y = max(0, y)
-                w = min(w, frame.shape[1] - x)
-                h = min(h, frame.shape[0] - y)
-                
-                # Only proceed if we have a valid face region
-                if w > 0 and h > 0:
-                    face_roi = frame[y:y+h, x:x+w]
-                    
-                    try:
-                        analysis = DeepFace.analyze(face_roi, actions=['emotion'], enforce_detection=False)
-                        emotion = analysis[0]['dominant_emotion']
-                        stress_level = CONFIG['stress_map'].get(emotion, 0)
-                        self.stress_levels.append(stress_level)
-                        
-                        current_metadata = {
-                            'timestamp': datetime.now().isoformat(),
-                            'emotion': emotion,
-                            'stress_level': int(stress_level), 
-                            'face_x': int(x + w/2),
-                            'face_y': int(y + h/2)
-                        }
-                        
-                        self.metadata.append(current_metadata)
-                        
-                        if len(self.metadata) % 10 == 0:
-                            self._save_metadata(current_metadata)
-                        
-                        # Draw rectangle around detected face
-                        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                        
-                        return frame, emotion, stress_level, (x, y, w, h), current_metadata
-                    
-                    except Exception as e:
-                        st.error(f"Analysis error: {str(e)}")
-                        return frame, None, None, None, None
+        if bbox is not None:
+            # Draw rectangle around detected face
+            x, y, w, h = bbox
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
         
-        return frame, None, None, None, None
+        return frame, emotion, stress_level, bbox, metadata
 
     def generate_json_report(self):
         """Generate JSON report with basic statistics"""
-        if not self.metadata:
+        if self.data_points() == 0:
             return None
             
-        df = pd.DataFrame(self.metadata)
-        report = {
-            "average_stress": float(df['stress_level'].mean()),
-            "max_stress": int(df['stress_level'].max()),
-            "stress_variance": float(df['stress_level'].var()),
-            "dominant_emotion": str(df['emotion'].mode()[0]),
-            "face_position_changes": int(len(df[['face_x', 'face_y']].diff().dropna())),
-            "stress_peaks": int(len(df[zscore(df['stress_level']) > 2])) if len(df) > 1 else 0,
-            "total_data_points": len(df),
-            "session_duration_seconds": (pd.to_datetime(df['timestamp'].iloc[-1]) - 
-                                         pd.to_datetime(df['timestamp'].iloc[0])).total_seconds() if len(df) > 1 else 0
-        }
+        # Running aggregates cover the whole session, including rolled-over samples
+        if self.classroom:
+            people = self.person_summaries()
+            report = {
+                "total_people": len(people),
+                "total_data_points": self.data_points(),
+                "people": {str(face_id): summary for face_id, summary in people.items()}
+            }
+        else:
+            with self.lock:
+                report = self.stats.summary()
         
-        report_file = os.path.join(CONFIG['report_path'], f"stress_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+        prefix = f"stress_report_{self.source}_" if self.source is not None else "stress_report_"
+        report_file = os.path.join(CONFIG['report_path'], f"{prefix}{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
         with open(report_file, 'w') as f:
             json.dump(report, f, cls=NumpyEncoder)
         
         return report
 
+def start_pipeline(system):
+    """Open the webcam and start the capture thread and background emotion worker."""
+    cap = cv2.VideoCapture(0)
+    # Set properties - lower resolution for better performance
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    if not cap.isOpened():
+        cap.release()
+        return None, None
+    capture = CaptureThread(cap, name="stress-capture").start()
+    worker = InferenceWorker(system.analyze_faces, name="stress-inference").start()
+    return capture, worker
+
+def stop_pipeline():
+    """Stop the capture and inference threads, release the webcam and flush recorded samples."""
+    for key in ('capture', 'worker'):
+        if st.session_state.get(key) is not None:
+            st.session_state[key].stop()
+            st.session_state[key] = None
+    if 'system' in st.session_state and st.session_state.system.metadata_writer is not None:
+        st.session_state.system.metadata_writer.flush(timeout=5.0)
+
+def start_cameras(specs, classroom=False):
+    """Open every source with its own capture thread; all share the inference threads."""
+    manager = CaptureManager(lambda name: StressDetectionSystem(classroom=classroom, source=name),
+                             inference_threads=CONFIG['multicam_inference_threads'])
+    failed = [spec for spec in specs if manager.open(spec) is None]
+    return manager, failed
+
+def stop_cameras():
+    """Stop every multi-camera source and flush their recorded samples."""
+    if st.session_state.get('cameras') is not None:
+        st.session_state.cameras.close()
+        st.session_state.cameras = None
+
+def pipeline_stats():
+    """Capture, display and inference rates of the live view, measured separately."""
+    capture = st.session_state.capture
+    worker = st.session_state.worker
+    return {
+        "capture_fps": capture.meter.rate() if capture else 0.0,
+        "display_fps": st.session_state.display_meter.rate(),
+        "inference_fps": worker.meter.rate() if worker else 0.0,
+        "inference_latency_ms": worker.latency * 1000 if worker and worker.latency is not None else None,
+        "frames_skipped_by_inference": worker.frames.dropped if worker else 0,
+        "face_detections_saved": st.session_state.system.tracker.stats()['detections_saved'],
+        "inference_skip_rate": st.session_state.system.change_gate.stats()['skip_rate'],
+    }
+
 def main():
     st.set_page_config(page_title="Stress Detection System", 
                        page_icon="😌", 
@@ -182,14 +484,23 @@ def main():
     if 'video_placeholder' not in st.session_state:
         st.session_state.video_placeholder = None
         
-    if 'cap' not in st.session_state:
-        st.session_state.cap = None
+    if 'capture' not in st.session_state:
+        st.session_state.capture = None
+        
+    if 'worker' not in st.session_state:
+        st.session_state.worker = None
+        
+    if 'display_meter' not in st.session_state:
+        st.session_state.display_meter = RateMeter()
+        
+    if 'cameras' not in st.session_state:
+        st.session_state.cameras = None
         
     # App title with emoji
     st.title("😌 Stress Detection System")
     
     # Create tabs for different sections
-    tab1, tab2, tab3 = st.tabs(["Live Monitor", "Analytics", "About"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Live Monitor", "Analytics", "About", "Multi-Camera"])
     
     with tab1:
         col1, col2 = st.columns([3, 1])
@@ -198,6 +509,7 @@ def main():
             # Video capture placeholder
             st.subheader("Live Video Feed")
             st.session_state.video_placeholder = st.empty()
+            fps_placeholder = st.empty()
             
             # Controls row
             control_col1, control_col2, control_col3 = st.columns(3)
@@ -205,21 +517,19 @@ def main():
             with control_col1:
                 if st.session_state.is_recording:
                     if st.button("Stop Recording", key="stop_btn", type="primary"):
-                        if st.session_state.cap is not None and st.session_state.cap.isOpened():
-                            st.session_state.cap.release()
-                            st.session_state.cap = None
+                        stop_pipeline()
                         st.session_state.is_recording = False
                         st.rerun()
                 else:
                     if st.button("Start Recording", key="start_btn", type="primary"):
-                        # Initialize camera
-                        if st.session_state.cap is None or not st.session_state.cap.isOpened():
-                            st.session_state.cap = cv2.VideoCapture(0)
-                            # Set properties - lower resolution for better performance
-                            st.session_state.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                            st.session_state.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                        # The webcam may be one of the multi-camera sources
+                        stop_cameras()
+                        # Initialize camera and background threads
+                        if st.session_state.capture is None:
+                            stop_pipeline()
+                            st.session_state.capture, st.session_state.worker = start_pipeline(st.session_state.system)
                         
-                        if st.session_state.cap.isOpened():
+                        if st.session_state.capture is not None:
                             st.session_state.is_recording = True
                             st.session_state.start_time = datetime.now()
                             st.session_state.frame_count = 0
@@ -229,7 +539,7 @@ def main():
             with control_col2:
                 if st.button("Generate Report", key="report_btn"):
                     with st.spinner("Generating report..."):
-                        if len(st.session_state.system.metadata) > 0:
+                        if st.session_state.system.data_points() > 0:
                             report = st.session_state.system.generate_json_report()
                             if report:
                                 st.success("Report generated successfully!")
@@ -239,13 +549,11 @@ def main():
             
             with control_col3:
                 if st.button("Reset Data", key="reset_btn"):
-                    # Release camera if open
-                    if st.session_state.cap is not None and st.session_state.cap.isOpened():
-                        st.session_state.cap.release()
-                        st.session_state.cap = None
+                    # Release camera and stop the worker bound to the old system
+                    stop_pipeline()
                     
                     # Reset system instance
-                    st.session_state.system = StressDetectionSystem()
+                    st.session_state.system = StressDetectionSystem(classroom=st.session_state.system.classroom)
                     st.session_state.current_stress = 0
                     st.session_state.current_emotion = "neutral"
                     st.session_state.is_recording = False
@@ -302,100 +610,95 @@ def main():
                 st.info(f"Recording time: {minutes:02d}:{seconds:02d}")
             
             # Display data points collected
-            st.metric("Data Points", len(st.session_state.system.metadata))
+            st.metric("Data Points", st.session_state.system.data_points())
+            
+            # Switching modes starts a fresh session
+            classroom = st.checkbox("Classroom mode (score every face)",
+                                    value=st.session_state.system.classroom,
+                                    disabled=st.session_state.is_recording)
+            if classroom != st.session_state.system.classroom:
+                st.session_state.system = StressDetectionSystem(classroom=classroom)
+                st.rerun()
+            if classroom:
+                st.metric("People Tracked", len(st.session_state.system.people))
+                st.caption(f"{len(st.session_state.system.departed)} more left the frame")
             
     with tab2:
         st.subheader("Stress Analytics")
         
-        if not st.session_state.system.metadata:
+        system = st.session_state.system
+        if system.data_points() == 0:
             st.warning("No data available for analysis. Start recording to collect data.")
+        elif system.classroom and not system.people:
+            # Only the totals of people who left the frame remain
+            st.subheader("People")
+            st.dataframe(pd.DataFrame(system.people_summary()), use_container_width=True, hide_index=True)
+            st.info("No one is in view. Charts are shown for people currently in the frame.")
         else:
-            # Convert metadata to DataFrame for analysis
-            df = pd.DataFrame(st.session_state.system.metadata)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            face_id = None
+            if system.classroom:
+                # Per-person overview, then the charts below for the selected person
+                st.subheader("People")
+                people = system.people_summary()
+                st.dataframe(pd.DataFrame(people), use_container_width=True, hide_index=True)
+                face_id = st.selectbox("Person", [row['face_id'] for row in people if row['in_view']],
+                                       format_func=lambda face_id: f"Person #{face_id}")
+            # Charts are built from a copy the inference worker cannot change underneath them
+            snapshot = system.snapshot(face_id)
+            if snapshot is None:
+                st.info("That person just left the frame. Their totals remain in the table above.")
+            else:
+                stats, samples = snapshot
+                budget = CONFIG['chart_point_budget']
             
-            # Create layout with columns
-            chart_col1, chart_col2 = st.columns(2)
+                # Create layout with columns
+                chart_col1, chart_col2 = st.columns(2)
             
-            with chart_col1:
-                # Stress timeline chart
-                st.subheader("Stress Level Over Time")
-                
-                # Create time series chart with Plotly
-                fig = px.line(df, x='timestamp', y='stress_level', 
-                            title='Stress Level Timeline',
-                            labels={'stress_level': 'Stress Level (%)', 'timestamp': 'Time'})
-                
-                fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Emotion distribution
-                st.subheader("Emotion Distribution")
-                emotion_counts = df['emotion'].value_counts().reset_index()
-                emotion_counts.columns = ['Emotion', 'Count']
-                
-                fig = px.pie(emotion_counts, values='Count', names='Emotion', 
-                           title='Detected Emotions',
-                           color_discrete_sequence=px.colors.qualitative.Bold)
-                           
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with chart_col2:
-                # Face position heatmap
-                st.subheader("Stress Level by Face Position")
+                # Charts are downsampled server-side so their payload stays bounded in long sessions
+                with chart_col1:
+                    # Stress timeline chart
+                    st.subheader("Stress Level Over Time")
+                    st.plotly_chart(timeline_chart(samples, budget), use_container_width=True)
                 
-                fig = px.density_heatmap(df, x='face_x', y='face_y', z='stress_level',
-                                      nbinsx=20, nbinsy=20, 
-                                      labels={'face_x': 'X Position', 'face_y': 'Y Position'},
-                                      title='Stress Level Heatmap by Face Position')
-                                      
-                fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Movement vs Stress
-                st.subheader("Movement vs Stress Level")
-                
-                # Calculate movement
-                df['movement'] = np.sqrt(df['face_x'].diff()**2 + df['face_y'].diff()**2)
-                df = df.dropna()  # Remove NaN values from difference calculation
+                    # Emotion distribution from the running counters
+                    st.subheader("Emotion Distribution")
+                    st.plotly_chart(emotion_pie(stats), use_container_width=True)
+            
+                with chart_col2:
+                    # Face position heatmap from the incremental histogram
+                    st.subheader("Stress Level by Face Position")
+                    st.plotly_chart(position_heatmap(stats), use_container_width=True)
                 
-                fig = px.scatter(df, x='movement', y='stress_level',
-                               title='Movement vs Stress Level',
-                               labels={'movement': 'Movement (pixels)', 'stress_level': 'Stress Level (%)'},
-                               color='stress_level', color_continuous_scale='Viridis')
-                               
-                fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig, use_container_width=True)
+                    # Movement vs Stress
+                    st.subheader("Movement vs Stress Level")
+                    st.plotly_chart(movement_chart(samples, budget), use_container_width=True)
                 
-            # Statistics section
-            st.subheader("Summary Statistics")
+                # Statistics section
+                st.subheader("Summary Statistics")
             
-            # Create metrics in columns
-            metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                # Create metrics in columns
+                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
             
-            with metric_col1:
-                st.metric("Average Stress", f"{df['stress_level'].mean():.1f}%")
+                with metric_col1:
+                    st.metric("Average Stress", f"{stats.stress.mean:.1f}%")
             
-            with metric_col2:
-                st.metric("Max Stress", f"{df['stress_level'].max()}%")
+                with metric_col2:
+                    st.metric("Max Stress", f"{int(stats.stress.max)}%")
             
-            with metric_col3:
-                if len(df) > 1:
-                    st.metric("Stress Variance", f"{df['stress_level'].var():.1f}")
-                else:
-                    st.metric("Stress Variance", "N/A")
+                with metric_col3:
+                    if stats.count > 1:
+                        st.metric("Stress Variance", f"{stats.stress.variance:.1f}")
+                    else:
+                        st.metric("Stress Variance", "N/A")
             
-            with metric_col4:
-                if not df['emotion'].empty:
-                    st.metric("Dominant Emotion", df['emotion'].mode()[0].capitalize())
-                else:
-                    st.metric("Dominant Emotion", "N/A")
+                with metric_col4:
+                    st.metric("Dominant Emotion", stats.dominant_emotion().capitalize())
                     
-            # Display raw data table with expander
-            with st.expander("View Raw Data"):
-                st.dataframe(df.sort_values('timestamp', ascending=False), use_container_width=True)
+                # Display raw data table with expander
+                with st.expander("View Raw Data"):
+                    recent = samples.to_frame(slice(-CONFIG['raw_table_rows'], None))
+                    st.caption(f"Latest {len(recent)} of {stats.count} samples")
+                    st.dataframe(recent.sort_values('timestamp', ascending=False), use_container_width=True)
                 
     with tab3:
         st.subheader("About Stress Detection System")
@@ -440,53 +743,158 @@ def main():
             5. Use "Reset Data" to clear all collected data
             """)
     
-    # Video processing function - separate from the main UI rendering
-    if st.session_state.is_recording and st.session_state.cap is not None:
-        try:
-            # Process a frame
-            ret, frame = st.session_state.cap.read()
+    with tab4:
+        st.subheader("Multi-Camera Monitor")
+        cameras = st.session_state.cameras
+        
+        if cameras is None:
+            specs = st.text_input("Sources (camera indices, video files or stream URLs, comma separated)",
+                                  value=CONFIG['camera_sources'])
+            multicam_classroom = st.checkbox("Score every face", value=True, key="multicam_classroom")
+            if st.button("Start Cameras", key="multicam_start_btn", type="primary"):
+                specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+                if specs:
+                    # Release the single-camera pipeline first; it may hold one of the cameras
+                    stop_pipeline()
+                    st.session_state.is_recording = False
+                    cameras, failed = start_cameras(specs, classroom=multicam_classroom)
+                    for spec in failed:
+                        st.error(f"Could not open source {spec}.")
+                    if cameras.sources:
+                        st.session_state.cameras = cameras
+                        st.rerun()
+                    cameras.close()
+                else:
+                    st.warning("Enter at least one source.")
+        else:
+            control_col1, control_col2 = st.columns(2)
+            with control_col1:
+                if st.button("Stop Cameras", key="multicam_stop_btn", type="primary"):
+                    stop_cameras()
+                    st.rerun()
+            with control_col2:
+                if st.button("Generate Reports", key="multicam_report_btn"):
+                    reports = {source.name: source.system.generate_json_report() for source in cameras.sources}
+                    st.json({name: report for name, report in reports.items() if report})
             
-            if ret:
-                # Process the frame
-                processed_frame, emotion, stress_level, bbox, metadata = st.session_state.system.analyze_frame(frame)
-                
-                if emotion and stress_level is not None:
-                    st.session_state.current_emotion = emotion
-                    st.session_state.current_stress = stress_level
-                
-                    # Add overlay text
-                    cv2.putText(processed_frame, f"Emotion: {emotion}", (30, 50),
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                    cv2.putText(processed_frame, f"Stress: {stress_level}%", (30, 100),
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                
-                # Convert to RGB for Streamlit
-                processed_frame_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-                
-                # Display the frame
-                st.session_state.video_placeholder.image(processed_frame_rgb, channels="RGB", use_column_width=True)
-                
-                # Increment frame count
-                st.session_state.frame_count += 1
-                
-                # Add small delay to control frame rate
-                time.sleep(0.05)
+            multicam_placeholder = st.empty()
+            multicam_stats_placeholder = st.empty()
+            
+            # Combined summary across sources from their running aggregates
+            summary_rows = []
+            for source in cameras.sources:
+                system = source.system
+                average_stress = system.average_stress()
+                summary_rows.append({
+                    'source': source.name,
+                    'samples': system.data_points(),
+                    'people': len(system.people) if system.classroom else None,
+                    'average_stress': round(average_stress, 1) if average_stress is not None else None,
+                })
+            st.dataframe(pd.DataFrame(summary_rows), use_container_width=True, hide_index=True)
+    
+    # Live view: the capture thread reads the camera and the worker runs emotion
+    # inference on the newest frame, so this loop only draws and displays frames
+    if st.session_state.is_recording and st.session_state.capture is not None:
+        capture = st.session_state.capture
+        worker = st.session_state.worker
+        last_seq = -1
+        refresh_at = time.time() + CONFIG['ui_refresh_seconds']
+        
+        while time.time() < refresh_at:
+            item = capture.frames.wait_newer(last_seq, timeout=1.0)
+            if item is None:
+                if not capture.is_alive():
+                    st.error(capture.error or "Could not read frame from webcam.")
+                    st.session_state.is_recording = False
+                    stop_pipeline()
+                    break
+                continue
+            last_seq, timestamp, frame = item
+            worker.submit(frame, timestamp)
+            
+            # Draw the latest emotion result on a copy; the worker may still be reading this frame
+            display_frame = frame.copy()
+            faces = worker.result or []
+            if len(faces) == 1 and not st.session_state.system.classroom:
+                _, emotion, stress_level, (x, y, w, h) = faces[0]
+                st.session_state.current_emotion = emotion
+                st.session_state.current_stress = stress_level
                 
-                # Force refresh to get new frame
-                st.rerun()
-            else:
-                st.error("Could not read frame from webcam.")
-                st.session_state.is_recording = False
-                if st.session_state.cap is not None and st.session_state.cap.isOpened():
-                    st.session_state.cap.release()
-                    st.session_state.cap = None
-                    
-        except Exception as e:
-            st.error(f"Error processing video: {str(e)}")
-            st.session_state.is_recording = False
-            if st.session_state.cap is not None and st.session_state.cap.isOpened():
-                st.session_state.cap.release()
-                st.session_state.cap = None
+                cv2.rectangle(display_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                # Add overlay text
+                cv2.putText(display_frame, f"Emotion: {emotion}", (30, 50),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                cv2.putText(display_frame, f"Stress: {stress_level}%", (30, 100),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            elif faces:
+                # Classroom: label every face, show the group's mean stress and most common emotion
+                emotions = [emotion for _, emotion, _, _ in faces]
+                st.session_state.current_emotion = max(set(emotions), key=emotions.count)
+                st.session_state.current_stress = int(np.mean([stress for _, _, stress, _ in faces]))
+                for face_id, emotion, stress_level, (x, y, w, h) in faces:
+                    cv2.rectangle(display_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                    cv2.putText(display_frame, f"#{face_id} {emotion} {stress_level}%", (x, max(15, y - 8)),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                cv2.putText(display_frame, f"Faces: {len(faces)}  Avg stress: {st.session_state.current_stress}%",
+                           (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            
+            # Convert to RGB for Streamlit
+            processed_frame_rgb = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+            
+            # Display the frame
+            st.session_state.video_placeholder.image(processed_frame_rgb, channels="RGB", use_column_width=True)
+            st.session_state.display_meter.tick()
+            st.session_state.frame_count += 1
+            
+            stats = pipeline_stats()
+            latency = stats['inference_latency_ms']
+            fps_placeholder.caption(
+                f"Capture {stats['capture_fps']:.1f} FPS · Display {stats['display_fps']:.1f} FPS · "
+                f"Inference {stats['inference_fps']:.1f} FPS"
+                + (f" ({latency:.0f} ms)" if latency is not None else "")
+                + f" · Face detections saved {stats['face_detections_saved']}"
+                + f" · Unchanged faces skipped {stats['inference_skip_rate']:.0%}"
+            )
+        
+        if worker is not None and worker.error:
+            st.error(f"Analysis error: {worker.error}")
+        
+        # Refresh the gauge and analytics with the latest results
+        if st.session_state.is_recording:
+            st.rerun()
+
+    # Multi-camera view: capture and inference run on background threads; this loop
+    # only composes the newest frame of every source into one image
+    if st.session_state.cameras is not None:
+        cameras = st.session_state.cameras
+        refresh_at = time.time() + CONFIG['ui_refresh_seconds']
+        stats_at = 0.0
+        
+        while time.time() < refresh_at:
+            tiles = []
+            for source in cameras.sources:
+                frame = source.latest_frame()
+                if frame is not None:
+                    frame = draw_faces(frame.copy(), source.worker.result or [])
+                tiles.append((f"{source.name} ({source.status()})", frame))
+            canvas = mosaic(tiles, tile_width=CONFIG['multicam_tile_width'])
+            multicam_placeholder.image(cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB), channels="RGB",
+                                       use_column_width=True)
+            st.session_state.display_meter.tick()
+            
+            # Per-source rates change slowly; refresh the table a few times a second
+            if time.time() >= stats_at:
+                stats = cameras.stats()
+                multicam_stats_placeholder.dataframe(pd.DataFrame(stats), use_container_width=True, hide_index=True)
+                stats_at = time.time() + 0.25
+                if all(row['status'] != 'live' for row in stats):
+                    break
+            time.sleep(1.0 / 30)
+        
+        # Refresh the summary table with the latest results
+        if any(source.status() == 'live' for source in cameras.sources):
+            st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from zenlearn_common.downsample import lttb_indices, stride_indices
+from emotion_model import EMOTION_LABELS
+
+CHART_LAYOUT = dict(height=300, margin=dict(l=20, r=20, t=40, b=20))
+
+
+def timeline_chart(samples, budget: int = None):
+    """Stress timeline, reduced to `budget` points with LTTB (None plots every sample)."""
+    columns = samples.columns()
+    index = None
+    if budget is not None:
+        index = lttb_indices(columns['timestamp'], columns['stress_level'], budget)
+    df = samples.to_frame(index)
+    fig = px.line(df, x='timestamp', y='stress_level',
+                title='Stress Level Timeline',
+                labels={'stress_level': 'Stress Level (%)', 'timestamp': 'Time'})
+    fig.update_layout(**CHART_LAYOUT)
+    return fig
+
+
+def movement_chart(samples, budget: int = None):
+    """
+    Movement vs stress scatter. Over `budget` points, an even spread of
+    samples is plotted plus the largest movements, so outliers stay visible.
+    """
+    movement = samples.columns()['movement']
+    index = np.flatnonzero(~np.isnan(movement))
+    if budget is not None and len(index) > budget:
+        outliers = np.argsort(movement[index])[-max(1, budget // 20):]
+        index = index[stride_indices(len(index), budget, keep=outliers)]
+    df = samples.to_frame(index)
+    fig = px.scatter(df, x='movement', y='stress_level',
+                   title='Movement vs Stress Level',
+                   labels={'movement': 'Movement (pixels)', 'stress_level': 'Stress Level (%)'},
+                   color='stress_level', color_continuous_scale='Viridis')
+    fig.update_layout(**CHART_LAYOUT)
+    return fig
+
+
+def position_heatmap(stats):
+    """Face position heatmap from the pre-binned histogram; its size is fixed by the bin count."""
+    x_centers, y_centers = stats.positions.centers()
+    fig = go.Figure(go.Heatmap(x=x_centers, y=y_centers, z=stats.positions.stress_sum,
+                               colorbar={'title': 'sum of stress_level'}))
+    fig.update_layout(title='Stress Level Heatmap by Face Position',
+                      xaxis_title='X Position', yaxis_title='Y Position')
+    fig.update_layout(**CHART_LAYOUT)
+    return fig
+
+
+def emotion_pie(stats):
+    emotion_counts = pd.DataFrame({'Emotion': EMOTION_LABELS, 'Count': stats.emotion_counts})
+    emotion_counts = emotion_counts[emotion_counts['Count'] > 0]
+    fig = px.pie(emotion_counts, values='Count', names='Emotion',
+               title='Detected Emotions',
+               color_discrete_sequence=px.colors.qualitative.Bold)
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(**CHART_LAYOUT)
+    return fig
@@ -0,0 +1,379 @@
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from change_gate import ChangeGate
+from emotion_model import STRESS_MAP, get_emotion_model
+from face_tracker import FaceTracker, detection_boxes
+from zenlearn_common.frame_pipeline import RateMeter
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cross-client batching: a forward pass starts once this many crops are waiting,
+# or this long after the first one arrived
+MAX_BATCH = int(os.getenv("STRESS_MAX_BATCH", "32"))
+MAX_BATCH_WAIT_MS = float(os.getenv("STRESS_MAX_BATCH_WAIT_MS", "10"))
+REDETECT_EVERY = int(os.getenv("STRESS_REDETECT_EVERY", "10"))
+CHANGE_GATE_THRESHOLD = int(os.getenv("STRESS_CHANGE_GATE_THRESHOLD", "5"))
+CHANGE_GATE_MAX_AGE = float(os.getenv("STRESS_CHANGE_GATE_MAX_AGE", "2.0"))
+MAX_FRAME_BYTES = int(os.getenv("STRESS_MAX_FRAME_BYTES", str(4 * 1024 * 1024)))
+# Threads that decode frames and run face detection, each with its own detector
+DETECTOR_THREADS = int(os.getenv("STRESS_DETECTOR_THREADS", "4"))
+# "keras" or "onnx"; the ONNX backend avoids loading TensorFlow at all, and only loads
+# a model whose agreement with the Keras one was recorded by bench_emotion_backends.py --record
+EMOTION_BACKEND = os.getenv("STRESS_EMOTION_BACKEND", "keras")
+EMOTION_ONNX_PATH = os.getenv("STRESS_EMOTION_ONNX_PATH") or None
+
+app = FastAPI(
+    title="Stress Inference API",
+    description="Headless emotion and stress inference for webcam frames streamed over WebSocket",
+    version="1.0.0"
+)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+class DynamicBatcher:
+    """
+    Groups face crops from all connected clients into shared forward passes.
+
+    Requests queue up while a pass is running. The next pass starts as soon
+    as `max_batch` crops are waiting or `max_wait` seconds after the first of
+    them arrived, so a lone client waits at most `max_wait` longer and many
+    clients share the cost of one pass.
+    """
+
+    def __init__(self, predict, max_batch: int, max_wait: float):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.crops = 0
+        self.largest_batch = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def classify(self, crops) -> list:
+        """Model outputs for `crops`, computed in a batch shared with other clients."""
+        if not crops:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((crops, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            size = len(requests[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            crops = [crop for request_crops, _ in requests for crop in request_crops]
+            try:
+                results = await asyncio.to_thread(self.predict, crops)
+            except Exception as e:
+                logger.error(f"Batch inference failed: {str(e)}")
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.crops += len(crops)
+            self.largest_batch = max(self.largest_batch, len(crops))
+            offset = 0
+            for request_crops, future in requests:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(request_crops)])
+                offset += len(request_crops)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "crops": self.crops,
+            "mean_batch_size": self.crops / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+# MediaPipe graphs are not thread-safe: frames are decoded and faces detected
+# on a fixed set of threads, each created with its own detector
+_detectors = threading.local()
+_all_detectors = []
+_detectors_lock = threading.Lock()
+
+
+def _open_detector():
+    import mediapipe as mp
+    detector = mp.solutions.face_detection.FaceDetection(min_detection_confidence=0.6)
+    _detectors.face_detection = detector
+    with _detectors_lock:
+        _all_detectors.append(detector)
+
+
+detector_executor = ThreadPoolExecutor(max_workers=max(1, DETECTOR_THREADS), thread_name_prefix="stress-detect",
+                                       initializer=_open_detector)
+
+
+def close_detectors():
+    """Stop the detector threads and close their MediaPipe graphs."""
+    detector_executor.shutdown(wait=True, cancel_futures=True)
+    with _detectors_lock:
+        for detector in _all_detectors:
+            detector.close()
+        _all_detectors.clear()
+
+
+def detect_faces(frame):
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return detection_boxes(_detectors.face_detection.process(rgb_frame), frame.shape)
+
+
+class ClientSession:
+    """Per-connection frame format, face tracks and change gate; the model is shared."""
+
+    def __init__(self):
+        self.format = "jpeg"
+        self.width = None
+        self.height = None
+        self.tracker = FaceTracker(detect_faces, redetect_every=REDETECT_EVERY)
+        self.change_gate = ChangeGate(threshold=CHANGE_GATE_THRESHOLD, max_age=CHANGE_GATE_MAX_AGE)
+        self.frames = 0
+        self.dropped = 0
+
+    def configure(self, options: dict):
+        frame_format = options.get("format", "jpeg")
+        if frame_format not in ("jpeg", "bgr", "rgb"):
+            raise ValueError("format must be jpeg, bgr or rgb")
+        if frame_format != "jpeg" and not (options.get("width") and options.get("height")):
+            raise ValueError("Raw frames need width and height")
+        self.format = frame_format
+        self.width = options.get("width")
+        self.height = options.get("height")
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """BGR image from an encoded (JPEG/PNG) or raw frame."""
+        if self.format == "jpeg":
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode frame")
+            return frame
+        if len(data) != self.width * self.height * 3:
+            raise ValueError(f"Raw frame must be {self.width}x{self.height}x3 bytes")
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if self.format == "rgb" else frame
+
+    async def analyze(self, data: bytes) -> list:
+        """Emotion and stress level of every face in one frame."""
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(detector_executor, self.decode, data)
+        tracks = await loop.run_in_executor(detector_executor, self.tracker.update, frame)
+        now = time.time()
+
+        crops, hashes, results, pending = [], [], [], []
+        for i, track in enumerate(tracks):
+            x, y, w, h = track.box
+            crops.append(frame[y:y+h, x:x+w])
+            result, crop_hash = self.change_gate.lookup(track.id, crops[-1], now)
+            hashes.append(crop_hash)
+            results.append(result)
+            if result is None:
+                pending.append(i)
+
+        predictions = await batcher.classify([crops[i] for i in pending])
+        for i, prediction in zip(pending, predictions):
+            emotion = prediction["dominant_emotion"]
+            results[i] = (emotion, STRESS_MAP.get(emotion, 0))
+            self.change_gate.store(tracks[i].id, hashes[i], results[i], now)
+        self.change_gate.retain([track.id for track in tracks])
+        self.frames += 1
+
+        return [
+            {"face_id": track.id, "emotion": emotion, "stress_level": stress_level, "bbox": list(track.box)}
+            for track, (emotion, stress_level) in zip(tracks, results)
+        ]
+
+
+batcher = DynamicBatcher(lambda crops: get_emotion_model(EMOTION_BACKEND, EMOTION_ONNX_PATH).predict(crops),
+                         MAX_BATCH, MAX_BATCH_WAIT_MS / 1000)
+frame_meter = RateMeter()
+sessions = set()
+totals = {"frames": 0, "dropped": 0, "connections": 0}
+
+
+@app.on_event("startup")
+async def load_model():
+    # Load the shared weights before the first client connects
+    await asyncio.to_thread(get_emotion_model, EMOTION_BACKEND, EMOTION_ONNX_PATH)
+    batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    await asyncio.to_thread(close_detectors)
+
+
+@app.websocket("/ws/stress")
+async def stress_stream(websocket: WebSocket):
+    """
+    Stream webcam frames and receive emotion and stress per frame.
+
+    Binary messages are frames: JPEG/PNG by default, or raw bytes after a
+    text message `{"format": "bgr" | "rgb", "width": W, "height": H}`.
+    Each processed frame is answered with
+    `{"seq", "faces": [{"face_id", "emotion", "stress_level", "bbox"}], "latency_ms", "dropped"}`.
+    Frames that arrive while the previous one is still being analyzed replace
+    each other, so replies always describe the newest frame.
+    """
+    await websocket.accept()
+    session = ClientSession()
+    sessions.add(session)
+    totals["connections"] += 1
+    latest = {"frame": None, "closed": False}
+    ready = asyncio.Event()
+
+    async def receive_frames():
+        seq = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") is not None:
+                    try:
+                        session.configure(json.loads(message["text"]))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        await websocket.send_json({"error": str(e)})
+                    continue
+                data = message.get("bytes")
+                if not data:
+                    continue
+                if len(data) > MAX_FRAME_BYTES:
+                    await websocket.send_json({"error": f"Frame larger than {MAX_FRAME_BYTES} bytes"})
+                    continue
+                if latest["frame"] is not None:
+                    session.dropped += 1
+                    totals["dropped"] += 1
+                latest["frame"] = (seq, time.time(), data)
+                seq += 1
+                ready.set()
+        finally:
+            latest["closed"] = True
+            ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if latest["frame"] is None:
+                if latest["closed"]:
+                    break
+                continue
+            seq, received_at, data = latest["frame"]
+            latest["frame"] = None
+            try:
+                faces = await session.analyze(data)
+            except ValueError as e:
+                await websocket.send_json({"seq": seq, "error": str(e)})
+                continue
+            except Exception as e:
+                # Detection or the shared batch failed; the next frame may well succeed
+                logger.error(f"Inference failed for frame {seq}: {str(e)}")
+                await websocket.send_json({"seq": seq, "error": f"Inference failed: {str(e)}"})
+                continue
+            frame_meter.tick()
+            totals["frames"] += 1
+            await websocket.send_json({
+                "seq": seq,
+                "faces": faces,
+                "latency_ms": (time.time() - received_at) * 1000,
+                "dropped": session.dropped,
+            })
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Stress stream error: {str(e)}")
+        try:
+            await websocket.close(code=1011, reason="Stress inference error")
+        except Exception:
+            pass
+    finally:
+        receiver.cancel()
+        sessions.discard(session)
+
+
+@app.get("/stats")
+async def service_stats():
+    """Throughput, dropped frames, tracking savings and batching efficiency across clients."""
+    detections_saved = sum(s.tracker.stats()["detections_saved"] for s in sessions)
+    return {
+        "active_connections": len(sessions),
+        "total_connections": totals["connections"],
+        "frames_processed": totals["frames"],
+        "frames_dropped": totals["dropped"],
+        "frames_per_second": frame_meter.rate(),
+        "active_detections_saved": detections_saved,
+        "batching": batcher.stats(),
+    }
+
+
+@app.get("/")
+async def root():
+    return {
+        "status": "online",
+        "api": "Stress Inference API",
+        "version": "1.0.0",
+        "websocket": "/ws/stress"
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8100")))
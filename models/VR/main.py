@@ -11,6 +11,9 @@ from pathlib import Path
 import logging
 import uuid
 import shutil
+import hashlib
+
+from zenlearn_common import cassette
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +25,7 @@ logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+cassette.ensure_offline_credentials("GROQ_API_KEY", "ELEVENLABS_API_KEY")
 
 # Initialize FastAPI app
 app = FastAPI(title="VR Audience Reaction API")
@@ -58,9 +62,16 @@ async def process_audio(file: UploadFile = File(...)):
         # 1. Transcribe audio using Whisper
         logger.info("Transcribing audio...")
         try:
-            model = whisper.load_model("base")
-            result = model.transcribe(str(file_path))
-            transcript = result["text"]
+            def transcribe():
+                model = whisper.load_model("base")
+                return model.transcribe(str(file_path))["text"]
+
+            transcript = await cassette.acall(
+                "whisper",
+                lambda: {"model": "base", "audio_sha256": hashlib.sha256(file_path.read_bytes()).hexdigest()},
+                transcribe,
+                synthetic=lambda: "Large language models are changing how we learn and build software.",
+            )
             logger.info(f"Transcript: {transcript}")
         except Exception as e:
             logger.error(f"Transcription failed: {str(e)}")
@@ -98,8 +109,12 @@ async def process_audio(file: UploadFile = File(...)):
             
             # Create and execute chain
             chain = prompt | llm
-            response = chain.invoke({"input": transcript})
-            reaction = response.content.strip()
+            reaction = (await cassette.acall(
+                "groq",
+                {"model": "deepseek-r1-distill-llama-70b", "task": "vr-reaction", "input": transcript},
+                lambda: chain.invoke({"input": transcript}).content,
+                synthetic=lambda: "[interested] That's a fascinating point!",
+            )).strip()
             logger.info(f"Generated Reaction: {reaction}")
         except Exception as e:
             logger.error(f"LLM processing failed: {str(e)}")
@@ -131,28 +146,36 @@ async def process_audio(file: UploadFile = File(...)):
                 api_key=api_key,
             )
             
-            # Use the actual reaction text
-            audio_response = client.text_to_speech.convert(
-                text=text,
-                voice_id="JBFqnCBsd6RMkjVDRZzb",  # Default voice
-                model_id="eleven_multilingual_v2",
-                output_format="mp3_44100_128",
+            def synthesize_speech():
+                # Use the actual reaction text
+                audio_response = client.text_to_speech.convert(
+                    text=text,
+                    voice_id="JBFqnCBsd6RMkjVDRZzb",  # Default voice
+                    model_id="eleven_multilingual_v2",
+                    output_format="mp3_44100_128",
+                )
+                
+                # Handle generator vs bytes response appropriately
+                if hasattr(audio_response, '__next__') or hasattr(audio_response, '__iter__'):
+                    # It's a generator or iterator, collect all chunks
+                    audio_bytes = b''
+                    for chunk in audio_response:
+                        audio_bytes += chunk
+                    return audio_bytes
+                # It's already bytes
+                return audio_response
+            
+            audio_bytes = await cassette.acall(
+                "elevenlabs",
+                {"voice_id": "JBFqnCBsd6RMkjVDRZzb", "model_id": "eleven_multilingual_v2", "text": text},
+                synthesize_speech,
+                synthetic=cassette.synthetic_speech,
             )
             
             # Save output with unique identifier
             output_filename = f"audience_reaction_{file_id}.mp3"
             output_path = OUTPUT_DIR / output_filename
             
-            # Handle generator vs bytes response appropriately
-            if hasattr(audio_response, '__next__') or hasattr(audio_response, '__iter__'):
-                # It's a generator or iterator, collect all chunks
-                audio_bytes = b''
-                for chunk in audio_response:
-                    audio_bytes += chunk
-            else:
-                # It's already bytes
-                audio_bytes = audio_response
-            
             with open(output_path, "wb") as f:
                 f.write(audio_bytes)
             
@@ -0,0 +1 @@
+"""Code shared by the ZenLearn model apps: frame capture and inference threading, chart downsampling and the upstream record/replay layer."""
@@ -0,0 +1,203 @@
+"""
+Record/replay layer for third-party API calls (Groq, Tavily, Gemini, ElevenLabs).
+
+Every upstream call site wraps its SDK call in `cassette.call(...)`, or
+`await cassette.acall(...)` inside async handlers. The behaviour is selected
+with environment variables:
+
+    UPSTREAM_MODE      live (default) | record | replay | synthetic
+    CASSETTE_DIR       where recordings are stored (default: cassettes)
+    CASSETTE_LATENCY   fixed injected latency in seconds for replay/synthetic;
+                       unset means "use the recorded latency" (synthetic: 0)
+    CASSETTE_LATENCY_SCALE  multiplier applied to recorded latencies (default 1.0)
+    CASSETTE_JITTER    uniform +/- jitter in seconds added to the latency
+    CASSETTE_ON_MISS   error (default) | synthetic — what replay does without a recording
+
+In record mode the real call is made and its result and latency are written
+to disk. In replay mode the recording is returned after the injected delay,
+so the apps can be load tested offline with realistic timing.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+LIVE, RECORD, REPLAY, SYNTHETIC = "live", "record", "replay", "synthetic"
+
+_write_lock = threading.Lock()
+
+
+def mode() -> str:
+    """Current mode; read on every call so values loaded from .env apply."""
+    return os.getenv("UPSTREAM_MODE", LIVE).lower()
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recording exists for a request."""
+
+
+def is_offline() -> bool:
+    """True when no real upstream is contacted."""
+    return mode() in (REPLAY, SYNTHETIC)
+
+
+def ensure_offline_credentials(*env_names: str):
+    """Give SDK clients a placeholder key so they can be constructed without network access."""
+    if is_offline():
+        for name in env_names:
+            os.environ.setdefault(name, "offline")
+
+
+def request_key(service: str, request: dict) -> str:
+    """Stable hash of the service name and request parameters."""
+    payload = json.dumps({"service": service, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(service: str, key: str) -> Path:
+    return Path(os.getenv("CASSETTE_DIR", "cassettes")) / service / f"{key}.json"
+
+
+def _encode(value: Any) -> dict:
+    if isinstance(value, (bytes, bytearray)):
+        return {"encoding": "base64", "value": base64.b64encode(bytes(value)).decode("ascii")}
+    return {"encoding": "json", "value": value}
+
+
+def _decode(entry: dict) -> Any:
+    if entry["encoding"] == "base64":
+        return base64.b64decode(entry["value"])
+    return entry["value"]
+
+
+def _delay(recorded_latency: float) -> float:
+    """Seconds to wait before returning a replayed or synthetic result."""
+    fixed_latency = os.getenv("CASSETTE_LATENCY")
+    if fixed_latency is not None:
+        delay = float(fixed_latency)
+    else:
+        delay = recorded_latency * float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+    jitter = float(os.getenv("CASSETTE_JITTER", "0"))
+    return delay + random.uniform(-jitter, jitter)
+
+
+def _record(service: str, key: str, request: dict, result: Any, latency: float):
+    path = _path(service, key)
+    entry = {
+        "service": service,
+        "request": request,
+        "response": _encode(result),
+        "latency": latency,
+        "recorded_at": time.time(),
+    }
+    with _write_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, path)
+
+
+def call(
+    service: str,
+    request: Union[dict, Callable[[], dict]],
+    fn: Callable[[], Any],
+    synthetic: Optional[Callable[[], Any]] = None,
+):
+    """
+    Run an upstream call through the cassette layer.
+
+    - **service**: recording namespace, e.g. "groq" or "tavily"
+    - **request**: JSON-serializable parameters that identify the call, or a
+      callable building them (only evaluated outside live mode)
+    - **fn**: performs the real call; its result must be JSON-serializable or bytes
+    - **synthetic**: builds a stand-in result without any network access
+    """
+    current_mode = mode()
+    if current_mode == LIVE:
+        return fn()
+
+    if callable(request):
+        request = request()
+
+    if current_mode == RECORD:
+        started = time.perf_counter()
+        result = fn()
+        _record(service, request_key(service, request), request, result, time.perf_counter() - started)
+        return result
+
+    result, delay = _offline(service, request, synthetic)
+    if delay > 0:
+        time.sleep(delay)
+    return result()
+
+
+async def acall(
+    service: str,
+    request: Union[dict, Callable[[], dict]],
+    fn: Callable[[], Any],
+    synthetic: Optional[Callable[[], Any]] = None,
+):
+    """
+    `call` for async handlers. Live and recorded calls run in a worker thread
+    and the replay latency is awaited, so neither blocks the event loop.
+    """
+    if mode() in (LIVE, RECORD):
+        return await asyncio.to_thread(call, service, request, fn, synthetic)
+
+    if callable(request):
+        request = await asyncio.to_thread(request)
+    result, delay = _offline(service, request, synthetic)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return result()
+
+
+def _offline(service: str, request: dict, synthetic: Optional[Callable[[], Any]]):
+    """(result builder, delay) for a replay or synthetic call, without waiting."""
+    if mode() == REPLAY:
+        path = _path(service, request_key(service, request))
+        if path.exists():
+            with open(path) as f:
+                entry = json.load(f)
+            return lambda: _decode(entry["response"]), _delay(entry.get("latency", 0.0))
+        if os.getenv("CASSETTE_ON_MISS", "error").lower() != SYNTHETIC or synthetic is None:
+            raise CassetteMiss(f"No {service} recording for request {request_key(service, request)[:12]}")
+        logger.info(f"Cassette miss for {service}, using synthetic response")
+
+    if synthetic is None:
+        raise CassetteMiss(f"No synthetic stand-in registered for {service}")
+    return synthetic, _delay(0.0)
+
+
+# Synthetic stand-ins shared by the apps
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz) is 417 bytes, ~26 ms of audio
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+
+
+def synthetic_chat_response(message: str) -> str:
+    return f"(synthetic) Here is a short answer to: {message[:200]}"
+
+
+def synthetic_search_results(query: str, max_results: int = 3) -> list:
+    return [
+        {
+            "url": f"https://example.com/{i}",
+            "content": f"(synthetic) Result {i + 1} for {query[:100]}",
+        }
+        for i in range(max_results)
+    ]
+
+
+def synthetic_speech(seconds: float = 1.0) -> bytes:
+    return SILENT_MP3_FRAME * max(1, int(seconds / 0.026))
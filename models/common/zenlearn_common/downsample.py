@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def lttb_indices(x, y, budget: int) -> np.ndarray:
+    """
+    Indices of at most `budget` points chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each of the `budget - 2` buckets
+    in between, the point forming the largest triangle with the previously
+    kept point and the next bucket's average. Peaks and dips survive, which
+    plain striding would drop. Returns every index when the series already
+    fits the budget.
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+    if budget < 3:
+        raise ValueError("LTTB needs a budget of at least 3 points")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # budget - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    indices = np.empty(budget, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(budget - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == budget - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def stride_indices(n: int, budget: int, keep=None) -> np.ndarray:
+    """
+    Evenly spaced indices for point clouds without a time axis, plus any `keep`
+    indices (e.g. outliers) so extremes stay visible. Sorted and unique; the
+    result can exceed `budget` by up to len(keep).
+    """
+    if n <= budget:
+        return np.arange(n)
+    indices = np.linspace(0, n - 1, budget).astype(np.int64)
+    if keep is not None:
+        indices = np.union1d(indices, np.asarray(keep, dtype=np.int64))
+    return indices
+
+
+def bucket_edges(n: int, buckets: int) -> np.ndarray:
+    """Edges splitting `n` consecutive items into at most `buckets` groups of near-equal size."""
+    buckets = max(1, min(n, buckets))
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def payload_bytes(fig) -> int:
+    """Size of the JSON a Plotly figure sends to the browser."""
+    return len(fig.to_json().encode("utf-8"))
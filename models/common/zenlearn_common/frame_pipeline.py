@@ -0,0 +1,343 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# How many (seq, latency) pairs a worker keeps in `latencies` for callers that poll them
+LATENCY_HISTORY = 256
+
+
+class RateMeter:
+    """Events per second over a sliding time window."""
+
+    def __init__(self, window: float = 2.0):
+        self.window = window
+        self.count = 0
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.count += 1
+            self._times.append(now)
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+
+    def rate(self) -> float:
+        now = time.time()
+        with self._lock:
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+            if len(self._times) < 2:
+                return 0.0
+            span = max(now - self._times[0], 1e-6)
+            return (len(self._times) - 1) / span
+
+
+class FrameSlot:
+    """
+    Single-slot mailbox that only ever holds the newest frame.
+
+    Producers overwrite whatever is waiting, so consumers never work through a
+    backlog of stale frames; overwritten frames are counted in `dropped`.
+    Items are `(seq, timestamp, frame)` tuples with an increasing `seq`.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._pending = False
+        self._seq = 0
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame, timestamp: float = None):
+        with self._cond:
+            if self._pending:
+                self.dropped += 1
+            self._item = (self._seq, time.time() if timestamp is None else timestamp, frame)
+            self._seq += 1
+            self._pending = True
+            self._cond.notify_all()
+
+    def take(self, timeout: float = None):
+        """Consume the newest frame, waiting up to `timeout` for one to arrive."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending or self._closed, timeout):
+                return None
+            if not self._pending:
+                return None
+            self._pending = False
+            return self._item
+
+    def wait_newer(self, seq: int, timeout: float = None):
+        """Newest frame with a sequence number above `seq`, without consuming it."""
+        with self._cond:
+            ready = lambda: (self._item is not None and self._item[0] > seq) or self._closed
+            if not self._cond.wait_for(ready, timeout) or self._item is None or self._item[0] <= seq:
+                return None
+            return self._item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class CaptureThread:
+    """
+    Reads a `cv2.VideoCapture` on its own thread as fast as the camera delivers.
+
+    Only the newest frame is kept in `frames`, so a slow reader sees fresh
+    frames instead of the capture buffer's backlog. `on_frame(frame,
+    timestamp)` is called for every frame read, e.g. to feed an inference
+    worker directly. Video files have no camera to pace them, so `max_fps`
+    caps the read rate (typically at the file's own frame rate).
+    """
+
+    def __init__(self, cap, name: str = "capture", on_frame=None, max_fps: float = None):
+        self.cap = cap
+        self.on_frame = on_frame
+        self.max_fps = max_fps
+        self.frames = FrameSlot()
+        self.meter = RateMeter()
+        self.error = None
+        self._stop = threading.Event()
+        # The capture is only released once no thread can be inside cap.read()
+        self._release_lock = threading.Lock()
+        self._exited = False
+        self._release_on_exit = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            next_read = time.time()
+            while not self._stop.is_set():
+                if self.max_fps:
+                    delay = next_read - time.time()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                    next_read = max(next_read + 1.0 / self.max_fps, time.time() - 1.0)
+                ret, frame = self.cap.read()
+                if not ret:
+                    self.error = "Could not read frame from camera."
+                    break
+                timestamp = time.time()
+                self.meter.tick(timestamp)
+                self.frames.put(frame, timestamp)
+                if self.on_frame is not None:
+                    self.on_frame(frame, timestamp)
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Capture thread %s failed", self._thread.name)
+        finally:
+            self.frames.close()
+            with self._release_lock:
+                self._exited = True
+                release = self._release_on_exit
+            if release:
+                self._release()
+
+    def _release(self):
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop reading and release the capture.
+
+        A read blocked on a stalled camera or stream can outlast `timeout`;
+        the capture is then released by the capture thread when the read
+        returns, never while it is still in use.
+        """
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        with self._release_lock:
+            if self._thread.ident is not None and not self._exited:
+                self._release_on_exit = True
+                return
+        self._release()
+
+
+class InferenceWorker:
+    """
+    Runs `analyze(frame)` on a background thread, always on the newest submitted frame.
+
+    Frames submitted while an analysis is running replace each other, so the
+    worker runs at whatever rate the model sustains and the caller is never
+    blocked. The most recent result is available as `result`, together with
+    the capture timestamp of the frame it was computed from. `latencies`
+    holds `(seq, seconds)` for each recently analyzed frame, `seq` being the
+    frame's number in `frames`.
+    """
+
+    def __init__(self, analyze, name: str = "inference"):
+        self.analyze = analyze
+        self.frames = FrameSlot()
+        self.meter = RateMeter()
+        self.result = None
+        self.result_timestamp = None
+        self.latency = None
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, frame, timestamp: float = None):
+        self.frames.put(frame, timestamp)
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.frames.take(timeout=0.1)
+            if item is None:
+                continue
+            seq, timestamp, frame = item
+            try:
+                self.result = self.analyze(frame)
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                logger.exception("Inference error in %s", self._thread.name)
+                continue
+            self.result_timestamp = timestamp
+            self.latency = time.time() - timestamp
+            self.latencies.append((seq, self.latency))
+            self.meter.tick()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+
+
+class PooledWorker:
+    """
+    One frame source's handle on an `InferencePool`.
+
+    Has the same `submit`, `result`, `latency`, `latencies`, `error`, `meter`
+    and `frames` attributes as `InferenceWorker`, so callers can use either.
+    """
+
+    def __init__(self, pool, analyze):
+        self.pool = pool
+        self.analyze = analyze
+        self.frames = FrameSlot()
+        self.meter = RateMeter()
+        self.result = None
+        self.result_timestamp = None
+        self.latency = None
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.error = None
+        self.busy = False
+
+    def submit(self, frame, timestamp: float = None):
+        self.frames.put(frame, timestamp)
+        self.pool.wake()
+
+    def stop(self):
+        self.pool.remove(self)
+        self.frames.close()
+
+
+class InferencePool:
+    """
+    A fixed set of inference threads shared by many frame sources.
+
+    Each source is added with its own `analyze(frame)` and gets a
+    `PooledWorker`; like `InferenceWorker`, only the newest submitted frame of
+    a source is ever analyzed. Sources are served round-robin so a fast
+    camera cannot starve the others, and each source is analyzed by at most
+    one thread at a time because its analysis may keep per-source state such
+    as a face tracker.
+    """
+
+    def __init__(self, threads: int = 2, name: str = "inference"):
+        self._cond = threading.Condition()
+        self._workers = []
+        self._next = 0
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(max(1, threads))]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def add(self, analyze) -> PooledWorker:
+        worker = PooledWorker(self, analyze)
+        with self._cond:
+            self._workers.append(worker)
+        return worker
+
+    def remove(self, worker: PooledWorker):
+        with self._cond:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _claim(self):
+        # Called with self._cond held: the next idle source with a waiting frame
+        count = len(self._workers)
+        for i in range(count):
+            worker = self._workers[(self._next + i) % count]
+            if worker.busy:
+                continue
+            item = worker.frames.take(timeout=0)
+            if item is not None:
+                self._next = (self._next + i + 1) % count
+                worker.busy = True
+                return worker, item
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                claimed = self._claim()
+                while claimed is None and not self._stopped:
+                    self._cond.wait(timeout=0.1)
+                    claimed = self._claim()
+                if self._stopped:
+                    return
+            worker, (seq, timestamp, frame) = claimed
+            try:
+                worker.result = worker.analyze(frame)
+                worker.error = None
+                worker.result_timestamp = timestamp
+                worker.latency = time.time() - timestamp
+                worker.latencies.append((seq, worker.latency))
+                worker.meter.tick()
+            except Exception as e:
+                worker.error = str(e)
+                logger.exception("Inference error in %s", threading.current_thread().name)
+            finally:
+                with self._cond:
+                    worker.busy = False
+                    self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=5.0)